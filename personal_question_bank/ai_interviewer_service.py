@@ -4,18 +4,28 @@ AI面试官服务模块
 """
 
 import openai
-import requests
 import json
 import base64
 import os
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, Iterator, List, Optional, Tuple
 from datetime import datetime
 import logging
+import time
+
+from interview_stream import FeedbackStreamParser, iter_sse_data
+from provider_router import ProviderRouter
+from provider_clients import (
+    BAIDU_TOKEN_ERROR_CODES, CONNECT_TIMEOUT, READ_TIMEOUT,
+    baidu_access_token, invalidate_token, post, zhipu_token
+)
 
 # 配置日志
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# 百度语音识别返回的凭证无效/过期错误码
+BAIDU_ASR_TOKEN_ERRORS = {3302}
+
 class AIInterviewerService:
     """AI面试官服务类"""
     
@@ -37,8 +47,13 @@ class AIInterviewerService:
         # 智谱AI配置
         self.zhipu_api_key = os.getenv('ZHIPU_API_KEY', '')
         
-        # 确定使用哪个模型
+        # OpenAI客户端在第一次调用时创建并复用（内部有自己的连接池）
+        self._openai_client = None
+        
+        # 确定使用哪个模型：配置了的服务商都参与路由，selected_model 为优先级最高的一个
+        self.available_models = self._configured_models()
         self.selected_model = self._select_available_model()
+        self.router = ProviderRouter(self.available_models)
         
         # 面试官角色设定
         self.interviewer_persona = {
@@ -84,23 +99,27 @@ class AIInterviewerService:
 记住：你是张总监，要体现出资深面试官的犀利和幽默，让候选人感受到真实的大厂面试氛围！'''
         }
     
-    def _select_available_model(self):
-        """选择可用的大模型"""
+    def _configured_models(self) -> List[str]:
+        """配置了API密钥的大模型，按优先级排列"""
+        models = []
         if self.qwen_api_key:
-            logger.info("使用通义千问模型")
-            return 'qwen'
-        elif self.baidu_api_key and self.baidu_secret_key:
-            logger.info("使用百度文心一言模型")
-            return 'baidu'
-        elif self.zhipu_api_key:
-            logger.info("使用智谱AI模型")
-            return 'zhipu'
-        elif self.openai_api_key:
-            logger.info("使用OpenAI模型")
-            return 'openai'
-        else:
-            logger.info("没有配置API密钥，使用本地模拟模型")
-            return 'mock'
+            models.append('qwen')
+        if self.baidu_api_key and self.baidu_secret_key:
+            models.append('baidu')
+        if self.zhipu_api_key:
+            models.append('zhipu')
+        if self.openai_api_key:
+            models.append('openai')
+        return models
+    
+    def _select_available_model(self):
+        """选择优先级最高的可用大模型"""
+        model_names = {'qwen': '通义千问', 'baidu': '百度文心一言', 'zhipu': '智谱AI', 'openai': 'OpenAI'}
+        if self.available_models:
+            logger.info(f"使用{'、'.join(model_names[model] for model in self.available_models)}模型（按延迟和可用性路由）")
+            return self.available_models[0]
+        logger.info("没有配置API密钥，使用本地模拟模型")
+        return 'mock'
     
     def speech_to_text_web_api(self, audio_blob_url: str) -> str:
         """
@@ -119,16 +138,8 @@ class AIInterviewerService:
             return ""
         
         try:
-            # 获取access_token
-            token_url = "https://aip.baidubce.com/oauth/2.0/token"
-            token_params = {
-                'grant_type': 'client_credentials',
-                'client_id': self.baidu_api_key,
-                'client_secret': self.baidu_secret_key
-            }
-            
-            token_response = requests.post(token_url, params=token_params)
-            access_token = token_response.json().get('access_token')
+            # 获取access_token（有效期内复用缓存）
+            access_token = baidu_access_token(self.baidu_api_key, self.baidu_secret_key)
             
             if not access_token:
                 logger.error("获取百度API access_token失败")
@@ -154,12 +165,14 @@ class AIInterviewerService:
                 'Content-Type': 'application/json'
             }
             
-            response = requests.post(asr_url, data=json.dumps(asr_data), headers=headers)
+            response = post('baidu', asr_url, data=json.dumps(asr_data), headers=headers)
             result = response.json()
             
             if result.get('err_no') == 0:
                 return result.get('result', [''])[0]
             else:
+                if result.get('err_no') in BAIDU_ASR_TOKEN_ERRORS:
+                    invalidate_token('baidu', self.baidu_api_key)
                 logger.error(f"百度语音识别错误: {result.get('err_msg')}")
                 return ""
                 
@@ -180,8 +193,23 @@ class AIInterviewerService:
             AI面试官的回应
         """
         try:
-            # 构建提示词
-            current_prompt = f"""
+            current_prompt = self._build_prompt(question, user_answer)
+            
+            # 按延迟和熔断状态依次尝试配置的模型，全部不可用时才使用模拟回应
+            result = self.router.call(lambda model: self._call_model(model, current_prompt, context))
+            if result is None:
+                if self.available_models:
+                    logger.warning("所有大模型服务都不可用，使用本地模拟回应")
+                return self._get_mock_response(question, user_answer)
+            return result
+                
+        except Exception as e:
+            logger.error(f"AI面试官回应生成失败: {str(e)}")
+            return self._get_mock_response(question, user_answer)
+    
+    def _build_prompt(self, question: str, user_answer: str) -> str:
+        """构建面试官评价回答的提示词"""
+        return f"""
 面试问题：{question}
 
 候选人回答：{user_answer}
@@ -202,175 +230,301 @@ class AIInterviewerService:
     "company_scenario": "公司场景问题（可选）"
 }}
 """
-            
-            # 根据选择的模型调用相应API
-            if self.selected_model == 'qwen':
-                return self._call_qwen_api(current_prompt)
-            elif self.selected_model == 'baidu':
-                return self._call_baidu_api(current_prompt)
-            elif self.selected_model == 'zhipu':
-                return self._call_zhipu_api(current_prompt)
-            elif self.selected_model == 'openai':
-                return self._call_openai_api(current_prompt, context)
-            else:
-                return self._get_mock_response(question, user_answer)
-                
+    
+    def stream_ai_response(self, question: str, user_answer: str, context: List[Dict] = None) -> Iterator[Tuple[str, Dict]]:
+        """
+        流式获取AI面试官回应
+        
+        依次产生 ('feedback', {'text': 新增的反馈文字})，最后产生 ('result', 完整的结构化回应)。
+        模型在输出任何内容之前失败时使用模拟回应；输出中途中断时用已收到的内容作为结果。
+        """
+        prompt = self._build_prompt(question, user_answer)
+        parser = FeedbackStreamParser()
+        decision = self.router.new_decision(streaming=True)
+        try:
+            for model in decision['order']:
+                if not self.router.acquire(model):
+                    continue
+                decision['attempted'].append(model)
+                started = time.perf_counter()
+                first_chunk = None  # 首个片段的到达时间，作为流式调用的延迟
+                try:
+                    for chunk in self._stream_completion(model, prompt, context):
+                        if first_chunk is None:
+                            first_chunk = time.perf_counter() - started
+                        delta = parser.feed(chunk)
+                        if delta:
+                            yield 'feedback', {'text': delta}
+                except GeneratorExit:
+                    # 浏览器断开连接（只会发生在 yield 处，已经收到片段）：服务商在正常输出，
+                    # 按成功记录，同时释放半开状态的试探名额
+                    self.router.record(model, True, first_chunk, streaming=True)
+                    decision['provider'] = model
+                    raise
+                except Exception as e:
+                    self.router.record(model, False, time.perf_counter() - started, str(e), streaming=True)
+                    logger.error(f"AI面试官流式回应中断({model}): {str(e)}")
+                    if not parser.text:
+                        # 还没有输出任何内容，换下一个模型
+                        continue
+                else:
+                    latency = first_chunk if first_chunk is not None else time.perf_counter() - started
+                    self.router.record(model, True, latency, streaming=True)
+                decision['provider'] = model
+                break
+        finally:
+            self.router.finish_decision(decision)
+        
+        if not parser.text.strip():
+            result = self._get_mock_response(question, user_answer)
+            yield 'feedback', {'text': result.get('feedback', '')}
+            yield 'result', result
+            return
+        
+        result = self._parse_json_response(parser.text)
+        if parser.feedback and result.get('feedback') == parser.text:
+            # JSON不完整（输出中断）时只保留已经解析出的反馈
+            result['feedback'] = parser.feedback
+        yield 'result', result
+    
+    def _stream_completion(self, model: str, prompt: str, context: List[Dict] = None) -> Iterator[str]:
+        """流式调用指定的模型，逐个返回新生成的文本片段"""
+        if model == 'qwen':
+            return self._stream_qwen_api(prompt)
+        elif model == 'baidu':
+            return self._stream_baidu_api(prompt)
+        elif model == 'zhipu':
+            return self._stream_zhipu_api(prompt)
+        elif model == 'openai':
+            return self._stream_openai_api(prompt, context)
+        raise ValueError(f"未知的模型: {model}")
+    
+    def _stream_qwen_api(self, prompt: str) -> Iterator[str]:
+        """流式调用通义千问API（incremental_output 使每个事件只包含新增的文本）"""
+        headers = {
+            'Authorization': f'Bearer {self.qwen_api_key}',
+            'Content-Type': 'application/json',
+            'X-DashScope-SSE': 'enable'
+        }
+        data = {
+            "model": "qwen-turbo",
+            "input": {
+                "messages": [
+                    {"role": "user", "content": prompt}
+                ]
+            },
+            "parameters": {
+                "temperature": 0.7,
+                "max_tokens": 800,
+                "incremental_output": True
+            }
+        }
+        
+        with post('qwen', self.qwen_api_url, headers=headers, json=data, stream=True) as response:
+            if response.status_code != 200:
+                raise Exception(f"通义千问API调用失败: {response.text}")
+            for event_data in iter_sse_data(response):
+                result = json.loads(event_data)
+                if 'output' not in result:
+                    raise Exception(f"通义千问API调用失败: {result}")
+                yield result['output'].get('text') or ''
+    
+    def _stream_baidu_api(self, prompt: str) -> Iterator[str]:
+        """流式调用百度文心一言API"""
+        access_token = baidu_access_token(self.baidu_api_key, self.baidu_secret_key)
+        if not access_token:
+            raise Exception("获取百度API access_token失败")
+        
+        api_url = f"https://aip.baidubce.com/rpc/2.0/ai_custom/v1/wenxinworkshop/chat/completions?access_token={access_token}"
+        data = {
+            "messages": [{"role": "user", "content": prompt}],
+            "temperature": 0.7,
+            "max_output_tokens": 800,
+            "stream": True
+        }
+        
+        with post('baidu', api_url, headers={'Content-Type': 'application/json'}, json=data, stream=True) as response:
+            # 出错时返回的是普通JSON而不是SSE
+            if not response.headers.get('Content-Type', '').startswith('text/event-stream'):
+                result = response.json()
+                if result.get('error_code') in BAIDU_TOKEN_ERROR_CODES:
+                    invalidate_token('baidu', self.baidu_api_key)
+                raise Exception(f"百度文心一言API调用失败: {result}")
+            for event_data in iter_sse_data(response):
+                result = json.loads(event_data)
+                yield result.get('result') or ''
+                if result.get('is_end'):
+                    break
+    
+    def _stream_zhipu_api(self, prompt: str) -> Iterator[str]:
+        """流式调用智谱AI API"""
+        headers = {
+            'Authorization': f'Bearer {zhipu_token(self.zhipu_api_key)}',
+            'Content-Type': 'application/json'
+        }
+        data = {
+            "model": "glm-4",
+            "messages": [{"role": "user", "content": prompt}],
+            "temperature": 0.7,
+            "max_tokens": 800,
+            "stream": True
+        }
+        
+        with post('zhipu', "https://open.bigmodel.cn/api/paas/v4/chat/completions",
+                  headers=headers, json=data, stream=True) as response:
+            if response.status_code != 200:
+                if response.status_code == 401:
+                    invalidate_token('zhipu', self.zhipu_api_key)
+                raise Exception(f"智谱AI API调用失败: {response.text}")
+            for event_data in iter_sse_data(response):
+                if event_data == '[DONE]':
+                    break
+                choices = json.loads(event_data).get('choices') or [{}]
+                yield (choices[0].get('delta') or {}).get('content') or ''
+    
+    def _stream_openai_api(self, prompt: str, context: List[Dict] = None) -> Iterator[str]:
+        """流式调用OpenAI API"""
+        messages = [self.interviewer_persona]
+        if context:
+            messages.extend(context)
+        messages.append({'role': 'user', 'content': prompt})
+        
+        stream = self._get_openai_client().chat.completions.create(
+            model="gpt-3.5-turbo",
+            messages=messages,
+            max_tokens=800,
+            temperature=0.7,
+            stream=True
+        )
+        for chunk in stream:
+            if chunk.choices:
+                yield chunk.choices[0].delta.content or ''
+    
+    def _call_model(self, model: str, prompt: str, context: List[Dict] = None) -> Dict:
+        """调用指定的模型，失败时抛出异常（由路由器记录并换下一个模型）"""
+        try:
+            if model == 'qwen':
+                return self._call_qwen_api(prompt)
+            elif model == 'baidu':
+                return self._call_baidu_api(prompt)
+            elif model == 'zhipu':
+                return self._call_zhipu_api(prompt)
+            elif model == 'openai':
+                return self._call_openai_api(prompt, context)
+            raise ValueError(f"未知的模型: {model}")
         except Exception as e:
-            logger.error(f"AI面试官回应生成失败: {str(e)}")
-            return self._get_mock_response(question, user_answer)
+            logger.error(f"{model} API异常: {str(e)}")
+            raise
     
     def _call_qwen_api(self, prompt: str) -> Dict:
         """调用通义千问API"""
-        try:
-            headers = {
-                'Authorization': f'Bearer {self.qwen_api_key}',
-                'Content-Type': 'application/json'
-            }
-            
-            data = {
-                "model": "qwen-turbo",
-                "input": {
-                    "messages": [
-                        {"role": "user", "content": prompt}
-                    ]
-                },
-                "parameters": {
-                    "temperature": 0.7,
-                    "max_tokens": 800
-                }
+        headers = {
+            'Authorization': f'Bearer {self.qwen_api_key}',
+            'Content-Type': 'application/json'
+        }
+        
+        data = {
+            "model": "qwen-turbo",
+            "input": {
+                "messages": [
+                    {"role": "user", "content": prompt}
+                ]
+            },
+            "parameters": {
+                "temperature": 0.7,
+                "max_tokens": 800
             }
-            
-            response = requests.post(self.qwen_api_url, headers=headers, json=data)
-            result = response.json()
-            
-            if response.status_code == 200 and 'output' in result:
-                ai_response = result['output']['text']
-                return self._parse_json_response(ai_response)
-            else:
-                logger.error(f"通义千问API调用失败: {result}")
-                return self._get_mock_response("", "")
-                
-        except Exception as e:
-            logger.error(f"通义千问API异常: {str(e)}")
-            return self._get_mock_response("", "")
+        }
+        
+        response = post('qwen', self.qwen_api_url, headers=headers, json=data)
+        result = response.json()
+        
+        if response.status_code == 200 and 'output' in result:
+            ai_response = result['output']['text']
+            return self._parse_json_response(ai_response)
+        raise Exception(f"通义千问API调用失败: {result}")
     
     def _call_baidu_api(self, prompt: str) -> Dict:
         """调用百度文心一言API"""
-        try:
-            # 获取access_token
-            token_url = "https://aip.baidubce.com/oauth/2.0/token"
-            token_params = {
-                'grant_type': 'client_credentials',
-                'client_id': self.baidu_api_key,
-                'client_secret': self.baidu_secret_key
-            }
-            
-            token_response = requests.post(token_url, params=token_params)
-            access_token = token_response.json().get('access_token')
-            
-            if not access_token:
-                logger.error("获取百度API access_token失败")
-                return self._get_mock_response("", "")
-            
-            # 调用文心一言API
-            api_url = f"https://aip.baidubce.com/rpc/2.0/ai_custom/v1/wenxinworkshop/chat/completions?access_token={access_token}"
-            
-            headers = {'Content-Type': 'application/json'}
-            data = {
-                "messages": [{"role": "user", "content": prompt}],
-                "temperature": 0.7,
-                "max_output_tokens": 800
-            }
-            
-            response = requests.post(api_url, headers=headers, json=data)
-            result = response.json()
-            
-            if response.status_code == 200 and 'result' in result:
-                ai_response = result['result']
-                return self._parse_json_response(ai_response)
-            else:
-                logger.error(f"百度文心一言API调用失败: {result}")
-                return self._get_mock_response("", "")
-                
-        except Exception as e:
-            logger.error(f"百度文心一言API异常: {str(e)}")
-            return self._get_mock_response("", "")
+        # 获取access_token（有效期内复用缓存）
+        access_token = baidu_access_token(self.baidu_api_key, self.baidu_secret_key)
+        
+        if not access_token:
+            raise Exception("获取百度API access_token失败")
+        
+        # 调用文心一言API
+        api_url = f"https://aip.baidubce.com/rpc/2.0/ai_custom/v1/wenxinworkshop/chat/completions?access_token={access_token}"
+        
+        headers = {'Content-Type': 'application/json'}
+        data = {
+            "messages": [{"role": "user", "content": prompt}],
+            "temperature": 0.7,
+            "max_output_tokens": 800
+        }
+        
+        response = post('baidu', api_url, headers=headers, json=data)
+        result = response.json()
+        
+        if response.status_code == 200 and 'result' in result:
+            ai_response = result['result']
+            return self._parse_json_response(ai_response)
+        if result.get('error_code') in BAIDU_TOKEN_ERROR_CODES:
+            invalidate_token('baidu', self.baidu_api_key)
+        raise Exception(f"百度文心一言API调用失败: {result}")
     
     def _call_zhipu_api(self, prompt: str) -> Dict:
         """调用智谱AI API"""
-        try:
-            import jwt
-            import time
-            
-            # 生成JWT token
-            def generate_token(apikey: str, exp_seconds: int = 3600):
-                try:
-                    id, secret = apikey.split(".")
-                except Exception:
-                    raise Exception("invalid apikey")
-                
-                payload = {
-                    "iss": id,
-                    "exp": int(round(time.time() * 1000)) + exp_seconds * 1000,
-                    "timestamp": int(round(time.time() * 1000)),
-                }
-                
-                return jwt.encode(payload, secret, algorithm="HS256", headers={"alg": "HS256", "sign_type": "SIGN"})
-            
-            token = generate_token(self.zhipu_api_key)
-            
-            headers = {
-                'Authorization': f'Bearer {token}',
-                'Content-Type': 'application/json'
-            }
-            
-            data = {
-                "model": "glm-4",
-                "messages": [{"role": "user", "content": prompt}],
-                "temperature": 0.7,
-                "max_tokens": 800
-            }
-            
-            response = requests.post("https://open.bigmodel.cn/api/paas/v4/chat/completions", headers=headers, json=data)
-            result = response.json()
-            
-            if response.status_code == 200 and 'choices' in result:
-                ai_response = result['choices'][0]['message']['content']
-                return self._parse_json_response(ai_response)
-            else:
-                logger.error(f"智谱AI API调用失败: {result}")
-                return self._get_mock_response("", "")
-                
-        except Exception as e:
-            logger.error(f"智谱AI API异常: {str(e)}")
-            return self._get_mock_response("", "")
+        # JWT token 在有效期内复用
+        token = zhipu_token(self.zhipu_api_key)
+        
+        headers = {
+            'Authorization': f'Bearer {token}',
+            'Content-Type': 'application/json'
+        }
+        
+        data = {
+            "model": "glm-4",
+            "messages": [{"role": "user", "content": prompt}],
+            "temperature": 0.7,
+            "max_tokens": 800
+        }
+        
+        response = post('zhipu', "https://open.bigmodel.cn/api/paas/v4/chat/completions", headers=headers, json=data)
+        result = response.json()
+        
+        if response.status_code == 200 and 'choices' in result:
+            ai_response = result['choices'][0]['message']['content']
+            return self._parse_json_response(ai_response)
+        if response.status_code == 401:
+            invalidate_token('zhipu', self.zhipu_api_key)
+        raise Exception(f"智谱AI API调用失败: {result}")
     
     def _call_openai_api(self, prompt: str, context: List[Dict] = None) -> Dict:
         """调用OpenAI API"""
-        try:
-            messages = [self.interviewer_persona]
-            if context:
-                messages.extend(context)
-            messages.append({'role': 'user', 'content': prompt})
-            
-            client = openai.OpenAI(
+        messages = [self.interviewer_persona]
+        if context:
+            messages.extend(context)
+        messages.append({'role': 'user', 'content': prompt})
+        
+        response = self._get_openai_client().chat.completions.create(
+            model="gpt-3.5-turbo",
+            messages=messages,
+            max_tokens=800,
+            temperature=0.7
+        )
+        
+        ai_response = response.choices[0].message.content
+        return self._parse_json_response(ai_response)
+    
+    def _get_openai_client(self):
+        """第一次调用时创建OpenAI客户端，之后复用"""
+        if self._openai_client is None:
+            self._openai_client = openai.OpenAI(
                 api_key=self.openai_api_key,
-                base_url=self.openai_base_url
-            )
-            
-            response = client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=messages,
-                max_tokens=800,
-                temperature=0.7
+                base_url=self.openai_base_url,
+                timeout=openai.Timeout(READ_TIMEOUT, connect=CONNECT_TIMEOUT)
             )
-            
-            ai_response = response.choices[0].message.content
-            return self._parse_json_response(ai_response)
-            
-        except Exception as e:
-            logger.error(f"OpenAI API异常: {str(e)}")
-            return self._get_mock_response("", "")
+        return self._openai_client
     
     def _parse_json_response(self, ai_response: str) -> Dict:
         """解析AI模型返回的JSON响应"""
@@ -1,16 +1,36 @@
-from flask import Flask, request, jsonify, render_template, send_from_directory
+from flask import Flask, Response, request, jsonify, render_template, send_from_directory, stream_with_context
 from flask_cors import CORS
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import func
+from sqlalchemy.orm import joinedload, contains_eager, load_only
 from datetime import datetime, timedelta
 import json
 import os
 from dotenv import load_dotenv
 
-from models import db, User, Question, LearningRecord, KnowledgePoint, UserKnowledgeStats, InterviewPreparationPlan, WrongQuestion, SimilarQuestion
+from models import db, User, Question, LearningRecord, KnowledgePoint, UserKnowledgeStats, InterviewPreparationPlan, WrongQuestion
+from stats_summary import get_or_create_summary
+from bank_version import BankVersionCache, QUESTION_BANK_MODES
+from similarity_index import SimilarityIndexStore, TOP_K as SIMILAR_TOP_K
+from similar_questions import (
+    SimilarQuestionWorker, build_similar_question, load_generated, load_similar_questions
+)
+from tokenizer import prepare_tokenizer
+from pagination import (
+    InvalidCursor, keyset_page, cached_count, clamp_per_page, paginate_with_cached_count
+)
+from serializers import (
+    resolve_fields, question_load_options, learning_record_load_options, wrong_question_load_options,
+    serialize_questions, serialize_learning_record, serialize_wrong_question
+)
 from recommendation_engine import RecommendationEngine
+from review_scheduler import apply_review, due_query
 from external_platforms import platform_manager
 from data_generator import generate_sample_data
-from theory_grader import grade_theory_answer, grade_fill_blank_answer
+from theory_grader import (
+    grade_theory_answer, grade_fill_blank_answer, grade_answers_bulk, warm_reference_cache, grading_cache_stats,
+    REFERENCE_CACHE_SIZE
+)
 
 
 # 加载环境变量
@@ -27,6 +47,9 @@ CORS(app)
 
 # 初始化推荐引擎
 recommendation_engine = RecommendationEngine()
+tech_stack_cache = BankVersionCache()
+similarity_indexes = SimilarityIndexStore()
+similar_question_worker = SimilarQuestionWorker(app, similarity_indexes)
 
 def create_tables():
     """创建数据库表"""
@@ -38,6 +61,17 @@ def create_tables():
             print("生成示例数据...")
             generate_sample_data()
             print("示例数据生成完成！")
+        
+        prepare_tokenizer()
+        warm_grading_cache()
+        similarity_indexes.warm()
+
+def warm_grading_cache():
+    """预先处理主观题的标准答案（需要在应用上下文中调用），首批评分请求不必再分词标准答案"""
+    answers = db.session.query(Question.id, Question.correct_answer)\
+                        .filter(Question.question_type.notin_(['multiple_choice', 'fill_blank', 'coding']))\
+                        .order_by(Question.id).limit(REFERENCE_CACHE_SIZE).all()
+    return warm_reference_cache(answers)
 
 # ==================== 用户相关API ====================
 
@@ -58,15 +92,21 @@ def get_user_stats(user_id):
     """获取用户学习统计"""
     user = User.query.get_or_404(user_id)
     
-    # 基础统计
-    total_questions = LearningRecord.query.filter_by(user_id=user_id).count()
-    correct_answers = LearningRecord.query.filter_by(user_id=user_id, is_correct=True).count()
+    # 基础统计（读取预先汇总的统计行，首次访问时从历史记录生成）
+    summary = get_or_create_summary(user_id)
+    if summary.id is None:
+        db.session.commit()
+    total_questions = summary.total_questions
+    correct_answers = summary.correct_answers
     
     # 知识点统计
-    knowledge_stats = UserKnowledgeStats.query.filter_by(user_id=user_id).all()
+    knowledge_stats = UserKnowledgeStats.query.options(joinedload(UserKnowledgeStats.knowledge_point))\
+                                              .filter_by(user_id=user_id).all()
     
     # 最近学习记录 (获取更多记录用于统计，前端会自行筛选本周数据)
-    recent_records = LearningRecord.query.filter_by(user_id=user_id)\
+    # 题目和知识点通过JOIN一次加载，避免 to_dict() 逐条懒加载
+    recent_records = LearningRecord.query.options(*learning_record_load_options())\
+                                        .filter_by(user_id=user_id)\
                                         .order_by(LearningRecord.completed_at.desc())\
                                         .limit(100).all()  # 增加到100条，覆盖更长时间段
     
@@ -74,26 +114,63 @@ def get_user_stats(user_id):
         'user': user.to_dict(),
         'total_questions': total_questions,
         'correct_answers': correct_answers,
-        'accuracy_rate': correct_answers / total_questions if total_questions > 0 else 0,
+        'accuracy_rate': summary.accuracy_rate,
         'knowledge_stats': [stat.to_dict() for stat in knowledge_stats],
-        'recent_records': [record.to_dict() for record in recent_records]
+        'recent_records': [serialize_learning_record(record) for record in recent_records]
     }
     
     return jsonify(stats)
 
 # ==================== 题目相关API ====================
 
-@app.route('/api/questions', methods=['GET'])
-def get_questions():
-    """获取题目列表"""
+def paginated_questions_response(query, count_key, mode, fields):
+    """
+    题目列表分页
+
+    - 传入 cursor 参数（第一页传空值）时使用游标分页，按题目id升序，
+      返回 next_cursor / has_more；include_total=true 时附带缓存的总数
+    - 否则保持旧的 page/per_page 分页，总数走缓存
+    """
+    if 'cursor' in request.args:
+        per_page = clamp_per_page(request.args.get('per_page', type=int))
+        try:
+            questions, next_cursor = keyset_page(query, Question.id, request.args.get('cursor'), per_page)
+        except InvalidCursor as e:
+            return jsonify({'error': str(e)}), 400
+
+        result = {
+            'questions': serialize_questions(questions, fields),
+            'next_cursor': next_cursor,
+            'has_more': next_cursor is not None,
+            'per_page': per_page,
+            'mode': mode
+        }
+        if request.args.get('include_total', 'false').lower() == 'true':
+            result['total'] = cached_count(query, count_key)
+        return jsonify(result)
+
     page = request.args.get('page', 1, type=int)
     per_page = request.args.get('per_page', 20, type=int)
+    questions = paginate_with_cached_count(query, count_key, page, per_page)
+
+    return jsonify({
+        'questions': serialize_questions(questions.items, fields),
+        'total': questions.total,
+        'pages': questions.pages,
+        'current_page': page,
+        'mode': mode
+    })
+
+@app.route('/api/questions', methods=['GET'])
+def get_questions():
+    """获取题目列表（支持 page/per_page 分页和 cursor 游标分页）"""
     question_type = request.args.get('type')
     difficulty = request.args.get('difficulty')
     knowledge_point_id = request.args.get('knowledge_point_id', type=int)
     mode = request.args.get('mode', 'academic')  # 新增：题库模式过滤
+    fields = resolve_fields(request.args.get('fields'))  # full（默认）或 light
     
-    query = Question.query
+    query = Question.query.options(*question_load_options(fields))
     
     # 过滤条件
     if question_type:
@@ -105,15 +182,8 @@ def get_questions():
     if mode:
         query = query.filter(Question.question_bank_mode == mode)
     
-    questions = query.paginate(page=page, per_page=per_page, error_out=False)
-    
-    return jsonify({
-        'questions': [q.to_dict() for q in questions.items],
-        'total': questions.total,
-        'pages': questions.pages,
-        'current_page': page,
-        'mode': mode
-    })
+    count_key = ('questions', question_type, difficulty, knowledge_point_id, mode)
+    return paginated_questions_response(query, count_key, mode, fields)
 
 @app.route('/api/questions/<int:question_id>', methods=['GET'])
 def get_question(question_id):
@@ -141,26 +211,23 @@ def get_recommendations(user_id):
 
 # ==================== 学习记录API ====================
 
-@app.route('/api/learning-records', methods=['POST'])
-def submit_answer():
-    """提交答案并记录学习过程"""
-    data = request.get_json()
-    
-    required_fields = ['user_id', 'question_id', 'user_answer', 'time_spent', 'interaction_type']
-    if not all(field in data for field in required_fields):
-        return jsonify({'error': '缺少必要字段'}), 400
-    
-    user_id = data['user_id']
-    question_id = data['question_id']
-    user_answer = data['user_answer']
-    time_spent = data['time_spent']
-    interaction_type = data['interaction_type']
-    
-    # 获取题目和用户
-    question = Question.query.get_or_404(question_id)
-    user = User.query.get_or_404(user_id)
+class SimpleExecutionResult:
+    """编程题的简化执行结果（代码在CodePen中运行，服务器端只做基本检查）"""
+    def __init__(self, success, score):
+        self.success = success
+        self.output = "代码已提交，使用CodePen进行测试和调试"
+        self.error = "" if success else "代码格式需要改进"
+        self.execution_time = 0
+        self.test_cases_passed = int(score * 3) if score > 0 else 0  # 模拟测试用例通过数
+        self.total_test_cases = 3  # 假设有3个测试用例
+
+def grade_submission(question, user_answer):
+    """
+    根据题型评判答案
     
-    # 判断答案正确性
+    Returns:
+        (is_correct, partial_score, execution_result, grading_result)
+    """
     is_correct = False
     execution_result = None
     grading_result = None
@@ -193,20 +260,10 @@ def submit_answer():
             is_correct = False
             partial_score = 0.0
         
-        # 创建一个简单的执行结果对象
-        class SimpleExecutionResult:
-            def __init__(self, success, score):
-                self.success = success
-                self.output = "代码已提交，使用CodePen进行测试和调试"
-                self.error = "" if success else "代码格式需要改进"
-                self.execution_time = 0
-                self.test_cases_passed = int(score * 3) if score > 0 else 0  # 模拟测试用例通过数
-                self.total_test_cases = 3  # 假设有3个测试用例
-        
         execution_result = SimpleExecutionResult(is_correct, partial_score)
     elif question.question_type == 'theory':
         # 理论题使用智能评分系统
-        grading_result = grade_theory_answer(user_answer, question.correct_answer, question.content)
+        grading_result = grade_theory_answer(user_answer, question.correct_answer, question.content, question.id)
         is_correct = grading_result['is_correct']
         partial_score = grading_result['score']
     elif question.question_type == 'multiple_choice':
@@ -221,11 +278,130 @@ def submit_answer():
         grading_result = fill_blank_result  # 保持反馈格式一致
     else:
         # 其他类型题目使用智能评分（如实践题等）
-        grading_result = grade_theory_answer(user_answer, question.correct_answer, question.content)
+        grading_result = grade_theory_answer(user_answer, question.correct_answer, question.content, question.id)
         is_correct = grading_result['is_correct']
         partial_score = grading_result['score']
     
+    return is_correct, partial_score, execution_result, grading_result
+
+ANSWER_ITEM_FIELDS = ('question_id', 'user_answer', 'time_spent', 'interaction_type')
+
+def is_integer(value):
+    """JSON中的整数（bool 是 int 的子类，需要排除）"""
+    return isinstance(value, int) and not isinstance(value, bool)
+
+def validate_answer_item(answer):
+    """校验批量提交中的一项答案，合法时返回 None，否则返回错误信息"""
+    if not isinstance(answer, dict) or not all(field in answer for field in ANSWER_ITEM_FIELDS):
+        return '缺少必要字段'
+    if not is_integer(answer['question_id']):
+        return 'question_id 必须是整数'
+    if not isinstance(answer['user_answer'], str):
+        return 'user_answer 必须是字符串'
+    time_spent = answer['time_spent']
+    if not is_integer(time_spent) or time_spent < 0:
+        return 'time_spent 必须是非负整数'
+    if not isinstance(answer['interaction_type'], str):
+        return 'interaction_type 必须是字符串'
+    return None
+
+def is_wrong_answer(is_correct, partial_score):
+    """低于60%就认为是错题"""
+    return not is_correct and partial_score < 0.6
+
+def compute_mastery_level(correct_attempts, total_attempts):
+    """掌握程度 (简单算法: 正确率 * 0.7 + 练习频率 * 0.3)"""
+    if not total_attempts:
+        return 0.0
+    accuracy = correct_attempts / total_attempts
+    practice_frequency = min(total_attempts / 10.0, 1.0)  # 最多10次达到满分
+    return accuracy * 0.7 + practice_frequency * 0.3
+
+def apply_answer_to_stats(user_stats, is_correct, time_spent, practice_time):
+    """把一次作答累加到用户知识点统计上"""
+    # 更新统计数据（确保默认值）
+    if user_stats.total_attempts is None:
+        user_stats.total_attempts = 0
+    if user_stats.correct_attempts is None:
+        user_stats.correct_attempts = 0
+    if user_stats.total_time_spent is None:
+        user_stats.total_time_spent = 0
+    
+    user_stats.total_attempts += 1
+    if is_correct:
+        user_stats.correct_attempts += 1
+    
+    user_stats.total_time_spent += time_spent
+    user_stats.average_time = user_stats.total_time_spent / user_stats.total_attempts
+    user_stats.last_practice_time = practice_time
+    
+    user_stats.mastery_level = compute_mastery_level(user_stats.correct_attempts, user_stats.total_attempts)
+
+def build_submission_response(question, learning_record, updated_stats, is_correct, partial_score,
+                              execution_result, grading_result):
+    """构建单次作答的响应数据（单条提交与批量提交共用）"""
+    response_data = {
+        'is_correct': is_correct,
+        'partial_score': partial_score,
+        'score_percentage': round(partial_score * 100, 1),
+        'correct_answer': question.correct_answer,
+        'explanation': question.explanation,
+        'learning_record_id': learning_record.id,
+        'updated_stats': updated_stats,
+        'added_to_wrong_questions': is_wrong_answer(is_correct, partial_score)
+    }
+    
+    # 如果是编程题，包含执行结果
+    if execution_result:
+        response_data['execution_result'] = {
+            'success': execution_result.success,
+            'output': execution_result.output,
+            'error': execution_result.error,
+            'execution_time': execution_result.execution_time,
+            'test_cases_passed': execution_result.test_cases_passed,
+            'total_test_cases': execution_result.total_test_cases
+        }
+    
+    # 如果是理论题或实践题，包含详细的评分反馈
+    if grading_result:
+        response_data['grading_result'] = {
+            'feedback': grading_result['feedback'],
+            'encouragement': grading_result['encouragement'],
+            'correct_keywords': grading_result['correct_keywords'],
+            'missing_keywords': grading_result['missing_keywords'],
+            'incorrect_parts': grading_result['incorrect_parts'],
+            'detailed_analysis': grading_result['detailed_analysis']
+        }
+    
+    return response_data
+
+@app.route('/api/learning-records', methods=['POST'])
+def submit_answer():
+    """提交答案并记录学习过程"""
+    data = request.get_json()
+    
+    required_fields = ['user_id', 'question_id', 'user_answer', 'time_spent', 'interaction_type']
+    if not all(field in data for field in required_fields):
+        return jsonify({'error': '缺少必要字段'}), 400
+    
+    user_id = data['user_id']
+    question_id = data['question_id']
+    user_answer = data['user_answer']
+    time_spent = data['time_spent']
+    interaction_type = data['interaction_type']
+    
+    # 获取题目和用户
+    question = Question.query.get_or_404(question_id)
+    user = User.query.get_or_404(user_id)
+    
+    # 判断答案正确性
+    is_correct, partial_score, execution_result, grading_result = grade_submission(question, user_answer)
+    
+    # 统计汇总需要在添加新记录之前取出（首次会从历史记录生成）
+    summary = get_or_create_summary(user_id)
+    
     # 创建学习记录
+    now = datetime.utcnow()
     learning_record = LearningRecord(
         user_id=user_id,
         question_id=question_id,
@@ -234,8 +410,8 @@ def submit_answer():
         time_spent=time_spent,
         user_answer=user_answer,
         interaction_type=interaction_type,
-        started_at=datetime.utcnow() - timedelta(seconds=time_spent),
-        completed_at=datetime.utcnow()
+        started_at=now - timedelta(seconds=time_spent),
+        completed_at=now
     )
     
     db.session.add(learning_record)
@@ -254,31 +430,13 @@ def submit_answer():
         )
         db.session.add(user_stats)
     
-    # 更新统计数据（确保默认值）
-    if user_stats.total_attempts is None:
-        user_stats.total_attempts = 0
-    if user_stats.correct_attempts is None:
-        user_stats.correct_attempts = 0
-    if user_stats.total_time_spent is None:
-        user_stats.total_time_spent = 0
-    
-    user_stats.total_attempts += 1
-    if is_correct:
-        user_stats.correct_attempts += 1
-    
-    user_stats.total_time_spent += time_spent
-    user_stats.average_time = user_stats.total_time_spent / user_stats.total_attempts
-    user_stats.last_practice_time = datetime.utcnow()
-    
-    # 计算掌握程度 (简单算法: 正确率 * 0.7 + 练习频率 * 0.3)
-    accuracy = user_stats.correct_attempts / user_stats.total_attempts
-    practice_frequency = min(user_stats.total_attempts / 10.0, 1.0)  # 最多10次达到满分
-    user_stats.mastery_level = accuracy * 0.7 + practice_frequency * 0.3
-    
-    db.session.commit()
+    old_mastery = user_stats.mastery_level if user_stats.id is not None else None
+    apply_answer_to_stats(user_stats, is_correct, time_spent, now)
+    summary.record_answer(is_correct, time_spent, old_mastery, user_stats.mastery_level)
     
     # 如果答错了，自动添加到错题本
-    if not is_correct and partial_score < 0.6:  # 低于60%就认为是错题
+    wrong_question = None
+    if is_wrong_answer(is_correct, partial_score):
         existing_wrong = WrongQuestion.query.filter_by(
             user_id=user_id,
             question_id=question_id,
@@ -289,49 +447,290 @@ def submit_answer():
             wrong_question = WrongQuestion(
                 user_id=user_id,
                 question_id=question_id,
-                learning_record_id=learning_record.id,
+                learning_record=learning_record,
                 wrong_answer=user_answer,
                 correct_answer=question.correct_answer,
                 question_bank_mode=question.question_bank_mode or 'academic'
             )
             db.session.add(wrong_question)
-            db.session.commit()
     
-    # 准备响应
-    response_data = {
-        'is_correct': is_correct,
-        'partial_score': partial_score,
-        'score_percentage': round(partial_score * 100, 1),
-        'correct_answer': question.correct_answer,
-        'explanation': question.explanation,
-        'learning_record_id': learning_record.id,
-        'updated_stats': user_stats.to_dict(),
-        'added_to_wrong_questions': not is_correct and partial_score < 0.6
-    }
+    # 学习记录、知识点统计、统计汇总和错题在同一个事务中提交
+    db.session.commit()
     
-    # 如果是编程题，包含执行结果
-    if execution_result:
-        response_data['execution_result'] = {
-            'success': execution_result.success,
-            'output': execution_result.output,
-            'error': execution_result.error,
-            'execution_time': execution_result.execution_time,
-            'test_cases_passed': execution_result.test_cases_passed,
-            'total_test_cases': execution_result.total_test_cases
+    response_data = build_submission_response(
+        question, learning_record, user_stats.to_dict(),
+        is_correct, partial_score, execution_result, grading_result
+    )
+    
+    # 提交成功后再更新推荐引擎的用户画像缓存，新加入错题本的题目在后台生成举一反三题目
+    recommendation_engine.update_user_model(
+        user_id, question_id, is_correct, time_spent,
+        knowledge_point_id=question.knowledge_point_id, question_type=question.question_type, completed_at=now,
+        question_bank_mode=question.question_bank_mode
+    )
+    if wrong_question is not None:
+        similar_question_worker.submit(question_id, wrong_question.id)
+    
+    return jsonify(response_data)
+
+@app.route('/api/learning-records/batch', methods=['POST'])
+def submit_answers_batch():
+    """
+    批量提交答案（练习结束时提交每日6题、离线客户端同步等场景）
+    
+    请求体: {"user_id": 1, "answers": [{"question_id", "user_answer", "time_spent", "interaction_type"}, ...]}
+    题目、知识点统计和错题各用一次查询预取，所有写入在一个事务中提交。
+    每一项的结果与单条提交接口的响应格式相同，无法处理的项返回 error 字段。
+    """
+    data = request.get_json() or {}
+    
+    user_id = data.get('user_id')
+    answers = data.get('answers')
+    if user_id is None or not isinstance(answers, list) or not answers:
+        return jsonify({'error': '缺少必要字段'}), 400
+    if not is_integer(user_id):
+        return jsonify({'error': 'user_id 必须是整数'}), 400
+    
+    User.query.get_or_404(user_id)
+    
+    # 逐项校验，不合法的项单独报错，不影响其余答案
+    item_errors = [validate_answer_item(answer) for answer in answers]
+    question_ids = {answer['question_id'] for answer, error in zip(answers, item_errors) if error is None}
+    
+    # 预取：题目（连同知识点）、知识点统计、已有错题，各一次查询
+    questions = {}
+    if question_ids:
+        questions = {
+            q.id: q for q in Question.query.options(joinedload(Question.knowledge_point))
+                                           .filter(Question.id.in_(question_ids)).all()
         }
     
-    # 如果是理论题或实践题，包含详细的评分反馈
-    if grading_result:
-        response_data['grading_result'] = {
-            'feedback': grading_result['feedback'],
-            'encouragement': grading_result['encouragement'],
-            'correct_keywords': grading_result['correct_keywords'],
-            'missing_keywords': grading_result['missing_keywords'],
-            'incorrect_parts': grading_result['incorrect_parts'],
-            'detailed_analysis': grading_result['detailed_analysis']
+    knowledge_point_ids = {q.knowledge_point_id for q in questions.values()}
+    stats_by_kp = {}
+    if knowledge_point_ids:
+        stats_by_kp = {
+            s.knowledge_point_id: s for s in UserKnowledgeStats.query.filter(
+                UserKnowledgeStats.user_id == user_id,
+                UserKnowledgeStats.knowledge_point_id.in_(knowledge_point_ids)
+            ).all()
         }
     
-    return jsonify(response_data)
+    wrong_by_key = {}
+    if questions:
+        wrong_by_key = {
+            (w.question_id, w.question_bank_mode): w for w in WrongQuestion.query.filter(
+                WrongQuestion.user_id == user_id,
+                WrongQuestion.question_id.in_(list(questions.keys()))
+            ).all()
+        }
+    new_wrong_questions = []
+    
+    summary = get_or_create_summary(user_id)
+    
+    now = datetime.utcnow()
+    results = [None] * len(answers)
+    graded = []
+    
+    for index, answer in enumerate(answers):
+        if item_errors[index] is not None:
+            results[index] = {'index': index, 'error': item_errors[index]}
+            continue
+        
+        question = questions.get(answer['question_id'])
+        if question is None:
+            results[index] = {'index': index, 'question_id': answer['question_id'], 'error': '题目不存在'}
+            continue
+        
+        user_answer = answer['user_answer']
+        time_spent = answer['time_spent']
+        is_correct, partial_score, execution_result, grading_result = grade_submission(question, user_answer)
+        
+        learning_record = LearningRecord(
+            user_id=user_id,
+            question_id=question.id,
+            is_correct=is_correct,
+            partial_score=partial_score,
+            time_spent=time_spent,
+            user_answer=user_answer,
+            interaction_type=answer['interaction_type'],
+            started_at=now - timedelta(seconds=time_spent),
+            completed_at=now
+        )
+        db.session.add(learning_record)
+        
+        user_stats = stats_by_kp.get(question.knowledge_point_id)
+        old_mastery = user_stats.mastery_level if user_stats else None
+        if not user_stats:
+            user_stats = UserKnowledgeStats(
+                user_id=user_id,
+                knowledge_point_id=question.knowledge_point_id,
+                knowledge_point=question.knowledge_point
+            )
+            db.session.add(user_stats)
+            stats_by_kp[question.knowledge_point_id] = user_stats
+        
+        apply_answer_to_stats(user_stats, is_correct, time_spent, now)
+        summary.record_answer(is_correct, time_spent, old_mastery, user_stats.mastery_level)
+        # 同一知识点可能出现多次，记录作答当时的统计快照
+        stats_snapshot = {
+            'total_attempts': user_stats.total_attempts,
+            'correct_attempts': user_stats.correct_attempts,
+            'accuracy_rate': user_stats.accuracy_rate,
+            'total_time_spent': user_stats.total_time_spent,
+            'average_time': user_stats.average_time,
+            'mastery_level': user_stats.mastery_level,
+            'last_practice_time': now.isoformat()
+        }
+        
+        if is_wrong_answer(is_correct, partial_score):
+            mode = question.question_bank_mode or 'academic'
+            if (question.id, mode) not in wrong_by_key:
+                wrong_question = WrongQuestion(
+                    user_id=user_id,
+                    question_id=question.id,
+                    learning_record=learning_record,
+                    wrong_answer=user_answer,
+                    correct_answer=question.correct_answer,
+                    question_bank_mode=mode
+                )
+                db.session.add(wrong_question)
+                wrong_by_key[(question.id, mode)] = wrong_question
+                new_wrong_questions.append(wrong_question)
+        
+        graded.append((index, question, learning_record, user_stats, stats_snapshot,
+                       is_correct, partial_score, execution_result, grading_result))
+    
+    # flush 之后主键已分配，在提交前构建响应，避免提交后逐行刷新过期对象
+    db.session.flush()
+    
+    profile_updates = []
+    for (index, question, learning_record, user_stats, stats_snapshot,
+         is_correct, partial_score, execution_result, grading_result) in graded:
+        profile_updates.append((question.id, is_correct, learning_record.time_spent,
+                                question.knowledge_point_id, question.question_type, question.question_bank_mode))
+        updated_stats = user_stats.to_dict()
+        updated_stats.update(stats_snapshot)
+        item = build_submission_response(
+            question, learning_record, updated_stats,
+            is_correct, partial_score, execution_result, grading_result
+        )
+        item['index'] = index
+        item['question_id'] = question.id
+        results[index] = item
+    similar_keys = [(wq.question_id, wq.id) for wq in new_wrong_questions]
+    
+    db.session.commit()
+    
+    # 提交成功后再更新推荐引擎的用户画像缓存，新加入错题本的题目在后台生成举一反三题目
+    for question_id, is_correct, time_spent, knowledge_point_id, question_type, mode in profile_updates:
+        recommendation_engine.update_user_model(
+            user_id, question_id, is_correct, time_spent,
+            knowledge_point_id=knowledge_point_id, question_type=question_type, completed_at=now,
+            question_bank_mode=mode
+        )
+    similar_question_worker.submit_all(similar_keys)
+    
+    return jsonify({
+        'user_id': user_id,
+        'results': results,
+        'count': len(graded),
+        'failed': len(answers) - len(graded)
+    })
+
+BATCH_GRADING_LIMIT = 2000  # 单次批量评分请求最多包含的答案数量
+BULK_GRADING_TYPES = ('theory', 'fill_blank', 'practical')
+GRADING_TEXT_FIELDS = ('correct_answer', 'question_type', 'question_content')
+
+def validate_grading_item(item):
+    """校验批量评分中的一项，合法时返回 None，否则返回错误信息"""
+    if not isinstance(item, dict) or 'user_answer' not in item:
+        return '缺少必要字段'
+    if not isinstance(item['user_answer'], str):
+        return 'user_answer 必须是字符串'
+    if item.get('question_id') is not None:
+        if not is_integer(item['question_id']):
+            return 'question_id 必须是整数'
+        return None
+    if 'correct_answer' not in item:
+        return '缺少必要字段'
+    for field in GRADING_TEXT_FIELDS:
+        if field in item and not isinstance(item[field], str):
+            return f'{field} 必须是字符串'
+    return None
+
+@app.route('/api/grading/batch', methods=['POST'])
+def grade_answers_batch():
+    """
+    批量评分（不写入学习记录），用于调整评分规则后试评或外部系统批量评分
+    
+    请求体: {"items": [{"question_id", "user_answer"} 或 {"user_answer", "correct_answer", "question_type", "question_content"}, ...]}
+    给出 question_id 时标准答案和题型从题库读取（一次查询预取）；直接给出标准答案时题型默认为 theory。
+    支持理论题、填空题和实践题；无法评分的项返回 error 字段。
+    本接口始终在当前进程内评分（grade_answers_bulk 的 workers=1）：进程池只在命令行脚本中运行
+    （regrade_records.py），多线程的Web进程中不创建子进程。
+    """
+    data = request.get_json() or {}
+    items = data.get('items')
+    if not isinstance(items, list) or not items:
+        return jsonify({'error': '缺少必要字段'}), 400
+    if len(items) > BATCH_GRADING_LIMIT:
+        return jsonify({'error': f'单次最多评分 {BATCH_GRADING_LIMIT} 个答案'}), 400
+    
+    item_errors = [validate_grading_item(item) for item in items]
+    question_ids = {item['question_id'] for item, error in zip(items, item_errors)
+                    if error is None and item.get('question_id') is not None}
+    questions = {}
+    if question_ids:
+        questions = {
+            q.id: q for q in Question.query.options(
+                load_only(Question.id, Question.content, Question.correct_answer, Question.question_type)
+            ).filter(Question.id.in_(question_ids)).all()
+        }
+    
+    results = [None] * len(items)
+    pending = []
+    for index, item in enumerate(items):
+        if item_errors[index] is not None:
+            results[index] = {'index': index, 'error': item_errors[index]}
+            continue
+        
+        if item.get('question_id') is not None:
+            question = questions.get(item['question_id'])
+            if question is None:
+                results[index] = {'index': index, 'error': '题目不存在'}
+                continue
+            grading_item = (question.question_type, item['user_answer'], question.correct_answer,
+                            question.content, question.id)
+        else:
+            grading_item = (item.get('question_type', 'theory'), item['user_answer'], item['correct_answer'],
+                            item.get('question_content', ''), None)
+        
+        if grading_item[0] not in BULK_GRADING_TYPES:
+            results[index] = {'index': index, 'error': '该题型不支持批量评分'}
+            continue
+        pending.append((index, grading_item))
+    
+    graded = grade_answers_bulk((grading_item for _, grading_item in pending), workers=1)
+    for (index, grading_item), grading_result in zip(pending, graded):
+        results[index] = {
+            'index': index,
+            'question_id': grading_item[4],
+            'is_correct': grading_result['is_correct'],
+            'partial_score': grading_result['score'],
+            'score_percentage': round(grading_result['score'] * 100, 1),
+            'grading_result': grading_result
+        }
+    
+    return jsonify({
+        'results': results,
+        'count': len(pending),
+        'failed': len(items) - len(pending)
+    })
+
+@app.route('/api/grading/cache-stats', methods=['GET'])
+def get_grading_cache_stats():
+    """评分结果缓存的命中统计（当前进程；批量评分子进程中的命中不计入）"""
+    return jsonify(grading_cache_stats())
 
 # ==================== 编程题执行API (已废弃，使用CodePen) ====================
 
@@ -376,11 +775,12 @@ def get_knowledge_points():
 def get_knowledge_point_questions(kp_id):
     """获取知识点相关题目"""
     knowledge_point = KnowledgePoint.query.get_or_404(kp_id)
-    questions = Question.query.filter_by(knowledge_point_id=kp_id).all()
+    fields = resolve_fields(request.args.get('fields'))
+    questions = Question.query.options(*question_load_options(fields)).filter_by(knowledge_point_id=kp_id).all()
     
     return jsonify({
         'knowledge_point': knowledge_point.to_dict(),
-        'questions': [q.to_dict() for q in questions]
+        'questions': serialize_questions(questions, fields)
     })
 
 # ==================== 学习路径API ====================
@@ -403,17 +803,21 @@ def get_user_progress(user_id):
     """获取用户总体学习进度"""
     user = User.query.get_or_404(user_id)
     
-    # 计算总体进度
+    # 计算总体进度（掌握分布直接读取汇总行）
     total_knowledge_points = KnowledgePoint.query.count()
-    user_stats = UserKnowledgeStats.query.filter_by(user_id=user_id).all()
+    summary = get_or_create_summary(user_id)
+    if summary.id is None:
+        db.session.commit()
+    user_stats = UserKnowledgeStats.query.options(joinedload(UserKnowledgeStats.knowledge_point))\
+                                         .filter_by(user_id=user_id).all()
     
     progress_data = {
         'user': user.to_dict(),
         'total_knowledge_points': total_knowledge_points,
-        'mastered_knowledge_points': len([s for s in user_stats if s.mastery_level > 0.7]),
-        'learning_knowledge_points': len([s for s in user_stats if 0.3 <= s.mastery_level <= 0.7]),
-        'weak_knowledge_points': len([s for s in user_stats if s.mastery_level < 0.3]),
-        'overall_progress': sum(s.mastery_level for s in user_stats) / total_knowledge_points if total_knowledge_points > 0 else 0,
+        'mastered_knowledge_points': summary.mastered_knowledge_points,
+        'learning_knowledge_points': summary.learning_knowledge_points,
+        'weak_knowledge_points': summary.weak_knowledge_points,
+        'overall_progress': summary.mastery_sum / total_knowledge_points if total_knowledge_points > 0 else 0,
         'knowledge_point_details': [s.to_dict() for s in user_stats]
     }
     
@@ -470,7 +874,7 @@ def get_hot_interview_questions():
     category = request.args.get('category', 'all')
     limit = int(request.args.get('limit', 10))
     
-    query = Question.query.filter_by(question_bank_mode='interview')
+    query = Question.query.options(*question_load_options()).filter_by(question_bank_mode='interview')
     
     if category != 'all':
         # 根据知识点类别筛选
@@ -481,7 +885,7 @@ def get_hot_interview_questions():
     # 可以添加热度排序逻辑，这里暂时按创建时间倒序
     questions = query.order_by(Question.created_at.desc()).limit(limit).all()
     
-    return jsonify([q.to_dict() for q in questions])
+    return jsonify(serialize_questions(questions))
 
 @app.route('/api/interview/plan', methods=['POST'])
 def create_interview_plan():
@@ -519,22 +923,48 @@ def get_user_interview_plans(user_id):
     plans = InterviewPreparationPlan.query.filter_by(user_id=user_id).all()
     return jsonify([plan.to_dict() for plan in plans])
 
+@app.route('/api/interview/ai-response/stream', methods=['POST'])
+def stream_interviewer_response():
+    """
+    流式获取AI面试官对回答的评价（text/event-stream）
+    
+    请求体: {"question": "面试问题", "user_answer": "候选人回答", "context": [对话上下文]}
+    反馈文字生成时以 feedback 事件逐段发送，结束时发送 result 事件（完整的结构化回应）。
+    浏览器端用 fetch 读取响应流（EventSource 只支持GET）。
+    """
+    data = request.get_json() or {}
+    question = data.get('question')
+    user_answer = data.get('user_answer')
+    if not question or user_answer is None:
+        return jsonify({'error': '缺少必要字段'}), 400
+    
+    # 面试官服务依赖可选的大模型SDK，只在使用时导入
+    from ai_interviewer_service import ai_interviewer
+    from interview_stream import format_sse
+    
+    def generate():
+        for event, payload in ai_interviewer.stream_ai_response(question, user_answer, data.get('context')):
+            yield format_sse(event, payload)
+    
+    return Response(stream_with_context(generate()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/api/interview/ai-providers/stats', methods=['GET'])
+def get_ai_provider_stats():
+    """AI面试官各大模型服务商的延迟（EWMA/p95）、错误率、熔断状态和最近的路由决策"""
+    from ai_interviewer_service import ai_interviewer
+    
+    stats = ai_interviewer.router.snapshot()
+    stats['success'] = True
+    return jsonify(stats)
+
 @app.route('/api/questions/by-mode/<mode>', methods=['GET'])
 def get_questions_by_mode(mode):
-    """根据模式获取题目"""
-    page = int(request.args.get('page', 1))
-    per_page = int(request.args.get('per_page', 20))
+    """根据模式获取题目（支持 page/per_page 分页和 cursor 游标分页）"""
+    fields = resolve_fields(request.args.get('fields'))
     
-    query = Question.query.filter_by(question_bank_mode=mode)
-    questions = query.paginate(page=page, per_page=per_page, error_out=False)
-    
-    return jsonify({
-        'questions': [q.to_dict() for q in questions.items],
-        'total': questions.total,
-        'pages': questions.pages,
-        'current_page': page,
-        'mode': mode
-    })
+    query = Question.query.options(*question_load_options(fields)).filter_by(question_bank_mode=mode)
+    return paginated_questions_response(query, ('questions', None, None, None, mode), mode, fields)
 
 @app.route('/api/knowledge-points/by-mode/<mode>', methods=['GET'])
 def get_knowledge_points_by_mode(mode):
@@ -610,8 +1040,12 @@ def tech_stack_practice(category):
 def get_tech_stack_questions(category):
     """获取指定技术栈的题目列表"""
     try:
-        # 获取该技术栈分类下的所有题目
-        questions = db.session.query(Question).join(KnowledgePoint).filter(
+        # 获取该技术栈分类下的所有题目（只读取列表需要的列，知识点复用JOIN结果）
+        questions = db.session.query(Question).join(KnowledgePoint).options(
+            load_only(Question.id, Question.title, Question.content, Question.difficulty,
+                      Question.question_type, Question.estimated_time, Question.knowledge_point_id),
+            contains_eager(Question.knowledge_point)
+        ).filter(
             KnowledgePoint.category == category,
             KnowledgePoint.question_bank_mode == 'interview'
         ).all()
@@ -760,7 +1194,7 @@ def delete_company(company_id):
 @app.route('/api/companies/<company_id>/questions')
 def get_company_questions(company_id):
     """获取特定公司的面试题目"""
-    questions = Question.query.filter_by(question_bank_mode='interview').limit(10).all()
+    questions = Question.query.options(*question_load_options()).filter_by(question_bank_mode='interview').limit(10).all()
     
     return jsonify([{
         'id': q.id,
@@ -776,59 +1210,65 @@ def get_company_questions(company_id):
     } for q in questions])
 
 # 技术栈相关API
+def compute_tech_stack_stats():
+    """
+    一次分组查询统计面试模式下每个技术栈的题目数、难度分布和前3个知识点
+
+    按 (分类, 知识点, 难度) 分组，只返回计数，不加载题目内容。
+    """
+    from sqlalchemy import func
+
+    rows = db.session.query(
+        KnowledgePoint.category,
+        KnowledgePoint.id,
+        KnowledgePoint.name,
+        Question.difficulty,
+        func.count(Question.id)
+    ).outerjoin(Question).filter(
+        KnowledgePoint.question_bank_mode == 'interview'
+    ).group_by(
+        KnowledgePoint.category, KnowledgePoint.id, KnowledgePoint.name, Question.difficulty
+    ).order_by(KnowledgePoint.category, KnowledgePoint.id).all()
+
+    categories = {}
+    for category, kp_id, kp_name, difficulty, count in rows:
+        stat = categories.setdefault(category, {'total': 0, 'difficulty': {}, 'topic_ids': [], 'topics': []})
+        stat['total'] += count
+        if difficulty is not None:
+            stat['difficulty'][difficulty] = stat['difficulty'].get(difficulty, 0) + count
+        # 同一知识点会按难度出现多行，按知识点id去重
+        if len(stat['topic_ids']) < 3 and kp_id not in stat['topic_ids']:
+            stat['topic_ids'].append(kp_id)
+            stat['topics'].append(kp_name)
+
+    result = []
+    for category, stat in categories.items():
+        total = stat['total']
+        if total > 0:
+            difficulty_distribution = {
+                level: round((stat['difficulty'].get(level, 0) / total) * 100)
+                for level in ('easy', 'medium', 'hard')
+            }
+        else:
+            difficulty_distribution = {'easy': 30, 'medium': 50, 'hard': 20}
+
+        topics = [name[:25] + "..." if len(name) > 25 else name for name in stat['topics']]
+
+        result.append({
+            'category': category,
+            'question_count': total,
+            'difficulty_distribution': difficulty_distribution,
+            'topics': topics,
+            'practice_url': f'/interview/tech-stack/{category}/practice'
+        })
+    return result
+
 @app.route('/api/tech-stacks')
 def get_tech_stacks():
     """获取技术栈列表和统计"""
     try:
-        from sqlalchemy import func
-        
-        # 获取面试模式下的技术栈统计
-        tech_stats = db.session.query(
-            KnowledgePoint.category,
-            func.count(Question.id).label('question_count')
-        ).outerjoin(Question).filter(
-            KnowledgePoint.question_bank_mode == 'interview'
-        ).group_by(KnowledgePoint.category).all()
-        
-        # 计算每个技术栈的难度分布
-        result = []
-        for stat in tech_stats:
-            # 获取该技术栈的所有题目
-            questions = db.session.query(Question).join(KnowledgePoint).filter(
-                KnowledgePoint.category == stat.category,
-                KnowledgePoint.question_bank_mode == 'interview'
-            ).all()
-            
-            # 计算难度分布
-            total = len(questions)
-            if total > 0:
-                easy_count = len([q for q in questions if q.difficulty == 'easy'])
-                medium_count = len([q for q in questions if q.difficulty == 'medium'])
-                hard_count = len([q for q in questions if q.difficulty == 'hard'])
-                
-                difficulty_distribution = {
-                    'easy': round((easy_count / total) * 100),
-                    'medium': round((medium_count / total) * 100),
-                    'hard': round((hard_count / total) * 100)
-                }
-            else:
-                difficulty_distribution = {'easy': 30, 'medium': 50, 'hard': 20}
-            
-            # 获取该分类下的知识点作为topics
-            knowledge_points = db.session.query(KnowledgePoint.name).filter(
-                KnowledgePoint.category == stat.category,
-                KnowledgePoint.question_bank_mode == 'interview'
-            ).limit(3).all()
-            
-            topics = [kp.name[:25] + "..." if len(kp.name) > 25 else kp.name for kp in knowledge_points]
-            
-            result.append({
-                'category': stat.category,
-                'question_count': stat.question_count,
-                'difficulty_distribution': difficulty_distribution,
-                'topics': topics,
-                'practice_url': f'/interview/tech-stack/{stat.category}/practice'
-            })
+        # 统计结果按面试题库版本号缓存，题目/知识点/公司有写入时自动失效
+        result = tech_stack_cache.get_or_compute('interview', 'tech_stacks', compute_tech_stack_stats)
         
         # 如果没有数据，返回默认的技术栈
         if not result:
@@ -920,9 +1360,15 @@ def get_tech_stacks():
 
 @app.route('/api/wrong-questions/<int:user_id>')
 def get_wrong_questions(user_id):
-    """获取用户的错题本"""
+    """
+    获取用户的错题本
+    
+    不带 cursor 参数时返回全部错题（最近加入的在前）；传入 cursor（第一页传空值）时按错题id降序游标分页，
+    返回 next_cursor / has_more，include_total=true 时附带总数。
+    """
     try:
         mode = request.args.get('mode', 'academic')  # academic 或 interview
+        fields = resolve_fields(request.args.get('fields'))
         
         # 1. 验证用户是否存在
         user = User.query.get(user_id)
@@ -938,44 +1384,37 @@ def get_wrong_questions(user_id):
             db.session.add(user)
             db.session.commit()
         
-        # 2. 获取错题
-        wrong_questions = WrongQuestion.query.filter_by(
+        # 2. 获取错题（题目和知识点批量预加载）
+        query = WrongQuestion.query.options(*wrong_question_load_options(fields)).filter_by(
             user_id=user_id,
             question_bank_mode=mode
-        ).order_by(WrongQuestion.created_at.desc()).all()
+        )
         
-        # 3. 确保所有相关的数据都被加载
-        result_list = []
-        for wq in wrong_questions:
+        paginated = 'cursor' in request.args
+        if paginated:
+            per_page = clamp_per_page(request.args.get('per_page', type=int))
             try:
-                question_dict = wq.question.to_dict() if wq.question else None
-                if question_dict and wq.question.knowledge_point:
-                    question_dict['knowledge_point'] = wq.question.knowledge_point.to_dict()
-                
-                wq_dict = {
-                    'id': wq.id,
-                    'user_id': wq.user_id,
-                    'question_id': wq.question_id,
-                    'learning_record_id': wq.learning_record_id,
-                    'wrong_answer': wq.wrong_answer,
-                    'correct_answer': wq.correct_answer,
-                    'review_count': wq.review_count,
-                    'mastery_level': wq.mastery_level,
-                    'next_review_date': wq.next_review_date.isoformat() if wq.next_review_date else None,
-                    'created_at': wq.created_at.isoformat() if wq.created_at else None,
-                    'updated_at': wq.updated_at.isoformat() if wq.updated_at else None,
-                    'question': question_dict
-                }
-                result_list.append(wq_dict)
-            except Exception as e:
-                print(f"Error processing wrong question {wq.id}: {str(e)}")
-                continue
+                wrong_questions, next_cursor = keyset_page(
+                    query, WrongQuestion.id, request.args.get('cursor'), per_page, descending=True
+                )
+            except InvalidCursor as e:
+                return jsonify({'success': False, 'error': str(e), 'wrong_questions': [], 'count': 0}), 400
+        else:
+            wrong_questions = query.order_by(WrongQuestion.created_at.desc()).all()
         
-        return jsonify({
+        # 3. 序列化（题目已预加载，不会逐条查询）
+        result_list = [serialize_wrong_question(wq, fields) for wq in wrong_questions]
+        
+        result = {
             'success': True,
             'wrong_questions': result_list,
             'count': len(result_list)
-        })
+        }
+        if paginated:
+            result.update({'next_cursor': next_cursor, 'has_more': next_cursor is not None, 'per_page': per_page})
+            if request.args.get('include_total', 'false').lower() == 'true':
+                result['total'] = query.order_by(None).count()
+        return jsonify(result)
         
     except Exception as e:
         print(f"Error in get_wrong_questions: {str(e)}")
@@ -986,6 +1425,48 @@ def get_wrong_questions(user_id):
             'count': 0
         }), 500
 
+@app.route('/api/wrong-questions/<int:user_id>/due')
+def get_due_wrong_questions(user_id):
+    """
+    获取到期需要复习的错题（最早到期的在前）
+    
+    查询参数: mode（academic/interview）、limit（默认20，最大100）、fields（full/light）
+    查询走 (user_id, question_bank_mode, next_review_date) 索引，只取一批并批量预加载题目；
+    这一批没有取满时到期总数就是本批数量，否则在同一个索引上直接 COUNT（复习后到期数立即变化，不缓存）。
+    """
+    try:
+        mode = request.args.get('mode', 'academic')
+        if mode not in QUESTION_BANK_MODES:
+            return jsonify({'success': False, 'error': f'无效的题库模式: {mode}', 'wrong_questions': [], 'count': 0}), 400
+        fields = resolve_fields(request.args.get('fields'))
+        limit = clamp_per_page(request.args.get('limit', type=int))
+        
+        due = due_query(user_id, mode)
+        wrong_questions = due.options(*wrong_question_load_options(fields))\
+                             .order_by(WrongQuestion.next_review_date, WrongQuestion.id)\
+                             .limit(limit).all()
+        if len(wrong_questions) < limit:
+            total_due = len(wrong_questions)
+        else:
+            total_due = due.count()
+        
+        return jsonify({
+            'success': True,
+            'wrong_questions': [serialize_wrong_question(wq, fields) for wq in wrong_questions],
+            'count': len(wrong_questions),
+            'total_due': total_due,
+            'mode': mode
+        })
+    
+    except Exception as e:
+        print(f"Error in get_due_wrong_questions: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': str(e),
+            'wrong_questions': [],
+            'count': 0
+        }), 500
+
 @app.route('/api/wrong-questions', methods=['POST'])
 def add_wrong_question():
     """添加错题到错题本"""
@@ -1004,10 +1485,11 @@ def add_wrong_question():
             question_bank_mode=mode
         ).first()
         
+        now = datetime.utcnow()
         if existing:
             # 更新错误答案
             existing.wrong_answer = wrong_answer
-            existing.updated_at = datetime.now()
+            existing.updated_at = now
         else:
             # 创建新的错题记录
             question = Question.query.get(question_id)
@@ -1023,6 +1505,10 @@ def add_wrong_question():
         
         db.session.commit()
         
+        if not existing:
+            recommendation_engine.co_mistakes.record_mistake(user_id, question_id, now)
+            similar_question_worker.submit(question_id, wrong_question.id)
+        
         return jsonify({
             'success': True,
             'message': '错题已添加到错题本'
@@ -1042,28 +1528,17 @@ def review_wrong_question(wrong_question_id):
         if not wrong_question:
             return jsonify({'error': '错题不存在'}), 404
         
-        # 更新复习信息
-        wrong_question.review_count += 1
-        wrong_question.mastery_level = mastery_level
-        wrong_question.last_review_date = datetime.now()
-        
-        # 计算下次复习时间（基于遗忘曲线）
-        if mastery_level >= 4:
-            # 掌握较好，延长复习间隔
-            next_days = [7, 15, 30, 60, 120][min(wrong_question.review_count, 4)]
-        else:
-            # 掌握不好，缩短复习间隔
-            next_days = [1, 3, 7, 15, 30][min(wrong_question.review_count, 4)]
-        
-        wrong_question.next_review_date = datetime.now() + timedelta(days=next_days)
-        wrong_question.updated_at = datetime.now()
+        # 更新复习信息，按 SM-2 计算下次复习时间
+        apply_review(wrong_question, mastery_level)
         
         db.session.commit()
         
         return jsonify({
             'success': True,
             'message': '复习记录已更新',
-            'next_review_date': wrong_question.next_review_date.isoformat()
+            'next_review_date': wrong_question.next_review_date.isoformat(),
+            'interval_days': wrong_question.interval_days,
+            'ease_factor': wrong_question.ease_factor
         })
     except Exception as e:
         db.session.rollback()
@@ -1071,129 +1546,25 @@ def review_wrong_question(wrong_question_id):
 
 @app.route('/api/wrong-questions/<int:wrong_question_id>/similar', methods=['POST'])
 def generate_similar_questions(wrong_question_id):
-    """为错题生成举一反三题目"""
+    """
+    获取错题的举一反三题目
+    错题加入错题本时已在后台生成，这里直接返回已有结果；还没有生成的提交同一个去重任务后
+    立即返回 202（pending），稍后再请求即可
+    """
     try:
-        wrong_question = WrongQuestion.query.get(wrong_question_id)
+        wrong_question = db.session.get(WrongQuestion, wrong_question_id)
         if not wrong_question:
             return jsonify({'error': '错题不存在'}), 404
         
-        original_question = wrong_question.question
-        
-        # 构建生成提示词
-        prompt = f"""
-基于以下错题，生成3道相似的题目用于举一反三练习：
-
-原题标题：{original_question.title}
-原题内容：{original_question.content}
-题目类型：{original_question.question_type}
-难度：{original_question.difficulty}
-知识点：{original_question.knowledge_point.name if original_question.knowledge_point else ''}
-
-要求：
-1. 保持相同的知识点和难度
-2. 变换题目的具体场景和参数
-3. 题目要有一定的区分度
-4. 提供标准答案和解析
-
-请按照以下JSON格式返回：
-[
-    {{
-        "title": "题目标题",
-        "content": "题目内容",
-        "correct_answer": "正确答案",
-        "explanation": "答案解析",
-        "similarity_type": "相似类型"
-    }},
-    ...
-]
-"""
-        
-        # 使用AI服务生成相似题目的建议
-        ai_response = "基于错题分析，建议加强以下知识点的练习：" + original_question.knowledge_point.name if original_question.knowledge_point else "相关基础概念"
-        
-        # 解析AI响应并保存相似题目
-        similar_questions = []
-        
-        # 从数据库中查找相似的题目
-        # 1. 相同知识点的其他题目
-        similar_from_db = Question.query.filter(
-            Question.knowledge_point_id == original_question.knowledge_point_id,
-            Question.id != original_question.id,
-            Question.question_bank_mode == wrong_question.question_bank_mode
-        ).limit(3).all()
-        
-        # 2. 如果不够，从相同难度和类型的题目中找
-        if len(similar_from_db) < 3:
-            additional = Question.query.filter(
-                Question.difficulty == original_question.difficulty,
-                Question.question_type == original_question.question_type,
-                Question.id != original_question.id,
-                Question.question_bank_mode == wrong_question.question_bank_mode,
-                Question.knowledge_point_id != original_question.knowledge_point_id
-            ).limit(3 - len(similar_from_db)).all()
-            similar_from_db.extend(additional)
-        
-        # 3. 如果还是不够，使用模板题目
-        if len(similar_from_db) == 0:
-            templates = [
-                {
-                    "title": f"{original_question.title} - 变式练习",
-                    "content": f"基于 {original_question.knowledge_point.name if original_question.knowledge_point else '相关知识点'} 的类似问题练习",
-                    "similarity_type": "knowledge_point_similar"
-                },
-                {
-                    "title": f"相关练习题 - {original_question.question_type}",
-                    "content": f"针对 {original_question.difficulty} 难度的 {original_question.question_type} 题目练习",
-                    "similarity_type": "type_similar"
-                }
-            ]
-            
-            for template in templates:
-                similar_question = SimilarQuestion(
-                    original_question_id=original_question.id,
-                    wrong_question_id=wrong_question_id,
-                    title=template['title'],
-                    content=template['content'],
-                    question_type=original_question.question_type,
-                    difficulty=original_question.difficulty,
-                    estimated_time=original_question.estimated_time,
-                    similarity_type=template['similarity_type'],
-                    similarity_score=0.6,
-                    generated_by='template',
-                    generation_prompt=prompt,
-                    correct_answer=f"参考原题答案：{original_question.correct_answer}",
-                    explanation=f"参考原题解析：{original_question.explanation}",
-                    question_bank_mode=wrong_question.question_bank_mode
-                )
-                
-                db.session.add(similar_question)
-                similar_questions.append(similar_question)
-        else:
-            # 将数据库中的真实题目转换为相似题目记录
-            for i, db_question in enumerate(similar_from_db):
-                similarity_types = ["knowledge_point_match", "difficulty_match", "type_match"]
-                
-                similar_question = SimilarQuestion(
-                    original_question_id=original_question.id,
-                    wrong_question_id=wrong_question_id,
-                    title=db_question.title,
-                    content=db_question.content,
-                    question_type=db_question.question_type,
-                    difficulty=db_question.difficulty,
-                    estimated_time=db_question.estimated_time,
-                    similarity_type=similarity_types[i % len(similarity_types)],
-                    similarity_score=0.9 if db_question.knowledge_point_id == original_question.knowledge_point_id else 0.7,
-                    generated_by='database_match',
-                    generation_prompt=prompt,
-                    correct_answer=db_question.correct_answer,
-                    explanation=db_question.explanation,
-                    question_bank_mode=wrong_question.question_bank_mode
-                )
-                
-                db.session.add(similar_question)
-                similar_questions.append(similar_question)
-        
-        db.session.commit()
+        similar_questions = load_generated(wrong_question.question_id, wrong_question.id)
+        if not similar_questions:
+            similar_question_worker.submit(wrong_question.question_id, wrong_question.id)
+            return jsonify({
+                'success': True,
+                'pending': True,
+                'message': '相似题目正在生成，请稍后再试',
+                'similar_questions': []
+            }), 202
         
         return jsonify({
             'success': True,
@@ -1207,15 +1578,23 @@ def generate_similar_questions(wrong_question_id):
 
 @app.route('/api/similar-questions/<int:question_id>')
 def get_similar_questions(question_id):
-    """获取指定题目的相似题目"""
+    """获取指定题目的相似题目（来自相似题目索引，不写入数据库）"""
     try:
-        similar_questions = SimilarQuestion.query.filter_by(
-            original_question_id=question_id
-        ).all()
+        limit = min(request.args.get('limit', 3, type=int), SIMILAR_TOP_K)
+        question = db.session.get(Question, question_id)
+        similar_questions = []
+        if question is not None:
+            neighbors = similarity_indexes.neighbors(question.id, question.question_bank_mode, limit=limit)
+            for similar, score in load_similar_questions(neighbors):
+                item = build_similar_question(question, similar, score).to_dict()
+                # 近邻是题库中的真实题目，用题目id作为标识
+                item['id'] = similar.id
+                item['question_id'] = similar.id
+                similar_questions.append(item)
         
         return jsonify({
             'success': True,
-            'similar_questions': [sq.to_dict() for sq in similar_questions]
+            'similar_questions': similar_questions
         })
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -1306,5 +1685,9 @@ if __name__ == '__main__':
             from data_generator import generate_sample_data
             generate_sample_data()
             print("示例数据生成完成！")
+        
+        prepare_tokenizer()
+        warm_grading_cache()
+        similarity_indexes.warm()
     
     app.run(debug=True, host='0.0.0.0', port=8300)
@@ -0,0 +1,128 @@
+"""
+题库版本号与进程内缓存
+
+导入脚本（import_interview_questions.py、init_companies.py 等）和Web服务是不同的进程，
+所以缓存失效不能只靠进程内的标记。这里在数据库里为每个题库模式维护一个版本号：
+
+- 监听 Session 的 before_flush 事件，Question / KnowledgePoint / Company 有新增、修改、删除时，
+  在同一事务里把对应模式的版本号加1（事务回滚时版本号也一起回滚）
+- 批量语句（query.delete()、session.execute(update(Question)) 等）不经过flush，
+  由 do_orm_execute 事件在执行前递增所有模式的版本号（无法从语句判断影响了哪个模式）
+- 直接执行SQL文本的脚本需要自己调用 bump_bank_version
+- BankVersionCache 把计算结果和版本号一起缓存，读取时版本号变了就重新计算
+"""
+
+import threading
+from datetime import datetime
+from typing import Any, Callable, Dict, Hashable, Set, Tuple
+
+from sqlalchemy import event, inspect, insert, select, update
+from sqlalchemy.orm import Session
+
+from models import db, Company, KnowledgePoint, Question, QuestionBankVersion
+
+QUESTION_BANK_MODES = ('academic', 'interview')
+
+_version_table = QuestionBankVersion.__table__
+_checked_engines: Set[str] = set()
+
+
+def _changed_modes(session: Session) -> Set[str]:
+    """收集本次flush中题库数据发生变化的模式"""
+    modes = set()
+    changed = list(session.new) + list(session.deleted) + [
+        obj for obj in session.dirty if session.is_modified(obj, include_collections=False)
+    ]
+
+    for obj in changed:
+        if isinstance(obj, Company):
+            # 公司题库属于面试模式
+            modes.add('interview')
+        elif isinstance(obj, (Question, KnowledgePoint)):
+            history = inspect(obj).attrs.question_bank_mode.history
+            values = list(history.added) + list(history.unchanged) + list(history.deleted)
+            values = [mode for mode in values if mode]
+            # 模式未知时（例如未加载该列）保守地让所有模式失效
+            modes.update(values or QUESTION_BANK_MODES)
+
+    return modes
+
+
+def _ensure_version_table(connection) -> None:
+    """旧数据库可能还没有版本表，首次写入前自动创建"""
+    url = str(connection.engine.url)
+    if url not in _checked_engines:
+        _version_table.create(bind=connection, checkfirst=True)
+        _checked_engines.add(url)
+
+
+@event.listens_for(Session, 'before_flush')
+def _bump_versions_before_flush(session, flush_context, instances):
+    modes = _changed_modes(session)
+    if modes:
+        bump_bank_version(session, modes)
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def _bump_versions_for_bulk_statements(orm_execute_state):
+    if not (orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    mapper = orm_execute_state.bind_mapper
+    if mapper is None:
+        return
+    if issubclass(mapper.class_, Company):
+        bump_bank_version(orm_execute_state.session, ['interview'])
+    elif issubclass(mapper.class_, (Question, KnowledgePoint)):
+        bump_bank_version(orm_execute_state.session, QUESTION_BANK_MODES)
+
+
+def bump_bank_version(session: Session, modes) -> None:
+    """在当前事务中递增指定模式的题库版本号"""
+    connection = session.connection()
+    _ensure_version_table(connection)
+    now = datetime.utcnow()
+
+    for mode in sorted(modes):
+        result = connection.execute(
+            update(_version_table)
+            .where(_version_table.c.question_bank_mode == mode)
+            .values(version=_version_table.c.version + 1, updated_at=now)
+        )
+        if result.rowcount == 0:
+            connection.execute(
+                insert(_version_table).values(question_bank_mode=mode, version=1, updated_at=now)
+            )
+
+
+def get_bank_version(mode: str) -> int:
+    """读取题库版本号，从未写入过的模式为0"""
+    version = db.session.execute(
+        select(_version_table.c.version).where(_version_table.c.question_bank_mode == mode)
+    ).scalar()
+    return version or 0
+
+
+class BankVersionCache:
+    """按题库版本号失效的进程内缓存"""
+
+    def __init__(self):
+        self._entries: Dict[Hashable, Tuple[int, Any]] = {}
+        self._lock = threading.Lock()
+
+    def get_or_compute(self, mode: str, key: Hashable, compute: Callable[[], Any]) -> Any:
+        version = get_bank_version(mode)
+        cache_key = (mode, key)
+
+        with self._lock:
+            entry = self._entries.get(cache_key)
+        if entry is not None and entry[0] == version:
+            return entry[1]
+
+        value = compute()
+        with self._lock:
+            self._entries[cache_key] = (version, value)
+        return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
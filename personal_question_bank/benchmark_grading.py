@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+理论题评分基准测试
+用标准答案片段拼接出不同长度的用户答案，测量单次评分耗时随答案长度的变化，
+并与在完整文本上计算 SequenceMatcher 相似度的耗时和结果对比。
+
+    python benchmark_grading.py                  # 默认长度 100 ~ 20000 字
+    python benchmark_grading.py 500 5000 50000   # 指定答案长度
+"""
+
+import difflib
+import random
+import sys
+import time
+
+import jieba
+import numpy as np
+
+from theory_grader import theory_grader, grade_theory_answer
+
+REFERENCE_ANSWERS = [
+    "数组是一种线性数据结构，存储相同类型的元素，在内存中连续存储，支持随机访问。",
+    "栈是后进先出的数据结构，主要操作是push和pop，常用于函数调用管理。",
+    "队列是先进先出的数据结构，主要操作是enqueue和dequeue，常用于任务调度和广度优先搜索。",
+    "哈希表是通过哈希函数将键映射到数组索引的数据结构，提供快速查找，冲突可以用链地址法或开放寻址法解决。",
+    "快速排序选择一个基准元素，把数组划分为小于和大于基准的两部分后递归排序，平均时间复杂度为O(nlogn)。",
+]
+DEFAULT_LENGTHS = [100, 500, 1000, 2000, 5000, 10000, 20000]
+REPEAT = 10
+
+
+def build_answer(length):
+    """从标准答案中随机截取片段拼接成指定长度的答案"""
+    corpus = ''.join(REFERENCE_ANSWERS)
+    parts = []
+    while sum(map(len, parts)) < length:
+        start = random.randrange(len(corpus) - 20)
+        parts.append(corpus[start:start + random.randint(5, 20)])
+    return ''.join(parts)[:length]
+
+
+def measure(func, repeat=REPEAT):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - started) * 1000)
+    return np.mean(timings)
+
+
+def main():
+    lengths = [int(arg) for arg in sys.argv[1:]] or DEFAULT_LENGTHS
+    random.seed(42)
+    jieba.initialize()
+
+    reference = REFERENCE_ANSWERS[3]
+    reference_clean = theory_grader._clean_text(reference)
+    grade_theory_answer("预热", reference, question_id=1)
+
+    print(f"{'答案长度':>8} {'完整评分':>10} {'相似度':>10} {'完整SequenceMatcher':>20} {'相似度偏差':>10}")
+    for length in lengths:
+        answer = build_answer(length)
+        answer_clean = theory_grader._clean_text(answer)
+
+        grading_ms = measure(lambda: grade_theory_answer(answer, reference, question_id=1))
+        bounded_ms = measure(lambda: theory_grader._calculate_similarity(answer_clean, reference_clean))
+        full_ms = measure(lambda: difflib.SequenceMatcher(None, answer_clean, reference_clean).ratio(), repeat=3)
+
+        deviation = theory_grader._calculate_similarity(answer_clean, reference_clean) - \
+            difflib.SequenceMatcher(None, answer_clean, reference_clean).ratio()
+        print(f"{length:>10} {grading_ms:>10.2f}ms {bounded_ms:>8.2f}ms {full_ms:>18.2f}ms {deviation:>12.4f}")
+
+
+if __name__ == "__main__":
+    main()
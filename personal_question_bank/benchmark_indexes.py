@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+索引基准测试
+在临时SQLite库中生成约100万条学习记录，分别在添加索引前后
+打印各接口热点查询的 EXPLAIN QUERY PLAN 和平均耗时。
+
+    python benchmark_indexes.py                 # 默认100万条学习记录
+    python benchmark_indexes.py 200000          # 指定学习记录数量
+"""
+
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine
+
+from models import db
+from migrate_database import migrate_indexes
+
+USER_COUNT = 2000
+KNOWLEDGE_POINT_COUNT = 200
+QUESTION_COUNT = 5000
+MODES = ['academic', 'interview']
+QUESTION_TYPES = ['theory', 'multiple_choice', 'fill_blank', 'coding']
+DIFFICULTIES = ['easy', 'medium', 'hard']
+CATEGORIES = ['算法', '数据结构', 'JavaScript', 'Vue.js', 'React', 'Golang', '数据库', '操作系统']
+REPEAT = 50
+
+# (名称, 对应接口, SQL, 参数生成函数)
+BENCHMARK_QUERIES = [
+    (
+        "最近学习记录", "GET /api/users/<id>/stats",
+        "SELECT * FROM learning_records WHERE user_id = ? ORDER BY completed_at DESC LIMIT 100",
+        lambda now: (random.randint(1, USER_COUNT),)
+    ),
+    (
+        "30天学习历史", "RecommendationEngine._build_user_profile",
+        "SELECT * FROM learning_records WHERE user_id = ? AND completed_at >= ?",
+        lambda now: (random.randint(1, USER_COUNT), now - timedelta(days=30))
+    ),
+    (
+        "最近做过的题目", "RecommendationEngine._get_candidate_questions",
+        "SELECT question_id FROM learning_records WHERE user_id = ? AND completed_at >= ?",
+        lambda now: (random.randint(1, USER_COUNT), now - timedelta(days=1))
+    ),
+    (
+        "知识点统计查找", "POST /api/learning-records",
+        "SELECT * FROM user_knowledge_stats WHERE user_id = ? AND knowledge_point_id = ?",
+        lambda now: (random.randint(1, USER_COUNT), random.randint(1, KNOWLEDGE_POINT_COUNT))
+    ),
+    (
+        "错题查找", "POST /api/learning-records",
+        "SELECT * FROM wrong_questions WHERE user_id = ? AND question_id = ? AND question_bank_mode = ?",
+        lambda now: (random.randint(1, USER_COUNT), random.randint(1, QUESTION_COUNT), random.choice(MODES))
+    ),
+    (
+        "题目筛选", "GET /api/questions",
+        "SELECT * FROM questions WHERE question_bank_mode = ? AND question_type = ? AND difficulty = ? LIMIT 20",
+        lambda now: (random.choice(MODES), random.choice(QUESTION_TYPES), random.choice(DIFFICULTIES))
+    ),
+    (
+        "技术栈知识点", "GET /api/tech-stack/<category>/questions",
+        "SELECT * FROM knowledge_points WHERE category = ? AND question_bank_mode = ?",
+        lambda now: (random.choice(CATEGORIES), 'interview')
+    ),
+]
+
+
+def create_schema(db_path):
+    """按模型建表，然后删除所有二级索引，得到“加索引之前”的库"""
+    engine = create_engine(f'sqlite:///{db_path}')
+    db.metadata.create_all(engine)
+    engine.dispose()
+
+    conn = sqlite3.connect(db_path)
+    index_names = [row[0] for row in conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'index' AND name NOT LIKE 'sqlite_autoindex%'"
+    )]
+    for name in index_names:
+        conn.execute(f"DROP INDEX {name}")
+    conn.commit()
+    conn.close()
+
+
+def seed_data(db_path, record_count):
+    """生成用户、知识点、题目、学习记录、知识点统计和错题"""
+    random.seed(42)
+    now = datetime.utcnow()
+    conn = sqlite3.connect(db_path)
+
+    conn.executemany(
+        "INSERT INTO users (id, username, email, created_at) VALUES (?, ?, ?, ?)",
+        ((i, f'user{i}', f'user{i}@example.com', now) for i in range(1, USER_COUNT + 1))
+    )
+    conn.executemany(
+        "INSERT INTO knowledge_points (id, name, category, question_bank_mode) VALUES (?, ?, ?, ?)",
+        ((i, f'知识点{i}', random.choice(CATEGORIES), random.choice(MODES))
+         for i in range(1, KNOWLEDGE_POINT_COUNT + 1))
+    )
+    conn.executemany(
+        "INSERT INTO questions (id, title, content, question_type, difficulty, estimated_time, "
+        "knowledge_point_id, question_bank_mode, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        ((i, f'题目{i}', f'题目{i}的内容', random.choice(QUESTION_TYPES), random.choice(DIFFICULTIES),
+          random.randint(5, 30), random.randint(1, KNOWLEDGE_POINT_COUNT), random.choice(MODES), now)
+         for i in range(1, QUESTION_COUNT + 1))
+    )
+
+    def learning_records():
+        for i in range(1, record_count + 1):
+            completed_at = now - timedelta(minutes=random.randint(0, 180 * 24 * 60))
+            time_spent = random.randint(10, 600)
+            yield (i, random.randint(1, USER_COUNT), random.randint(1, QUESTION_COUNT),
+                   random.random() < 0.6, time_spent, 'quick_answer',
+                   completed_at - timedelta(seconds=time_spent), completed_at)
+
+    conn.executemany(
+        "INSERT INTO learning_records (id, user_id, question_id, is_correct, time_spent, interaction_type, "
+        "started_at, completed_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        learning_records()
+    )
+    conn.execute("""
+        INSERT INTO user_knowledge_stats (user_id, knowledge_point_id, total_attempts, correct_attempts,
+                                          total_time_spent, average_time, mastery_level)
+        SELECT lr.user_id, q.knowledge_point_id, COUNT(*), SUM(lr.is_correct), SUM(lr.time_spent),
+               AVG(lr.time_spent), AVG(lr.is_correct)
+        FROM learning_records lr JOIN questions q ON q.id = lr.question_id
+        GROUP BY lr.user_id, q.knowledge_point_id
+    """)
+    conn.execute("""
+        INSERT INTO wrong_questions (user_id, question_id, question_bank_mode, review_count, mastery_level,
+                                     created_at, updated_at)
+        SELECT lr.user_id, lr.question_id, q.question_bank_mode, 0, 0, MIN(lr.completed_at), MIN(lr.completed_at)
+        FROM learning_records lr JOIN questions q ON q.id = lr.question_id
+        WHERE lr.is_correct = 0
+        GROUP BY lr.user_id, lr.question_id
+    """)
+    conn.commit()
+    conn.close()
+
+
+def run_benchmark(db_path, label):
+    """打印每条查询的执行计划和平均耗时，返回 {名称: 毫秒}"""
+    print(f"\n{'=' * 20} {label} {'=' * 20}")
+    conn = sqlite3.connect(db_path)
+    now = datetime.utcnow()
+    timings = {}
+
+    for name, endpoint, sql, make_params in BENCHMARK_QUERIES:
+        plan = conn.execute(f"EXPLAIN QUERY PLAN {sql}", make_params(now)).fetchall()
+
+        random.seed(7)
+        started = time.perf_counter()
+        for _ in range(REPEAT):
+            conn.execute(sql, make_params(now)).fetchall()
+        elapsed_ms = (time.perf_counter() - started) * 1000 / REPEAT
+        timings[name] = elapsed_ms
+
+        print(f"\n📌 {name} ({endpoint})")
+        for row in plan:
+            print(f"   PLAN: {row[-1]}")
+        print(f"   平均耗时: {elapsed_ms:.3f} ms")
+
+    conn.close()
+    return timings
+
+
+def main():
+    record_count = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+
+    fd, db_path = tempfile.mkstemp(suffix='.db', prefix='index_benchmark_')
+    os.close(fd)
+
+    try:
+        print(f"🔄 生成测试数据: {record_count} 条学习记录 -> {db_path}")
+        started = time.perf_counter()
+        create_schema(db_path)
+        seed_data(db_path, record_count)
+        print(f"✅ 数据生成完成，用时 {time.perf_counter() - started:.1f} 秒")
+
+        before = run_benchmark(db_path, "添加索引之前")
+        migrate_indexes(db_path)
+        after = run_benchmark(db_path, "添加索引之后")
+
+        print(f"\n{'=' * 20} 汇总 {'=' * 20}")
+        for name, *_ in BENCHMARK_QUERIES:
+            speedup = before[name] / after[name] if after[name] > 0 else float('inf')
+            print(f"{name:<12} {before[name]:>10.3f} ms -> {after[name]:>8.3f} ms  ({speedup:.0f}x)")
+    finally:
+        os.remove(db_path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+推荐打分基准测试
+在内存中生成题目特征矩阵，测量单次推荐的打分、排序和挑选耗时（不含数据库查询）。
+
+    python benchmark_recommendation.py            # 默认10万道题
+    python benchmark_recommendation.py 500000     # 指定题目数量
+"""
+
+import random
+import sys
+import time
+
+import numpy as np
+
+from question_features import QuestionFeatures
+from recommendation_engine import RecommendationEngine
+
+KNOWLEDGE_POINT_COUNT = 2000
+REPEAT = 20
+
+
+def build_features(question_count):
+    random.seed(42)
+    return QuestionFeatures(
+        'academic',
+        ids=range(1, question_count + 1),
+        difficulties=[random.choice(['easy', 'medium', 'hard']) for _ in range(question_count)],
+        question_types=[random.choice(['theory', 'multiple_choice', 'fill_blank', 'coding'])
+                        for _ in range(question_count)],
+        knowledge_point_ids=[random.randint(1, KNOWLEDGE_POINT_COUNT) for _ in range(question_count)],
+        estimated_times=[random.randint(5, 30) for _ in range(question_count)]
+    )
+
+
+def build_profile():
+    return {
+        'preferred_difficulty': 'medium',
+        'preferred_types': ['coding', 'theory'],
+        'learning_pattern': {'preferred_type': 'theory'},
+        'weak_knowledge_points': random.sample(range(1, KNOWLEDGE_POINT_COUNT + 1), 40),
+        'strong_knowledge_points': random.sample(range(1, KNOWLEDGE_POINT_COUNT + 1), 60),
+        'avg_accuracy': 0.85,
+        'avg_time_per_question': 400
+    }
+
+
+def main():
+    question_count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+
+    print(f"🔄 生成 {question_count} 道题目的特征矩阵...")
+    features = build_features(question_count)
+    engine = RecommendationEngine()
+    profile = build_profile()
+    candidates = np.arange(len(features))
+
+    for label, count in [('每日6题', 6), ('普通推荐10题', 10)]:
+        timings = []
+        for _ in range(REPEAT):
+            started = time.perf_counter()
+            ranked, ranked_scores = engine.score_questions(profile, features, candidates)
+            if count == 6:
+                engine._arrange_daily_questions(features, ranked, ranked_scores)
+            else:
+                engine._diversify_recommendations(features, ranked, count)
+            timings.append((time.perf_counter() - started) * 1000)
+
+        print(f"📌 {label}: 平均 {np.mean(timings):.2f} ms, P95 {np.percentile(timings, 95):.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+"""
+共同错题矩阵
+统计“答错题目A的学生中，有多少人也答错了题目B”，用于协同推荐：
+用户最近答错了A，就给与A经常一起出错的题目加分。
+
+- 错题定义：LearningRecord 中 is_correct 为假的记录，以及错题本 WrongQuestion 中的题目（按用户去重）
+- 基础矩阵由批量任务全量构建：用户×题目的0/1稀疏矩阵 M，共同错题计数 C = Mᵀ·M，
+  每行只保留计数最高的 TOP_NEIGHBORS 个题目，保存在 instance/co_mistake_matrix.npz
+- 之后每次答错由 RecommendationEngine.update_user_model 增量累加到内存中的增量计数，
+  与该用户此前答错过的每道题各加1，增量的每行同样只保留计数最高的 TOP_NEIGHBORS 个题目；
+  批量任务重建后，各进程在下次读取时加载新矩阵并清空增量
+- Web进程不在请求中构建矩阵：还没有矩阵文件时按空矩阵处理，只使用增量计数
+- 查询只读取用户最近错题对应的行，每行最多 TOP_NEIGHBORS 个非零项，与题库大小无关
+
+    python co_mistake.py      # 全量重建共同错题矩阵
+"""
+
+import os
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Dict, Iterable, Optional, Set, Tuple
+
+import numpy as np
+from flask import current_app
+from scipy import sparse
+
+from models import db, LearningRecord, WrongQuestion
+
+TOP_NEIGHBORS = 50
+MIN_CO_MISTAKES = 2  # 共同出错人数少于该值的题目对不参与打分
+MAX_CACHED_USERS = 10000
+DELTA_PRUNE_SLACK = 2  # 增量行超过 TOP_NEIGHBORS 的该倍数时裁剪回 TOP_NEIGHBORS 个，摊薄裁剪的开销
+
+
+def load_mistake_pairs(user_id: Optional[int] = None, before: Optional[datetime] = None) -> Set[Tuple[int, int]]:
+    """查询 (用户id, 题目id) 错题对；before 只统计该时间之前的错题"""
+    records = db.session.query(LearningRecord.user_id, LearningRecord.question_id)\
+                        .filter(LearningRecord.is_correct == False)
+    wrong_questions = db.session.query(WrongQuestion.user_id, WrongQuestion.question_id)
+
+    if user_id is not None:
+        records = records.filter(LearningRecord.user_id == user_id)
+        wrong_questions = wrong_questions.filter(WrongQuestion.user_id == user_id)
+    if before is not None:
+        records = records.filter(LearningRecord.completed_at < before)
+        wrong_questions = wrong_questions.filter(WrongQuestion.created_at < before)
+
+    return set(records.distinct().all()) | set(wrong_questions.distinct().all())
+
+
+class CoMistakeMatrix:
+    """
+    按题目id索引的共同错题计数
+
+    - question_ids: 出现过错题的题目id（升序）
+    - counts: CSR矩阵，counts[i, j] 为同时答错第i题和第j题的人数（每行只保留前 TOP_NEIGHBORS 个）
+    - mistake_counts: 每道题答错的人数
+    """
+
+    def __init__(self, question_ids: np.ndarray, counts: sparse.csr_matrix, mistake_counts: np.ndarray,
+                 built_at: Optional[datetime] = None):
+        self.question_ids = np.asarray(question_ids, dtype=np.int64)
+        self.counts = counts
+        self.mistake_counts = np.asarray(mistake_counts, dtype=np.int64)
+        self.built_at = built_at or datetime.utcnow()
+        self._rows = {int(question_id): row for row, question_id in enumerate(self.question_ids)}
+
+    @classmethod
+    def empty(cls) -> 'CoMistakeMatrix':
+        return cls(np.empty(0, dtype=np.int64), sparse.csr_matrix((0, 0), dtype=np.int32), np.empty(0, dtype=np.int64))
+
+    @classmethod
+    def build(cls, pairs: Iterable[Tuple[int, int]], top_neighbors: int = TOP_NEIGHBORS) -> 'CoMistakeMatrix':
+        pairs = np.array(sorted(pairs), dtype=np.int64).reshape(-1, 2)
+        user_ids, user_index = np.unique(pairs[:, 0], return_inverse=True)
+        question_ids, question_index = np.unique(pairs[:, 1], return_inverse=True)
+
+        mistakes = sparse.csr_matrix(
+            (np.ones(len(pairs), dtype=np.int32), (user_index, question_index)),
+            shape=(len(user_ids), len(question_ids))
+        )
+        co_counts = (mistakes.T @ mistakes).tocsr()
+        mistake_counts = co_counts.diagonal()
+        co_counts.setdiag(0)
+        co_counts.eliminate_zeros()
+
+        return cls(question_ids, cls._prune_rows(co_counts, top_neighbors), mistake_counts)
+
+    @staticmethod
+    def _prune_rows(matrix: sparse.csr_matrix, limit: int) -> sparse.csr_matrix:
+        """每行只保留数值最大的 limit 项"""
+        indptr = [0]
+        indices, data = [], []
+        for row in range(matrix.shape[0]):
+            start, end = matrix.indptr[row], matrix.indptr[row + 1]
+            row_indices, row_data = matrix.indices[start:end], matrix.data[start:end]
+            if end - start > limit:
+                keep = np.argpartition(-row_data, limit - 1)[:limit]
+                row_indices, row_data = row_indices[keep], row_data[keep]
+            indices.append(row_indices)
+            data.append(row_data)
+            indptr.append(indptr[-1] + len(row_indices))
+
+        return sparse.csr_matrix(
+            (np.concatenate(data) if data else np.empty(0, dtype=np.int32),
+             np.concatenate(indices) if indices else np.empty(0, dtype=np.int32),
+             np.array(indptr)),
+            shape=matrix.shape
+        )
+
+    def mistake_count(self, question_id: int) -> int:
+        row = self._rows.get(question_id)
+        return int(self.mistake_counts[row]) if row is not None else 0
+
+    def neighbors(self, question_id: int) -> Tuple[np.ndarray, np.ndarray]:
+        """返回 (共同出错的题目id, 共同出错人数)"""
+        row = self._rows.get(question_id)
+        if row is None:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+        start, end = self.counts.indptr[row], self.counts.indptr[row + 1]
+        return self.question_ids[self.counts.indices[start:end]], self.counts.data[start:end]
+
+    def save(self, path: str) -> None:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f'{path}.tmp{os.getpid()}.npz'
+        np.savez(
+            temp_path,
+            question_ids=self.question_ids,
+            indptr=self.counts.indptr,
+            indices=self.counts.indices,
+            data=self.counts.data,
+            mistake_counts=self.mistake_counts,
+            built_at=np.array(self.built_at.isoformat())
+        )
+        os.replace(temp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> 'CoMistakeMatrix':
+        with np.load(path) as stored:
+            size = len(stored['question_ids'])
+            counts = sparse.csr_matrix((stored['data'], stored['indices'], stored['indptr']), shape=(size, size))
+            return cls(stored['question_ids'], counts, stored['mistake_counts'],
+                       datetime.fromisoformat(str(stored['built_at'])))
+
+
+def matrix_path() -> str:
+    return os.path.join(current_app.instance_path, 'co_mistake_matrix.npz')
+
+
+class CoMistakeStore:
+    """基础矩阵 + 进程内增量计数（需要在应用上下文中使用）"""
+
+    def __init__(self):
+        self._matrix: Optional[CoMistakeMatrix] = None
+        self._loaded_mtime: Optional[float] = None
+        self._delta: Dict[int, Counter] = {}
+        self._delta_mistakes: Counter = Counter()
+        self._user_mistakes: Dict[int, Set[int]] = {}
+        self._lock = threading.Lock()
+
+    def _current_matrix(self) -> CoMistakeMatrix:
+        """返回基础矩阵；文件被批量任务更新后重新加载，还没有文件时返回空矩阵（只使用增量计数）"""
+        path = matrix_path()
+        try:
+            mtime = os.stat(path).st_mtime
+        except OSError:
+            mtime = None
+
+        if self._matrix is not None and mtime == self._loaded_mtime:
+            return self._matrix
+
+        if mtime is None:
+            with self._lock:
+                if self._matrix is None:
+                    self._matrix = CoMistakeMatrix.empty()
+                return self._matrix
+
+        matrix = CoMistakeMatrix.load(path)
+        with self._lock:
+            self._swap(matrix, mtime)
+        return matrix
+
+    def _swap(self, matrix: CoMistakeMatrix, mtime: float) -> None:
+        self._matrix = matrix
+        self._loaded_mtime = mtime
+        self._delta = {}
+        self._delta_mistakes = Counter()
+        self._user_mistakes = {}
+
+    def rebuild(self) -> CoMistakeMatrix:
+        """从数据库全量构建并保存"""
+        matrix = CoMistakeMatrix.build(load_mistake_pairs())
+        path = matrix_path()
+        matrix.save(path)
+        with self._lock:
+            self._swap(matrix, os.stat(path).st_mtime)
+        return matrix
+
+    def record_mistake(self, user_id: int, question_id: int, completed_at: datetime) -> None:
+        """记录一次答错：与该用户此前答错过的每道题的共同计数加1（同一道题重复答错不重复计数）"""
+        self._current_matrix()
+
+        with self._lock:
+            mistakes = self._user_mistakes.get(user_id)
+        if mistakes is None:
+            # 只加载这次答错之前的错题，这次的记录在下面累加
+            mistakes = {qid for _, qid in load_mistake_pairs(user_id=user_id, before=completed_at)}
+
+        with self._lock:
+            mistakes = self._user_mistakes.setdefault(user_id, mistakes)
+            if question_id in mistakes:
+                return
+
+            row = self._delta.setdefault(question_id, Counter())
+            for other_id in mistakes:
+                row[other_id] += 1
+                other_row = self._delta.setdefault(other_id, Counter())
+                other_row[question_id] += 1
+                self._prune_delta(other_id, other_row)
+            self._prune_delta(question_id, row)
+            self._delta_mistakes[question_id] += 1
+            mistakes.add(question_id)
+
+            if len(self._user_mistakes) > MAX_CACHED_USERS:
+                self._user_mistakes = {user_id: mistakes}
+
+    def _prune_delta(self, question_id: int, row: Counter) -> None:
+        """增量行与基础矩阵一样只保留计数最高的 TOP_NEIGHBORS 个题目（调用方持有锁）"""
+        if len(row) > TOP_NEIGHBORS * DELTA_PRUNE_SLACK:
+            self._delta[question_id] = Counter(dict(row.most_common(TOP_NEIGHBORS)))
+
+    def scores(self, question_ids: Iterable[int]) -> Dict[int, float]:
+        """
+        给定用户最近答错的题目，返回 {题目id: 共同错题分数}
+
+        分数为“答错某道近期错题的人中也答错该题的比例”，多道近期错题取最大值，范围0-1。
+        """
+        question_ids = list(question_ids)
+        if not question_ids:
+            return {}
+        matrix = self._current_matrix()
+
+        result: Dict[int, float] = {}
+        with self._lock:
+            for question_id in question_ids:
+                total = matrix.mistake_count(question_id) + self._delta_mistakes.get(question_id, 0)
+                if total == 0:
+                    continue
+
+                neighbor_ids, neighbor_counts = matrix.neighbors(question_id)
+                counts = Counter(dict(zip(neighbor_ids.tolist(), neighbor_counts.tolist())))
+                counts.update(self._delta.get(question_id, {}))
+
+                for other_id, count in counts.items():
+                    if count >= MIN_CO_MISTAKES:
+                        result[other_id] = max(result.get(other_id, 0.0), count / total)
+        return result
+
+
+if __name__ == "__main__":
+    from app import app
+
+    with app.app_context():
+        db.create_all()
+        print("🔄 重建共同错题矩阵...")
+        started = time.perf_counter()
+        matrix = CoMistakeStore().rebuild()
+        print(f"✅ {len(matrix.question_ids)} 道题目，{matrix.counts.nnz} 个共同错题对，"
+              f"用时 {time.perf_counter() - started:.1f} 秒")
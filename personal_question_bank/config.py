@@ -28,8 +28,22 @@ class Config:
         'type_weight': float(os.getenv('TYPE_WEIGHT', 0.25)),
         'knowledge_weight': float(os.getenv('KNOWLEDGE_WEIGHT', 0.35)),
         'time_weight': float(os.getenv('TIME_WEIGHT', 0.1)),
+        'co_mistake_weight': float(os.getenv('CO_MISTAKE_WEIGHT', 0.15)),
         'cache_ttl': int(os.getenv('RECOMMENDATION_CACHE_TTL', 3600)),
-        'max_recommendations': int(os.getenv('MAX_RECOMMENDATIONS_PER_REQUEST', 20))
+        'max_recommendations': int(os.getenv('MAX_RECOMMENDATIONS_PER_REQUEST', 20)),
+        'candidate_pool_size': int(os.getenv('RECOMMENDATION_CANDIDATE_POOL_SIZE', 20000)),
+        'cold_start_threshold': int(os.getenv('COLD_START_THRESHOLD', 5))
+    }
+    
+    # 错题复习调度参数（SM-2，见 review_scheduler.py；修改后运行 python review_scheduler.py 重新计算复习时间）
+    REVIEW_SCHEDULER_CONFIG = {
+        'initial_ease': float(os.getenv('REVIEW_INITIAL_EASE', 2.5)),
+        'min_ease': float(os.getenv('REVIEW_MIN_EASE', 1.3)),
+        'first_interval_days': float(os.getenv('REVIEW_FIRST_INTERVAL_DAYS', 1)),
+        'second_interval_days': float(os.getenv('REVIEW_SECOND_INTERVAL_DAYS', 6)),
+        'failure_interval_days': float(os.getenv('REVIEW_FAILURE_INTERVAL_DAYS', 1)),
+        'interval_modifier': float(os.getenv('REVIEW_INTERVAL_MODIFIER', 1.0)),
+        'max_interval_days': float(os.getenv('REVIEW_MAX_INTERVAL_DAYS', 365))
     }
     
     # 分页配置
@@ -75,10 +89,6 @@ class ProductionConfig(Config):
     DEBUG = False
     TESTING = False
     
-    # 生产环境必须使用环境变量中的数据库URL
-    if not os.getenv('DATABASE_URL'):
-        raise ValueError("生产环境必须设置DATABASE_URL环境变量")
-    
     # 生产环境安全配置
     SESSION_COOKIE_SECURE = True
     SESSION_COOKIE_HTTPONLY = True
@@ -98,4 +108,10 @@ config = {
 def get_config():
     """获取当前配置"""
     config_name = os.getenv('FLASK_ENV', 'development')
+    
+    # 生产环境必须使用环境变量中的数据库URL
+    # （放在这里检查而不是类定义里，避免非生产环境 import config 时直接报错）
+    if config_name == 'production' and not os.getenv('DATABASE_URL'):
+        raise ValueError("生产环境必须设置DATABASE_URL环境变量")
+    
     return config.get(config_name, config['default'])
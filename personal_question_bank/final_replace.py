@@ -6,6 +6,7 @@
 
 from app import app, db
 from sqlalchemy import text
+from bank_version import bump_bank_version, QUESTION_BANK_MODES
 
 def clear_and_replace():
     """清除并替换为LeetCode题目"""
@@ -20,6 +21,7 @@ def clear_and_replace():
         db.session.execute(text("DELETE FROM user_knowledge_stats"))
         db.session.execute(text("DELETE FROM questions"))
         db.session.execute(text("DELETE FROM knowledge_points"))
+        bump_bank_version(db.session, QUESTION_BANK_MODES)  # SQL文本不会触发题库版本号的自动更新
         db.session.commit()
         print("✅ 现有数据已清除")
         
@@ -560,6 +562,7 @@ def addTwoNumbers(l1, l2):
             imported_count += 1
             print(f"  ✅ 导入: {problem_data['title']} ({problem_data['difficulty']})")
         
+        bump_bank_version(db.session, QUESTION_BANK_MODES)
         db.session.commit()
         print(f"\n✅ 成功导入 {imported_count} 道LeetCode经典题目！")
         
@@ -14,6 +14,7 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from app import app, db
 from models import KnowledgePoint, Question
+from similarity_index import refresh_similarity_index
 
 def import_enhanced_academic_questions():
     """导入增强的学术题库"""
@@ -102,6 +103,9 @@ def import_enhanced_academic_questions():
             print(f"\n📋 分类详情:")
             for category, stats in categories.items():
                 print(f"   - {category}: {stats['kp_count']}个知识点, {stats['q_count']}道题目")
+
+            refresh_similarity_index(['academic'])
+            print(f"\n🔍 相似题目索引已更新")
                 
         except Exception as e:
             db.session.rollback()
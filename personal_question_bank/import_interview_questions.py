@@ -8,6 +8,7 @@ import json
 import sys
 from app import app, db
 from models import Question, KnowledgePoint
+from similarity_index import refresh_similarity_index
 
 def import_interview_questions():
     """导入面试题库"""
@@ -136,6 +137,8 @@ def import_interview_questions():
    - 数据库总知识点数: {KnowledgePoint.query.count()} 个
    - 面试题目数: {Question.query.filter_by(question_bank_mode='interview').count()} 道
 """)
+            refresh_similarity_index(['interview'])
+            print("🔍 相似题目索引已更新")
         except Exception as e:
             print(f"❌ 提交失败: {e}")
             db.session.rollback()
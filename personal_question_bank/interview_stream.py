@@ -0,0 +1,129 @@
+"""
+AI面试官回应的流式输出
+大模型按片段返回面试官的JSON回应，这里在片段到达时：
+
+- FeedbackStreamParser 从尚不完整的JSON文本中增量解码 "feedback" 字段的字符串值
+  （处理跨片段的转义序列），前端可以边生成边显示反馈；模型没有按JSON返回时把原文当作反馈
+- iter_sse_data 解析服务商返回的SSE响应，format_sse 生成发给浏览器的SSE事件
+
+事件格式（POST /api/interview/ai-response/stream）：
+
+    event: feedback
+    data: {"text": "新增的反馈文字"}
+
+    event: result
+    data: {"evaluation": ..., "feedback": ..., "follow_up": ..., "suggestions": ..., "tone": ...}
+"""
+
+import json
+import re
+from typing import Iterator
+
+FEEDBACK_KEY = re.compile(r'"feedback"\s*:\s*"')
+JSON_ESCAPES = {'"': '"', '\\': '\\', '/': '/', 'b': '\b', 'f': '\f', 'n': '\n', 'r': '\r', 't': '\t'}
+
+
+class FeedbackStreamParser:
+    """逐片段接收模型输出，返回 feedback 字段新解码出的文字"""
+
+    def __init__(self):
+        self.text = ''        # 收到的完整原文
+        self.feedback = ''    # 已解码的反馈
+        self._mode = None     # 'json' / 'plain'，收到第一个非空白字符后确定
+        self._pos = None      # 反馈字符串中下一个待解码字符在原文中的位置
+        self._closed = False  # 反馈字符串已结束
+
+    def feed(self, chunk: str) -> str:
+        self.text += chunk
+        if self._mode is None:
+            stripped = self.text.lstrip()
+            if not stripped:
+                return ''
+            # 模型常把JSON放在 ```json 代码块里
+            self._mode = 'json' if stripped[0] in '{`' else 'plain'
+            if self._mode == 'plain':
+                self._pos = len(self.text) - len(stripped)
+
+        if self._mode == 'plain':
+            delta = self.text[self._pos:]
+            self._pos = len(self.text)
+            self.feedback += delta
+            return delta
+
+        if self._closed:
+            return ''
+        if self._pos is None:
+            match = FEEDBACK_KEY.search(self.text)
+            if not match:
+                return ''
+            self._pos = match.end()
+        delta = self._decode()
+        self.feedback += delta
+        return delta
+
+    def _decode(self) -> str:
+        """从 _pos 开始解码JSON字符串，遇到不完整的转义序列时停下等待下一个片段"""
+        text, pos = self.text, self._pos
+        decoded = []
+        while pos < len(text):
+            char = text[pos]
+            if char == '"':
+                self._closed = True
+                pos += 1
+                break
+            if char != '\\':
+                decoded.append(char)
+                pos += 1
+                continue
+            if pos + 1 >= len(text):
+                break
+            escape = text[pos + 1]
+            if escape != 'u':
+                decoded.append(JSON_ESCAPES.get(escape, escape))
+                pos += 2
+                continue
+            if pos + 6 > len(text):
+                break
+            try:
+                code = int(text[pos + 2:pos + 6], 16)
+            except ValueError:
+                # 不合法的转义按原文保留
+                decoded.append(text[pos:pos + 6])
+                pos += 6
+                continue
+            if 0xD800 <= code < 0xDC00:
+                # 代理对：等低位的 \uXXXX 也到达后再合并
+                if pos + 12 > len(text):
+                    break
+                low_hex = text[pos + 8:pos + 12]
+                if text[pos + 6:pos + 8] == '\\u' and re.fullmatch(r'[dD][c-fC-F][0-9a-fA-F]{2}', low_hex):
+                    low = int(low_hex, 16)
+                    decoded.append(chr(0x10000 + ((code - 0xD800) << 10) + (low - 0xDC00)))
+                    pos += 12
+                    continue
+            decoded.append(chr(code))
+            pos += 6
+        self._pos = pos
+        return ''.join(decoded)
+
+
+def iter_sse_data(response) -> Iterator[str]:
+    """逐个返回服务商SSE响应中每个事件的 data 内容（多行 data 以换行拼接）"""
+    lines = []
+    for raw_line in response.iter_lines():
+        line = raw_line.decode('utf-8') if isinstance(raw_line, bytes) else raw_line
+        if not line:
+            if lines:
+                yield '\n'.join(lines)
+                lines = []
+            continue
+        if line.startswith('data:'):
+            value = line[5:]
+            lines.append(value[1:] if value.startswith(' ') else value)
+    if lines:
+        yield '\n'.join(lines)
+
+
+def format_sse(event: str, data) -> str:
+    """生成一条SSE事件"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
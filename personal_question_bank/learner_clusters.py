@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+学习者聚类（冷启动推荐）
+定期按用户画像特征（正确率、答题节奏、题型分布、模式偏好）对用户做KMeans聚类，
+为每个聚类、每个题库模式预先打分排好一份题目列表。
+最近答题很少的用户直接取所属聚类的列表，去掉做过的题后挑选，不再逐题打分。
+
+- 结果保存在 instance/learner_clusters.pkl，记录构建时的题库版本号；题库变化后列表视为过期，回退到实时计算
+- 用户所属聚类在请求时按最近的聚类中心计算（特征来自画像缓存，不额外查询）
+
+    python learner_clusters.py        # 默认聚成8类
+    python learner_clusters.py 12     # 指定聚类数量
+"""
+
+import os
+import pickle
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from flask import current_app
+from sklearn.cluster import KMeans
+from sqlalchemy import func, case
+
+from models import db, User, LearningRecord, Question, cached_json_column
+from bank_version import get_bank_version
+
+QUESTION_BANK_MODES = ('academic', 'interview')
+LEARNER_QUESTION_TYPES = ('theory', 'multiple_choice', 'fill_blank', 'coding', 'practical')
+DEFAULT_CLUSTER_COUNT = 8
+RANKED_LIST_SIZE = 200
+HISTORY_DAYS = 30
+PACE_CAP_SECONDS = 1200  # 平均用时超过20分钟按20分钟计
+
+
+def learner_vector(total: int, correct: int, time_spent: int, type_counts: Dict[str, int],
+                   interview_count: int, preferred_types: Iterable[str] = (),
+                   preferred_mode: Optional[str] = None) -> np.ndarray:
+    """
+    用户特征向量：[正确率, 节奏, 各题型占比..., 面试模式占比]，各分量都在0-1之间
+
+    没有答题记录时正确率按0.5、平均用时按5分钟，题型和模式按用户设置的偏好题型、偏好模式计算。
+    """
+    accuracy = correct / total if total else 0.5
+    avg_time = time_spent / total if total else 300
+    pace = min(avg_time, PACE_CAP_SECONDS) / PACE_CAP_SECONDS
+
+    type_mix = np.zeros(len(LEARNER_QUESTION_TYPES))
+    if total:
+        for index, question_type in enumerate(LEARNER_QUESTION_TYPES):
+            type_mix[index] = type_counts.get(question_type, 0) / total
+    else:
+        preferred = [LEARNER_QUESTION_TYPES.index(t) for t in preferred_types if t in LEARNER_QUESTION_TYPES]
+        if preferred:
+            type_mix[preferred] = 1 / len(preferred)
+
+    if total:
+        interview_share = interview_count / total
+    else:
+        interview_share = 1.0 if preferred_mode == 'interview' else 0.0
+    return np.concatenate([[accuracy, pace], type_mix, [interview_share]])
+
+
+def load_learner_vectors() -> Tuple[List[User], np.ndarray, Dict[int, Dict]]:
+    """用一次分组查询计算所有用户的特征向量，同时返回每个用户按知识点的答题统计"""
+    cutoff = datetime.utcnow() - timedelta(days=HISTORY_DAYS)
+    correct = func.sum(case((LearningRecord.is_correct == True, 1), else_=0))
+
+    rows = db.session.query(
+        LearningRecord.user_id, Question.question_type, Question.question_bank_mode, Question.knowledge_point_id,
+        func.count(LearningRecord.id), correct, func.sum(LearningRecord.time_spent)
+    ).join(Question, LearningRecord.question_id == Question.id)\
+     .filter(LearningRecord.completed_at >= cutoff)\
+     .group_by(LearningRecord.user_id, Question.question_type, Question.question_bank_mode,
+               Question.knowledge_point_id).all()
+
+    history = defaultdict(lambda: {'total': 0, 'correct': 0, 'time': 0, 'types': Counter(),
+                                   'interview': 0, 'kp_stats': defaultdict(lambda: [0, 0])})
+    for user_id, question_type, mode, kp_id, count, correct_count, time_spent in rows:
+        stats = history[user_id]
+        stats['total'] += count
+        stats['correct'] += correct_count or 0
+        stats['time'] += time_spent or 0
+        stats['types'][question_type] += count
+        stats['interview'] += count if mode == 'interview' else 0
+        stats['kp_stats'][kp_id][0] += count
+        stats['kp_stats'][kp_id][1] += correct_count or 0
+
+    users = User.query.order_by(User.id).all()
+    vectors = np.array([
+        learner_vector(history[user.id]['total'], history[user.id]['correct'], history[user.id]['time'],
+                       history[user.id]['types'], history[user.id]['interview'],
+                       cached_json_column(user, 'preferred_question_types') or [], user.preferred_mode)
+        for user in users
+    ]).reshape(len(users), -1)
+    return users, vectors, history
+
+
+def build_cluster_profile(members: List[User], centroid: np.ndarray, history: Dict[int, Dict]) -> Dict:
+    """把聚类中心和成员的知识点统计转换成推荐引擎使用的画像格式"""
+    type_mix = centroid[2:2 + len(LEARNER_QUESTION_TYPES)]
+    type_order = [LEARNER_QUESTION_TYPES[i] for i in np.argsort(-type_mix, kind='stable') if type_mix[i] > 0]
+
+    kp_totals = defaultdict(lambda: [0, 0])
+    for user in members:
+        for kp_id, (total, correct) in history[user.id]['kp_stats'].items():
+            kp_totals[kp_id][0] += total
+            kp_totals[kp_id][1] += correct
+
+    difficulties = Counter(user.preferred_difficulty for user in members if user.preferred_difficulty)
+    return {
+        'preferred_difficulty': difficulties.most_common(1)[0][0] if difficulties else 'medium',
+        'preferred_types': type_order[:2],
+        'learning_pattern': {'preferred_type': type_order[0] if type_order else 'theory'},
+        'weak_knowledge_points': [kp for kp, (total, correct) in kp_totals.items() if correct / total < 0.6],
+        'strong_knowledge_points': [kp for kp, (total, correct) in kp_totals.items() if correct / total > 0.8],
+        'avg_accuracy': float(centroid[0]),
+        'avg_time_per_question': float(centroid[1]) * PACE_CAP_SECONDS
+    }
+
+
+def build_learner_clusters(engine, cluster_count: int = DEFAULT_CLUSTER_COUNT) -> Dict:
+    """聚类并为每个聚类、每个题库模式打分排好题目列表（需要在应用上下文中调用）"""
+    users, vectors, history = load_learner_vectors()
+    if len(users) == 0:
+        raise ValueError("没有用户，无法聚类")
+
+    cluster_count = min(cluster_count, len(np.unique(vectors, axis=0)))
+    kmeans = KMeans(n_clusters=cluster_count, n_init=10, random_state=0).fit(vectors)
+
+    bank_versions = {mode: get_bank_version(mode) for mode in QUESTION_BANK_MODES}
+    ranked = {}
+    for cluster in range(cluster_count):
+        members = [user for user, label in zip(users, kmeans.labels_) if label == cluster]
+        profile = build_cluster_profile(members, kmeans.cluster_centers_[cluster], history)
+        for mode in QUESTION_BANK_MODES:
+            features = engine.get_question_features(mode)
+            positions, scores = engine.score_questions(profile, features, np.arange(len(features)))
+            ranked[(cluster, mode)] = (features.ids[positions[:RANKED_LIST_SIZE]], scores[:RANKED_LIST_SIZE])
+
+    return {
+        'centroids': kmeans.cluster_centers_,
+        'sizes': np.bincount(kmeans.labels_, minlength=cluster_count),
+        'ranked': ranked,
+        'bank_versions': bank_versions,
+        'built_at': datetime.utcnow()
+    }
+
+
+def clusters_path() -> str:
+    return os.path.join(current_app.instance_path, 'learner_clusters.pkl')
+
+
+def save_learner_clusters(model: Dict) -> None:
+    path = clusters_path()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = f'{path}.tmp{os.getpid()}'
+    with open(temp_path, 'wb') as f:
+        pickle.dump(model, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(temp_path, path)
+
+
+class LearnerClusterStore:
+    """读取聚类任务的结果，文件更新后自动重新加载（需要在应用上下文中使用）"""
+
+    def __init__(self):
+        self._model: Optional[Dict] = None
+        self._loaded_mtime: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def _current_model(self) -> Optional[Dict]:
+        path = clusters_path()
+        try:
+            mtime = os.stat(path).st_mtime
+        except OSError:
+            return None
+
+        with self._lock:
+            if self._model is None or mtime != self._loaded_mtime:
+                with open(path, 'rb') as f:
+                    self._model = pickle.load(f)
+                self._loaded_mtime = mtime
+            return self._model
+
+    def ranked_questions(self, vector: np.ndarray, question_bank_mode: str) -> Optional[Tuple[int, np.ndarray, np.ndarray]]:
+        """返回 (聚类编号, 题目id, 分数)；还没有聚类结果或题库已变化时返回None"""
+        model = self._current_model()
+        if model is None or model['bank_versions'].get(question_bank_mode) != get_bank_version(question_bank_mode):
+            return None
+
+        cluster = int(np.argmin(((model['centroids'] - vector) ** 2).sum(axis=1)))
+        question_ids, scores = model['ranked'][(cluster, question_bank_mode)]
+        return cluster, question_ids, scores
+
+
+if __name__ == "__main__":
+    from app import app, recommendation_engine
+
+    cluster_count = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_CLUSTER_COUNT
+
+    with app.app_context():
+        db.create_all()
+        print(f"🔄 开始聚类学习者（{cluster_count} 类）...")
+        started = time.perf_counter()
+        model = build_learner_clusters(recommendation_engine, cluster_count)
+        save_learner_clusters(model)
+        print(f"✅ 聚类完成: 各类人数 {model['sizes'].tolist()}，用时 {time.perf_counter() - started:.1f} 秒")
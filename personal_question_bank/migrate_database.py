@@ -1,18 +1,17 @@
 #!/usr/bin/env python3
 """
 数据库迁移脚本
-用于添加双模式支持的新字段
+用于添加双模式支持的新字段，以及热点查询路径的复合索引
 """
 
 import sqlite3
 import os
-from app import app
+from app import app, compute_mastery_level
+from similar_questions import SIMILAR_QUESTION_COUNT
 
-def migrate_database():
+def migrate_database(db_path='instance/question_bank.db'):
     """迁移数据库添加新字段"""
     
-    db_path = 'instance/question_bank.db'
-    
     print("🔄 开始数据库迁移...")
     
     try:
@@ -38,6 +37,34 @@ def migrate_database():
             else:
                 print(f"❌ 添加 users.current_preparation_goal 失败: {e}")
         
+        # 错题本的 SM-2 复习调度状态
+        try:
+            cursor.execute("ALTER TABLE wrong_questions ADD COLUMN ease_factor FLOAT")
+            print("✅ 已添加 wrong_questions.ease_factor 字段")
+        except sqlite3.OperationalError as e:
+            if "duplicate column name" in str(e):
+                print("⚠️  wrong_questions.ease_factor 字段已存在")
+            else:
+                print(f"❌ 添加 wrong_questions.ease_factor 失败: {e}")
+        
+        try:
+            cursor.execute("ALTER TABLE wrong_questions ADD COLUMN interval_days FLOAT DEFAULT 0")
+            print("✅ 已添加 wrong_questions.interval_days 字段")
+        except sqlite3.OperationalError as e:
+            if "duplicate column name" in str(e):
+                print("⚠️  wrong_questions.interval_days 字段已存在")
+            else:
+                print(f"❌ 添加 wrong_questions.interval_days 失败: {e}")
+        
+        try:
+            cursor.execute("ALTER TABLE wrong_questions ADD COLUMN repetitions INTEGER DEFAULT 0")
+            print("✅ 已添加 wrong_questions.repetitions 字段")
+        except sqlite3.OperationalError as e:
+            if "duplicate column name" in str(e):
+                print("⚠️  wrong_questions.repetitions 字段已存在")
+            else:
+                print(f"❌ 添加 wrong_questions.repetitions 失败: {e}")
+        
         # 检查并添加新字段到knowledge_points表
         try:
             cursor.execute("ALTER TABLE knowledge_points ADD COLUMN question_bank_mode VARCHAR(20) DEFAULT 'academic'")
@@ -85,6 +112,16 @@ def migrate_database():
             else:
                 print(f"❌ 添加 questions.interview_experience_level 失败: {e}")
         
+        # 相似题目在所属错题中的序号，唯一索引 (原题, 错题, 序号) 防止重复生成
+        try:
+            cursor.execute("ALTER TABLE similar_questions ADD COLUMN slot INTEGER")
+            print("✅ 已添加 similar_questions.slot 字段")
+        except sqlite3.OperationalError as e:
+            if "duplicate column name" in str(e):
+                print("⚠️  similar_questions.slot 字段已存在")
+            else:
+                print(f"❌ 添加 similar_questions.slot 失败: {e}")
+        
         # 创建面试准备计划表
         try:
             cursor.execute("""
@@ -118,5 +155,192 @@ def migrate_database():
         if 'conn' in locals():
             conn.close()
 
+# 热点查询路径使用的复合索引（与 models.py 中 __table_args__ 的声明保持一致）
+INDEX_DEFINITIONS = [
+    ("ix_learning_records_user_completed", "learning_records", "user_id, completed_at", False),
+    ("uq_user_knowledge_stats_user_kp", "user_knowledge_stats", "user_id, knowledge_point_id", True),
+    ("ix_wrong_questions_user_question_mode", "wrong_questions", "user_id, question_id, question_bank_mode", False),
+    ("ix_wrong_questions_user_mode_next_review", "wrong_questions", "user_id, question_bank_mode, next_review_date", False),
+    ("ix_questions_mode_type_difficulty", "questions", "question_bank_mode, question_type, difficulty", False),
+    ("ix_knowledge_points_category_mode", "knowledge_points", "category, question_bank_mode", False),
+    ("uq_similar_questions_slot", "similar_questions", "original_question_id, wrong_question_id, slot", True),
+]
+
+def _merge_duplicate_knowledge_stats(cursor):
+    """合并重复的用户知识点统计行，为唯一索引做准备，返回 (删除的行数, 受影响的用户id)"""
+    cursor.execute("""
+        SELECT user_id, knowledge_point_id FROM user_knowledge_stats
+        GROUP BY user_id, knowledge_point_id HAVING COUNT(*) > 1
+    """)
+    duplicates = cursor.fetchall()
+    removed = 0
+    affected_users = sorted({user_id for user_id, _ in duplicates})
+    
+    for user_id, knowledge_point_id in duplicates:
+        cursor.execute("""
+            SELECT id, total_attempts, correct_attempts, total_time_spent, last_practice_time
+            FROM user_knowledge_stats WHERE user_id = ? AND knowledge_point_id = ?
+            ORDER BY id
+        """, (user_id, knowledge_point_id))
+        rows = cursor.fetchall()
+        
+        keep_id = rows[0][0]
+        total_attempts = sum(row[1] or 0 for row in rows)
+        correct_attempts = sum(row[2] or 0 for row in rows)
+        total_time_spent = sum(row[3] or 0 for row in rows)
+        last_practice_times = [row[4] for row in rows if row[4]]
+        
+        average_time = total_time_spent / total_attempts if total_attempts else 0.0
+        mastery_level = compute_mastery_level(correct_attempts, total_attempts)
+        
+        cursor.execute("""
+            UPDATE user_knowledge_stats
+            SET total_attempts = ?, correct_attempts = ?, total_time_spent = ?,
+                average_time = ?, mastery_level = ?, last_practice_time = ?
+            WHERE id = ?
+        """, (total_attempts, correct_attempts, total_time_spent, average_time, mastery_level,
+              max(last_practice_times) if last_practice_times else None, keep_id))
+        cursor.execute("""
+            DELETE FROM user_knowledge_stats
+            WHERE user_id = ? AND knowledge_point_id = ? AND id != ?
+        """, (user_id, knowledge_point_id, keep_id))
+        removed += cursor.rowcount
+    
+    # 重复行让这些用户的统计汇总偏大，在同一事务中删除汇总行（读取时会从明细重新计算）
+    cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'user_stats_summaries'")
+    if affected_users and cursor.fetchone():
+        cursor.executemany("DELETE FROM user_stats_summaries WHERE user_id = ?",
+                           [(user_id,) for user_id in affected_users])
+    
+    return removed, affected_users
+
+def _rebuild_summaries(db_path, user_ids):
+    """迁移的是应用使用的数据库时，立即为受影响的用户重建统计汇总"""
+    from models import db
+    from stats_summary import rebuild_stats_summaries
+    
+    with app.app_context():
+        if os.path.abspath(db.engine.url.database or '') != os.path.abspath(db_path):
+            print(f"⚠️ {db_path} 不是应用当前使用的数据库，受影响用户的统计汇总将在下次读取时重新计算")
+            return
+        db.create_all()
+        rebuild_stats_summaries(user_ids)
+        print(f"✅ 已重建 {len(user_ids)} 个用户的统计汇总")
+
+def backfill_next_review_dates(db_path='instance/question_bank.db'):
+    """为没有下次复习时间的错题补上时间，使其进入到期复习队列（从未复习过的按加入错题本的时间）"""
+    
+    conn = sqlite3.connect(db_path)
+    try:
+        cursor = conn.cursor()
+        cursor.execute("""
+            UPDATE wrong_questions
+            SET next_review_date = COALESCE(last_review_date, created_at, CURRENT_TIMESTAMP)
+            WHERE next_review_date IS NULL
+        """)
+        conn.commit()
+        print(f"✅ 已为 {cursor.rowcount} 条错题补充下次复习时间")
+    finally:
+        conn.close()
+
+def backfill_review_schedule(db_path='instance/question_bank.db'):
+    """
+    按旧的固定间隔算法留下的复习时间初始化 SM-2 调度状态：
+    间隔取 下次复习时间 - 上次复习时间，最近一次掌握程度>=3 的按复习次数计连续掌握次数
+    """
+    
+    conn = sqlite3.connect(db_path)
+    try:
+        cursor = conn.cursor()
+        cursor.execute("""
+            UPDATE wrong_questions
+            SET interval_days = MAX(julianday(next_review_date) - julianday(last_review_date), 0),
+                repetitions = CASE WHEN mastery_level >= 3 THEN review_count ELSE 0 END
+            WHERE last_review_date IS NOT NULL AND next_review_date IS NOT NULL
+              AND COALESCE(interval_days, 0) = 0
+        """)
+        conn.commit()
+        print(f"✅ 已为 {cursor.rowcount} 条复习过的错题初始化复习调度状态")
+    finally:
+        conn.close()
+
+def _dedupe_similar_questions(cursor):
+    """
+    为唯一索引 uq_similar_questions_slot 准备数据，返回删除的行数：
+    删除同一道错题下重复的相似题目，按生成顺序为没有序号的题目补齐 slot，
+    并删除超出 SIMILAR_QUESTION_COUNT 的部分（重复请求生成的多批题目只保留第一批）
+    """
+    cursor.execute("""
+        DELETE FROM similar_questions
+        WHERE id NOT IN (
+            SELECT MIN(id) FROM similar_questions
+            GROUP BY original_question_id, wrong_question_id, title, content
+        )
+    """)
+    removed = cursor.rowcount
+    cursor.execute("""
+        UPDATE similar_questions SET slot = (
+            SELECT COUNT(*) FROM similar_questions AS earlier
+            WHERE earlier.original_question_id = similar_questions.original_question_id
+              AND earlier.wrong_question_id IS similar_questions.wrong_question_id
+              AND earlier.id < similar_questions.id
+        )
+        WHERE slot IS NULL
+    """)
+    cursor.execute("DELETE FROM similar_questions WHERE slot >= ?", (SIMILAR_QUESTION_COUNT,))
+    return removed + cursor.rowcount
+
+def dedupe_similar_questions(db_path='instance/question_bank.db'):
+    """删除重复请求举一反三接口留下的重复相似题目并补齐序号，每道错题只保留最早生成的一批"""
+    
+    conn = sqlite3.connect(db_path)
+    try:
+        removed = _dedupe_similar_questions(conn.cursor())
+        conn.commit()
+        print(f"✅ 已删除 {removed} 条重复的相似题目")
+    finally:
+        conn.close()
+
+def migrate_indexes(db_path='instance/question_bank.db'):
+    """为已有的SQLite数据库添加热点查询的复合索引"""
+    
+    print("🔄 开始添加索引...")
+    
+    conn = sqlite3.connect(db_path)
+    try:
+        cursor = conn.cursor()
+        
+        removed, affected_users = _merge_duplicate_knowledge_stats(cursor)
+        if removed:
+            print(f"✅ 已合并 {removed} 条重复的 user_knowledge_stats 记录")
+        
+        duplicate_similar = _dedupe_similar_questions(cursor)
+        if duplicate_similar:
+            print(f"✅ 已删除 {duplicate_similar} 条重复的相似题目")
+        
+        for index_name, table_name, columns, unique in INDEX_DEFINITIONS:
+            try:
+                cursor.execute(
+                    f"CREATE {'UNIQUE ' if unique else ''}INDEX IF NOT EXISTS {index_name} "
+                    f"ON {table_name} ({columns})"
+                )
+                print(f"✅ 索引 {index_name} 已就绪")
+            except sqlite3.OperationalError as e:
+                print(f"❌ 创建索引 {index_name} 失败: {e}")
+        
+        # 更新统计信息，让查询规划器使用新索引
+        cursor.execute("ANALYZE")
+        conn.commit()
+        print("🎉 索引迁移完成！")
+    finally:
+        conn.close()
+    
+    if affected_users:
+        _rebuild_summaries(db_path, affected_users)
+
 if __name__ == "__main__":
     migrate_database()
+    backfill_next_review_dates()
+    backfill_review_schedule()
+    dedupe_similar_questions()
+    migrate_indexes()
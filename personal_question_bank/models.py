@@ -4,6 +4,27 @@ import json
 
 db = SQLAlchemy()
 
+def cached_json_column(instance, column_name):
+    """
+    解析JSON字符串字段，解析结果缓存在该行对象上
+    
+    原始字符串变化后缓存自动失效；解析失败返回None而不是抛出异常。
+    """
+    raw = getattr(instance, column_name)
+    cache = instance.__dict__.setdefault('_json_column_cache', {})
+    entry = cache.get(column_name)
+    if entry is not None and entry[0] == raw:
+        return entry[1]
+    
+    parsed = None
+    if raw:
+        try:
+            parsed = json.loads(raw)
+        except (json.JSONDecodeError, TypeError):
+            parsed = None
+    cache[column_name] = (raw, parsed)
+    return parsed
+
 class User(db.Model):
     """用户模型"""
     __tablename__ = 'users'
@@ -47,6 +68,9 @@ class User(db.Model):
 class KnowledgePoint(db.Model):
     """知识点模型"""
     __tablename__ = 'knowledge_points'
+    __table_args__ = (
+        db.Index('ix_knowledge_points_category_mode', 'category', 'question_bank_mode'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
@@ -69,6 +93,9 @@ class KnowledgePoint(db.Model):
 class Question(db.Model):
     """题目模型"""
     __tablename__ = 'questions'
+    __table_args__ = (
+        db.Index('ix_questions_mode_type_difficulty', 'question_bank_mode', 'question_type', 'difficulty'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(200), nullable=False)
@@ -108,38 +135,36 @@ class Question(db.Model):
     
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
-    def to_dict(self):
-        # 安全的JSON解析函数
-        def safe_json_loads(json_str):
-            if not json_str:
-                return None
-            try:
-                return json.loads(json_str)
-            except (json.JSONDecodeError, TypeError):
-                # 如果JSON解析失败，返回None而不是抛出异常
-                return None
+    @property
+    def parsed_options(self):
+        return cached_json_column(self, 'options')
+    
+    @property
+    def parsed_test_cases(self):
+        return cached_json_column(self, 'test_cases')
+    
+    # 序列化字段（列表接口的 light 字段集只输出并只从数据库读取 LIGHT_FIELDS，见 serializers.py）
+    LIGHT_FIELDS = ('id', 'title', 'content', 'question_type', 'difficulty', 'estimated_time')
+    DETAIL_FIELDS = ('correct_answer', 'explanation', 'programming_language', 'starter_code',
+                     'external_platform', 'external_id')
+    
+    def to_dict(self, light=False):
+        data = {field: getattr(self, field) for field in self.LIGHT_FIELDS}
+        data['knowledge_point'] = self.knowledge_point.to_dict() if self.knowledge_point else None
+        if light:
+            return data
         
-        return {
-            'id': self.id,
-            'title': self.title,
-            'content': self.content,
-            'question_type': self.question_type,
-            'difficulty': self.difficulty,
-            'estimated_time': self.estimated_time,
-            'knowledge_point': self.knowledge_point.to_dict() if self.knowledge_point else None,
-            'options': safe_json_loads(self.options),
-            'correct_answer': self.correct_answer,
-            'explanation': self.explanation,
-            'programming_language': self.programming_language,
-            'starter_code': self.starter_code,
-            'test_cases': safe_json_loads(self.test_cases),
-            'external_platform': self.external_platform,
-            'external_id': self.external_id
-        }
+        data.update({field: getattr(self, field) for field in self.DETAIL_FIELDS})
+        data['options'] = self.parsed_options
+        data['test_cases'] = self.parsed_test_cases
+        return data
 
 class LearningRecord(db.Model):
     """学习记录模型"""
     __tablename__ = 'learning_records'
+    __table_args__ = (
+        db.Index('ix_learning_records_user_completed', 'user_id', 'completed_at'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -164,25 +189,23 @@ class LearningRecord(db.Model):
     # 关联
     question = db.relationship('Question', backref='learning_records')
     
-    def to_dict(self):
-        return {
-            'id': self.id,
-            'user_id': self.user_id,
-            'question_id': self.question_id,
-            'is_correct': self.is_correct,
-            'partial_score': self.partial_score,
-            'time_spent': self.time_spent,
-            'attempt_count': self.attempt_count,
-            'user_answer': self.user_answer,
-            'interaction_type': self.interaction_type,
-            'started_at': self.started_at.isoformat(),
-            'completed_at': self.completed_at.isoformat(),
-            'question': self.question.to_dict() if self.question else None
-        }
+    FIELDS = ('id', 'user_id', 'question_id', 'is_correct', 'partial_score', 'time_spent', 'attempt_count',
+              'user_answer', 'interaction_type')
+    
+    def to_dict(self, light_question=False):
+        data = {field: getattr(self, field) for field in self.FIELDS}
+        data['started_at'] = self.started_at.isoformat()
+        data['completed_at'] = self.completed_at.isoformat()
+        data['question'] = self.question.to_dict(light_question) if self.question else None
+        return data
 
 class UserKnowledgeStats(db.Model):
     """用户知识点统计模型"""
     __tablename__ = 'user_knowledge_stats'
+    __table_args__ = (
+        # 每个用户每个知识点只有一行统计（唯一索引，新建库和迁移后的旧库结构一致）
+        db.Index('uq_user_knowledge_stats_user_kp', 'user_id', 'knowledge_point_id', unique=True),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -222,6 +245,111 @@ class UserKnowledgeStats(db.Model):
             'last_practice_time': self.last_practice_time.isoformat() if self.last_practice_time else None
         }
 
+class UserStatsSummary(db.Model):
+    """用户学习统计汇总（答题时在同一事务中增量维护，统计接口直接读取）"""
+    __tablename__ = 'user_stats_summaries'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, unique=True)
+    
+    # 答题总量
+    total_questions = db.Column(db.Integer, default=0)
+    correct_answers = db.Column(db.Integer, default=0)
+    total_time_spent = db.Column(db.Integer, default=0)  # 总耗时(秒)
+    
+    # 知识点掌握分布（与 UserKnowledgeStats.mastery_level 的分档一致）
+    mastered_knowledge_points = db.Column(db.Integer, default=0)  # > 0.7
+    learning_knowledge_points = db.Column(db.Integer, default=0)  # 0.3 - 0.7
+    weak_knowledge_points = db.Column(db.Integer, default=0)  # < 0.3
+    mastery_sum = db.Column(db.Float, default=0.0)  # 各知识点掌握程度之和，用于计算总体进度
+    
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    # 关联
+    user = db.relationship('User', backref=db.backref('stats_summary', uselist=False))
+    
+    @staticmethod
+    def mastery_bucket(mastery_level):
+        """掌握程度分档：mastered / learning / weak"""
+        mastery_level = mastery_level or 0.0
+        if mastery_level > 0.7:
+            return 'mastered'
+        if mastery_level >= 0.3:
+            return 'learning'
+        return 'weak'
+    
+    @property
+    def accuracy_rate(self):
+        if not self.total_questions:
+            return 0.0
+        return self.correct_answers / self.total_questions
+    
+    def _shift_bucket(self, mastery_level, delta):
+        column = f'{self.mastery_bucket(mastery_level)}_knowledge_points'
+        setattr(self, column, (getattr(self, column) or 0) + delta)
+    
+    def record_answer(self, is_correct, time_spent, old_mastery, new_mastery):
+        """
+        累加一次作答
+        
+        Args:
+            old_mastery: 作答前该知识点的掌握程度，知识点统计是新建的则为None
+            new_mastery: 作答后该知识点的掌握程度
+        """
+        self.total_questions = (self.total_questions or 0) + 1
+        if is_correct:
+            self.correct_answers = (self.correct_answers or 0) + 1
+        self.total_time_spent = (self.total_time_spent or 0) + time_spent
+        
+        if old_mastery is not None:
+            self._shift_bucket(old_mastery, -1)
+        self._shift_bucket(new_mastery, 1)
+        self.mastery_sum = (self.mastery_sum or 0.0) - (old_mastery or 0.0) + (new_mastery or 0.0)
+    
+    def to_dict(self):
+        return {
+            'user_id': self.user_id,
+            'total_questions': self.total_questions,
+            'correct_answers': self.correct_answers,
+            'accuracy_rate': self.accuracy_rate,
+            'total_time_spent': self.total_time_spent,
+            'mastered_knowledge_points': self.mastered_knowledge_points,
+            'learning_knowledge_points': self.learning_knowledge_points,
+            'weak_knowledge_points': self.weak_knowledge_points,
+            'mastery_sum': self.mastery_sum,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
+
+class DailyRecommendation(db.Model):
+    """离线预计算的每日6题（见 precompute_daily.py），推荐接口 count=6 时优先读取"""
+    __tablename__ = 'daily_recommendations'
+    __table_args__ = (
+        db.Index('uq_daily_recommendations_user_mode_date', 'user_id', 'question_bank_mode', 'recommend_date', unique=True),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    question_bank_mode = db.Column(db.String(20), nullable=False)  # academic, interview
+    recommend_date = db.Column(db.Date, nullable=False)  # UTC日期
+    question_ids = db.Column(db.Text, nullable=False)  # JSON数组，按展示顺序
+    bank_version = db.Column(db.Integer, default=0)  # 计算时的题库版本号，题库变化后视为过期
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    @property
+    def parsed_question_ids(self):
+        return cached_json_column(self, 'question_ids') or []
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'user_id': self.user_id,
+            'question_bank_mode': self.question_bank_mode,
+            'recommend_date': self.recommend_date.isoformat() if self.recommend_date else None,
+            'question_ids': self.parsed_question_ids,
+            'bank_version': self.bank_version,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
+
 class InterviewPreparationPlan(db.Model):
     """面试准备计划"""
     __tablename__ = 'interview_preparation_plans'
@@ -280,6 +408,10 @@ class InterviewPreparationPlan(db.Model):
 class WrongQuestion(db.Model):
     """错题本模型"""
     __tablename__ = 'wrong_questions'
+    __table_args__ = (
+        db.Index('ix_wrong_questions_user_question_mode', 'user_id', 'question_id', 'question_bank_mode'),
+        db.Index('ix_wrong_questions_user_mode_next_review', 'user_id', 'question_bank_mode', 'next_review_date'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -295,7 +427,12 @@ class WrongQuestion(db.Model):
     review_count = db.Column(db.Integer, default=0)  # 复习次数
     mastery_level = db.Column(db.Integer, default=0)  # 掌握程度 0-5
     last_review_date = db.Column(db.DateTime)  # 上次复习时间
-    next_review_date = db.Column(db.DateTime)  # 下次复习时间
+    next_review_date = db.Column(db.DateTime, default=datetime.utcnow)  # 下次复习时间（UTC，新错题立即进入复习队列）
+    
+    # SM-2 复习调度状态（见 review_scheduler.py）
+    ease_factor = db.Column(db.Float)  # 难易度因子，为空表示还没有复习过，按初始值计算
+    interval_days = db.Column(db.Float, default=0.0)  # 当前复习间隔（天）
+    repetitions = db.Column(db.Integer, default=0)  # 连续掌握（掌握程度>=3）的复习次数
     
     # 模式标识
     question_bank_mode = db.Column(db.String(20), default='academic')  # academic, interview
@@ -308,31 +445,32 @@ class WrongQuestion(db.Model):
     question = db.relationship('Question', backref='wrong_records')
     learning_record = db.relationship('LearningRecord', backref='wrong_question_record')
     
-    def to_dict(self):
-        return {
-            'id': self.id,
-            'user_id': self.user_id,
-            'question_id': self.question_id,
-            'question': self.question.to_dict() if self.question else None,
-            'wrong_answer': self.wrong_answer,
-            'correct_answer': self.correct_answer,
-            'mistake_reason': self.mistake_reason,
-            'review_count': self.review_count,
-            'mastery_level': self.mastery_level,
-            'last_review_date': self.last_review_date.isoformat() if self.last_review_date else None,
-            'next_review_date': self.next_review_date.isoformat() if self.next_review_date else None,
-            'question_bank_mode': self.question_bank_mode,
-            'created_at': self.created_at.isoformat() if self.created_at else None,
-            'updated_at': self.updated_at.isoformat() if self.updated_at else None
-        }
+    FIELDS = ('id', 'user_id', 'question_id', 'learning_record_id', 'wrong_answer', 'correct_answer',
+              'mistake_reason', 'review_count', 'mastery_level', 'ease_factor', 'interval_days', 'repetitions',
+              'question_bank_mode')
+    DATETIME_FIELDS = ('last_review_date', 'next_review_date', 'created_at', 'updated_at')
+    
+    def to_dict(self, light_question=False):
+        data = {field: getattr(self, field) for field in self.FIELDS}
+        for field in self.DATETIME_FIELDS:
+            value = getattr(self, field)
+            data[field] = value.isoformat() if value else None
+        data['question'] = self.question.to_dict(light_question) if self.question else None
+        return data
 
 class SimilarQuestion(db.Model):
     """举一反三题目模型"""
     __tablename__ = 'similar_questions'
+    __table_args__ = (
+        # 举一反三按 (原题, 错题) 查找已生成的题目；每道错题的每个序号只能写入一次，
+        # 多个进程同时生成时后写入的一方失败，不会重复生成
+        db.Index('uq_similar_questions_slot', 'original_question_id', 'wrong_question_id', 'slot', unique=True),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     original_question_id = db.Column(db.Integer, db.ForeignKey('questions.id'), nullable=False)
     wrong_question_id = db.Column(db.Integer, db.ForeignKey('wrong_questions.id'))
+    slot = db.Column(db.Integer)  # 在该错题的相似题目中的序号（从0开始）
     
     # 生成的相似题目
     title = db.Column(db.String(200), nullable=False)
@@ -422,3 +560,20 @@ class Company(db.Model):
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None
         }
+
+
+class QuestionBankVersion(db.Model):
+    """题库版本号：题目/知识点/公司发生写入时递增，用于让进程内缓存失效（见 bank_version.py）"""
+    __tablename__ = 'question_bank_versions'
+
+    id = db.Column(db.Integer, primary_key=True)
+    question_bank_mode = db.Column(db.String(20), nullable=False, unique=True)  # academic, interview
+    version = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            'question_bank_mode': self.question_bank_mode,
+            'version': self.version,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
@@ -0,0 +1,101 @@
+"""
+列表接口的分页工具
+
+- 游标分页（keyset）：按 id 升序（或降序），用 WHERE id > 上一页最后一个id 取下一页，
+  不需要 OFFSET 扫描，也不需要每页都执行 COUNT(*)，深翻页耗时不随页码增长
+- 游标对客户端不透明（urlsafe base64 编码的JSON），格式变化时不影响调用方
+- 总数可选，并按过滤条件缓存一段时间；旧的 page/per_page 分页也复用这份缓存
+"""
+
+import base64
+import binascii
+import json
+import threading
+import time
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+DEFAULT_PER_PAGE = 20
+MAX_PER_PAGE = 100
+COUNT_CACHE_TTL = 60  # 秒
+
+_count_cache: Dict[Hashable, Tuple[float, int]] = {}
+_count_cache_lock = threading.Lock()
+
+
+class InvalidCursor(ValueError):
+    """游标无法解析"""
+
+
+def encode_cursor(last_id: int) -> str:
+    payload = json.dumps({'id': last_id}, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(payload).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: Optional[str]) -> Optional[int]:
+    """解析游标，空游标表示第一页，返回 None"""
+    if not cursor:
+        return None
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        last_id = payload['id']
+    except (binascii.Error, UnicodeError, ValueError, TypeError, KeyError) as exc:
+        raise InvalidCursor(f'无效的分页游标: {cursor}') from exc
+    if not isinstance(last_id, int):
+        raise InvalidCursor(f'无效的分页游标: {cursor}')
+    return last_id
+
+
+def clamp_per_page(per_page: Optional[int]) -> int:
+    if not per_page or per_page < 1:
+        return DEFAULT_PER_PAGE
+    return min(per_page, MAX_PER_PAGE)
+
+
+def keyset_page(query, id_column, cursor: Optional[str], per_page: int,
+                descending: bool = False) -> Tuple[List[Any], Optional[str]]:
+    """
+    按 id_column 升序（descending=True 时降序）取一页，返回 (本页数据, 下一页游标)
+
+    多取一行用来判断是否还有下一页，没有下一页时游标为 None。
+    """
+    last_id = decode_cursor(cursor)
+    if last_id is not None:
+        query = query.filter(id_column < last_id if descending else id_column > last_id)
+
+    order = id_column.desc() if descending else id_column.asc()
+    rows = query.order_by(order).limit(per_page + 1).all()
+    if len(rows) <= per_page:
+        return rows, None
+
+    rows = rows[:per_page]
+    return rows, encode_cursor(rows[-1].id)
+
+
+def cached_count(query, cache_key: Hashable, ttl: int = COUNT_CACHE_TTL) -> int:
+    """带过期时间的 COUNT(*) 缓存，cache_key 应包含所有过滤条件"""
+    now = time.monotonic()
+    with _count_cache_lock:
+        cached = _count_cache.get(cache_key)
+        if cached and cached[0] > now:
+            return cached[1]
+
+    # 去掉排序和预加载选项后再计数
+    total = query.order_by(None).count()
+
+    with _count_cache_lock:
+        _count_cache[cache_key] = (now + ttl, total)
+    return total
+
+
+def clear_count_cache() -> None:
+    """题库数据变化后（例如批量导入）清空计数缓存"""
+    with _count_cache_lock:
+        _count_cache.clear()
+
+
+def paginate_with_cached_count(query, cache_key: Hashable, page: int, per_page: int):
+    """旧的 page/per_page 分页：OFFSET 取数据，总数走缓存而不是每页都 COUNT(*)"""
+    pagination = query.paginate(page=page, per_page=per_page, error_out=False, count=False)
+    pagination.total = cached_count(query, cache_key)
+    return pagination
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+每日6题离线预计算
+为活跃用户（最近30天有答题记录）计算学术模式和面试模式的每日6题，结果写入 DailyRecommendation。
+推荐接口 count=6 时直接读取当天的结果，没有结果或题库版本已变化时才实时计算。
+
+建议每天凌晨（UTC日期切换之后）定时运行，也可以随时手动运行：
+
+    python precompute_daily.py          # 所有活跃用户
+    python precompute_daily.py 3 5      # 只计算指定用户
+
+并行进程数默认为CPU核数，可通过环境变量 DAILY_PRECOMPUTE_WORKERS 调整（设为1则在当前进程内计算）。
+推荐引擎的逐个用户的日志对批量任务没有意义，任务运行时只输出 WARNING 及以上级别。
+"""
+
+import json
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional
+
+from app import app
+from models import db, User, LearningRecord, DailyRecommendation
+from bank_version import get_bank_version
+from recommendation_engine import RecommendationEngine, DAILY_QUESTION_COUNT
+
+QUESTION_BANK_MODES = ('academic', 'interview')
+ACTIVE_DAYS = 30
+CHUNK_SIZE = 50
+
+_worker_engine: Optional[RecommendationEngine] = None
+
+
+def quiet_engine_logs() -> None:
+    """只保留推荐引擎 WARNING 及以上级别的日志"""
+    logging.getLogger('recommendation_engine').setLevel(logging.WARNING)
+
+
+def select_active_users(days: int = ACTIVE_DAYS) -> List[int]:
+    """最近 days 天内有答题记录的用户"""
+    rows = db.session.query(LearningRecord.user_id)\
+                     .filter(LearningRecord.completed_at >= datetime.utcnow() - timedelta(days=days))\
+                     .distinct().all()
+    return sorted(row[0] for row in rows)
+
+
+def _init_worker():
+    """子进程初始化：进入应用上下文，丢弃从父进程继承的数据库连接"""
+    global _worker_engine
+    quiet_engine_logs()
+    app.app_context().push()
+    db.engine.dispose(close=False)
+    _worker_engine = RecommendationEngine()
+
+
+def compute_daily_sets(user_ids: Iterable[int]) -> List[Dict]:
+    """计算一批用户两种模式的每日6题（需要在应用上下文中调用）"""
+    global _worker_engine
+    if _worker_engine is None:
+        _worker_engine = RecommendationEngine()
+
+    results = []
+    for user_id in user_ids:
+        for mode in QUESTION_BANK_MODES:
+            try:
+                question_ids = _worker_engine.recommend_question_ids(user_id, DAILY_QUESTION_COUNT, mode)
+            except ValueError as e:
+                print(f"⚠️ 跳过用户 {user_id} ({mode}): {e}")
+                continue
+            results.append({'user_id': user_id, 'question_bank_mode': mode, 'question_ids': question_ids})
+        db.session.remove()
+    return results
+
+
+def save_daily_sets(results: List[Dict], recommend_date, bank_versions: Dict[str, int]) -> int:
+    """覆盖写入当天的预计算结果，返回写入条数"""
+    user_ids = sorted({item['user_id'] for item in results})
+    for start in range(0, len(user_ids), 500):
+        DailyRecommendation.query.filter(
+            DailyRecommendation.recommend_date == recommend_date,
+            DailyRecommendation.user_id.in_(user_ids[start:start + 500])
+        ).delete(synchronize_session=False)
+
+    db.session.add_all([
+        DailyRecommendation(
+            user_id=item['user_id'],
+            question_bank_mode=item['question_bank_mode'],
+            recommend_date=recommend_date,
+            question_ids=json.dumps(item['question_ids']),
+            bank_version=bank_versions[item['question_bank_mode']]
+        )
+        for item in results
+    ])
+    db.session.commit()
+    return len(results)
+
+
+def precompute_daily_recommendations(user_ids: Optional[Iterable[int]] = None, workers: Optional[int] = None) -> int:
+    """计算并保存每日6题（需要在应用上下文中调用），返回写入条数"""
+    user_ids = list(user_ids) if user_ids is not None else select_active_users()
+    workers = workers or int(os.getenv('DAILY_PRECOMPUTE_WORKERS', os.cpu_count() or 1))
+
+    # 在计算之前读取版本号：计算期间题库有变化时，结果会被视为过期而不是被误用
+    recommend_date = datetime.utcnow().date()
+    bank_versions = {mode: get_bank_version(mode) for mode in QUESTION_BANK_MODES}
+
+    chunks = [user_ids[start:start + CHUNK_SIZE] for start in range(0, len(user_ids), CHUNK_SIZE)]
+    results = []
+    if workers <= 1 or len(chunks) <= 1:
+        for chunk in chunks:
+            results.extend(compute_daily_sets(chunk))
+    else:
+        db.session.remove()
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as executor:
+            for chunk_results in executor.map(compute_daily_sets, chunks):
+                results.extend(chunk_results)
+
+    return save_daily_sets(results, recommend_date, bank_versions)
+
+
+if __name__ == "__main__":
+    target_user_ids = [int(arg) for arg in sys.argv[1:]] or None
+
+    quiet_engine_logs()
+    with app.app_context():
+        db.create_all()
+        if target_user_ids is None:
+            target_user_ids = select_active_users()
+        print(f"🔄 开始预计算每日6题: {len(target_user_ids)} 个用户")
+        started = time.perf_counter()
+        saved = precompute_daily_recommendations(target_user_ids)
+        print(f"✅ 已保存 {saved} 组每日题目，用时 {time.perf_counter() - started:.1f} 秒")
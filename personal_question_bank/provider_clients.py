@@ -0,0 +1,135 @@
+"""
+大模型服务商的HTTP客户端
+AI面试官每一轮对话都要请求服务商的接口，这里统一管理连接和凭证：
+
+- 每个服务商一个长连接 requests.Session，连接池大小按服务商配置（PROVIDER_POOL_SIZES），
+  同一服务商的请求复用已建立的TLS连接
+- 所有请求都带连接超时和读取超时（环境变量 LLM_CONNECT_TIMEOUT / LLM_READ_TIMEOUT，单位秒）
+- 百度的 access_token 和智谱的JWT缓存到过期前 TOKEN_REFRESH_MARGIN 秒，期间不再重新获取/签名；
+  接口返回凭证失效时调用 invalidate_token() 丢弃缓存，下次请求重新获取
+"""
+
+import os
+import threading
+import time
+from typing import Callable, Dict, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+CONNECT_TIMEOUT = float(os.getenv('LLM_CONNECT_TIMEOUT', 3.05))
+READ_TIMEOUT = float(os.getenv('LLM_READ_TIMEOUT', 30))
+DEFAULT_TIMEOUT = (CONNECT_TIMEOUT, READ_TIMEOUT)
+
+# 每个服务商的连接池大小（同时进行的请求数），百度的对话和语音识别在不同域名下，各占一个池
+PROVIDER_POOL_SIZES = {
+    'qwen': 10,
+    'baidu': 10,
+    'zhipu': 10,
+}
+DEFAULT_POOL_SIZE = 4
+
+TOKEN_REFRESH_MARGIN = 300  # 凭证在过期前多少秒刷新
+ZHIPU_TOKEN_TTL = 3600
+
+BAIDU_TOKEN_URL = "https://aip.baidubce.com/oauth/2.0/token"
+# 百度接口返回的凭证无效/过期错误码
+BAIDU_TOKEN_ERROR_CODES = {110, 111}
+
+_sessions: Dict[str, requests.Session] = {}
+_sessions_lock = threading.Lock()
+
+
+def get_session(provider: str) -> requests.Session:
+    """服务商的长连接会话（第一次使用时创建）"""
+    session = _sessions.get(provider)
+    if session is not None:
+        return session
+    with _sessions_lock:
+        session = _sessions.get(provider)
+        if session is None:
+            pool_size = PROVIDER_POOL_SIZES.get(provider, DEFAULT_POOL_SIZE)
+            adapter = HTTPAdapter(pool_connections=2, pool_maxsize=pool_size)
+            session = requests.Session()
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            _sessions[provider] = session
+    return session
+
+
+def post(provider: str, url: str, timeout=DEFAULT_TIMEOUT, **kwargs) -> requests.Response:
+    """通过服务商的会话发送POST请求，默认带连接和读取超时"""
+    return get_session(provider).post(url, timeout=timeout, **kwargs)
+
+
+class TokenCache:
+    """按键缓存凭证，过期前 refresh_margin 秒重新获取；同一个键同时只有一个线程在获取"""
+
+    def __init__(self, refresh_margin: float = TOKEN_REFRESH_MARGIN):
+        self.refresh_margin = refresh_margin
+        self._tokens: Dict[str, Tuple[str, float]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str, fetch: Callable[[], Tuple[str, float]]) -> str:
+        """返回缓存的凭证，即将过期或不存在时调用 fetch() 获取 (凭证, 有效秒数)"""
+        cached = self._tokens.get(key)
+        if cached is not None and time.monotonic() < cached[1]:
+            return cached[0]
+        with self._lock:
+            cached = self._tokens.get(key)
+            if cached is not None and time.monotonic() < cached[1]:
+                return cached[0]
+            token, expires_in = fetch()
+            if token:
+                # 有效期比刷新提前量还短时，至少缓存一半的有效期
+                lifetime = max(expires_in - self.refresh_margin, expires_in / 2)
+                self._tokens[key] = (token, time.monotonic() + lifetime)
+            return token
+
+    def invalidate(self, key: str) -> None:
+        with self._lock:
+            self._tokens.pop(key, None)
+
+
+token_cache = TokenCache()
+
+
+def baidu_access_token(api_key: str, secret_key: str) -> str:
+    """百度开放平台的 access_token（文心一言和语音识别共用），获取失败时返回空字符串"""
+    def fetch():
+        response = post('baidu', BAIDU_TOKEN_URL, params={
+            'grant_type': 'client_credentials',
+            'client_id': api_key,
+            'client_secret': secret_key
+        })
+        result = response.json()
+        return result.get('access_token', ''), float(result.get('expires_in', 0))
+
+    return token_cache.get(f'baidu:{api_key}', fetch)
+
+
+def zhipu_token(api_key: str, exp_seconds: int = ZHIPU_TOKEN_TTL) -> str:
+    """智谱AI的JWT（用API Key中的密钥签名），有效期内复用同一个"""
+    def fetch():
+        import jwt
+
+        try:
+            key_id, secret = api_key.split(".")
+        except Exception:
+            raise Exception("invalid apikey")
+
+        now_ms = int(round(time.time() * 1000))
+        payload = {
+            "iss": key_id,
+            "exp": now_ms + exp_seconds * 1000,
+            "timestamp": now_ms,
+        }
+        token = jwt.encode(payload, secret, algorithm="HS256", headers={"alg": "HS256", "sign_type": "SIGN"})
+        return token, float(exp_seconds)
+
+    return token_cache.get(f'zhipu:{api_key}', fetch)
+
+
+def invalidate_token(provider: str, api_key: str) -> None:
+    """服务商返回凭证失效时丢弃缓存的凭证"""
+    token_cache.invalidate(f'{provider}:{api_key}')
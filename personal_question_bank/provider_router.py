@@ -0,0 +1,265 @@
+"""
+大模型服务商路由
+AI面试官配置了多个服务商时，按各服务商最近的表现选择调用顺序，而不是固定使用一个：
+
+- 记录每个服务商的延迟（EWMA 和最近 LATENCY_WINDOW 次的p95）和最近 ERROR_WINDOW 次调用的错误率；
+  流式调用记录的是首个片段的到达时间，与非流式调用的完整耗时分开统计
+- 熔断：连续失败 CIRCUIT_FAILURES 次，或最近的错误率超过 CIRCUIT_ERROR_RATE 时打开熔断器，
+  CIRCUIT_COOLDOWN 秒内不再调用；冷却结束后放行一次试探调用（半开），成功则关闭，失败则重新打开；
+  试探调用超过 TRIAL_TIMEOUT 秒仍没有记录结果（调用方异常退出）时视为丢失，再放行一次
+- 调用顺序：熔断器未打开的服务商按EWMA延迟（流式调用按首个片段的EWMA延迟）从低到高
+  （还没有延迟数据的按配置的优先级排在前面），失败时依次换下一个；
+  所有服务商都不可用时返回 None，由调用方使用模拟回应
+- 对冲：设置 LLM_HEDGE_AFTER（秒）后，首选服务商超过该时间还没有返回时同时请求下一个服务商，
+  采用先成功返回的结果
+- snapshot() 返回各服务商的统计、熔断状态和最近的路由决策，供监控接口使用
+
+    LLM_HEDGE_AFTER=4 LLM_CIRCUIT_FAILURES=3 LLM_CIRCUIT_COOLDOWN=30 LLM_TRIAL_TIMEOUT=120
+"""
+
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+EWMA_ALPHA = 0.3
+LATENCY_WINDOW = 100
+ERROR_WINDOW = 20
+MIN_ERROR_SAMPLES = 10
+CIRCUIT_FAILURES = int(os.getenv('LLM_CIRCUIT_FAILURES', 3))
+CIRCUIT_ERROR_RATE = 0.5
+CIRCUIT_COOLDOWN = float(os.getenv('LLM_CIRCUIT_COOLDOWN', 30))
+TRIAL_TIMEOUT = float(os.getenv('LLM_TRIAL_TIMEOUT', 120))
+HEDGE_AFTER = float(os.getenv('LLM_HEDGE_AFTER') or 0) or None
+DECISION_LOG_SIZE = 50
+
+CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+
+
+def _ms(seconds: Optional[float]) -> Optional[float]:
+    return round(seconds * 1000, 1) if seconds is not None else None
+
+
+class ProviderStats:
+    """单个服务商的延迟、错误率和熔断状态（由 ProviderRouter 加锁访问）"""
+
+    def __init__(self, name: str, priority: int):
+        self.name = name
+        self.priority = priority
+        self.ewma_latency = None
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self.stream_ewma_latency = None  # 流式调用首个片段的到达时间
+        self.stream_latencies = deque(maxlen=LATENCY_WINDOW)
+        self.outcomes = deque(maxlen=ERROR_WINDOW)  # True 为成功
+        self.calls = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.state = CLOSED
+        self.opened_at = None
+        self.trial_in_flight = False
+        self.trial_started_at = None
+        self.last_error = None
+
+    def available(self, now: float) -> bool:
+        if self.state == CLOSED:
+            return True
+        if self.state == OPEN and now - self.opened_at >= CIRCUIT_COOLDOWN:
+            self.state = HALF_OPEN
+            self.trial_in_flight = False
+        if self.trial_in_flight and now - self.trial_started_at >= TRIAL_TIMEOUT:
+            # 试探调用一直没有记录结果，不能让服务商永远停在半开状态
+            self.trial_in_flight = False
+        # 半开状态只放行一次试探调用
+        return self.state == HALF_OPEN and not self.trial_in_flight
+
+    def start_trial(self, now: float) -> None:
+        self.trial_in_flight = True
+        self.trial_started_at = now
+
+    def routing_latency(self, streaming: bool = False) -> Optional[float]:
+        return self.stream_ewma_latency if streaming else self.ewma_latency
+
+    def error_rate(self) -> float:
+        return 1 - sum(self.outcomes) / len(self.outcomes) if self.outcomes else 0.0
+
+    def p95_latency(self, streaming: bool = False) -> Optional[float]:
+        latencies = self.stream_latencies if streaming else self.latencies
+        return float(np.percentile(latencies, 95)) if latencies else None
+
+    def record(self, success: bool, latency: float, now: float, error: Optional[str] = None,
+               streaming: bool = False) -> None:
+        """记录一次调用的结果；streaming=True 时 latency 为首个片段的到达时间"""
+        self.calls += 1
+        self.outcomes.append(success)
+        self.trial_in_flight = False
+        if success:
+            if streaming:
+                self.stream_latencies.append(latency)
+                self.stream_ewma_latency = latency if self.stream_ewma_latency is None else \
+                    EWMA_ALPHA * latency + (1 - EWMA_ALPHA) * self.stream_ewma_latency
+            else:
+                self.latencies.append(latency)
+                self.ewma_latency = latency if self.ewma_latency is None else \
+                    EWMA_ALPHA * latency + (1 - EWMA_ALPHA) * self.ewma_latency
+            self.consecutive_failures = 0
+            self.state = CLOSED
+            return
+
+        self.failures += 1
+        self.consecutive_failures += 1
+        self.last_error = error
+        too_many_errors = len(self.outcomes) >= MIN_ERROR_SAMPLES and self.error_rate() > CIRCUIT_ERROR_RATE
+        if self.state == HALF_OPEN or self.consecutive_failures >= CIRCUIT_FAILURES or too_many_errors:
+            self.state = OPEN
+            self.opened_at = now
+
+    def to_dict(self) -> Dict:
+        return {
+            'provider': self.name,
+            'state': self.state,
+            'calls': self.calls,
+            'failures': self.failures,
+            'error_rate': round(self.error_rate(), 4),
+            'ewma_latency_ms': _ms(self.ewma_latency),
+            'p95_latency_ms': _ms(self.p95_latency()),
+            'stream_first_chunk_ewma_ms': _ms(self.stream_ewma_latency),
+            'stream_first_chunk_p95_ms': _ms(self.p95_latency(streaming=True)),
+            'consecutive_failures': self.consecutive_failures,
+            'last_error': self.last_error
+        }
+
+
+class ProviderRouter:
+    """按延迟和熔断状态在多个服务商之间路由调用"""
+
+    def __init__(self, providers: Sequence[str], hedge_after: Optional[float] = HEDGE_AFTER):
+        self.stats = {name: ProviderStats(name, priority) for priority, name in enumerate(providers)}
+        self.hedge_after = hedge_after
+        self.decisions = deque(maxlen=DECISION_LOG_SIZE)
+        self._lock = threading.Lock()
+        self._executor = None
+
+    def candidates(self, streaming: bool = False) -> List[str]:
+        """当前可调用的服务商，按EWMA延迟（流式调用按首个片段的EWMA延迟）排序"""
+        now = time.monotonic()
+        with self._lock:
+            available = [(stats.routing_latency(streaming), stats.priority, stats.name)
+                         for stats in self.stats.values() if stats.available(now)]
+        available.sort(key=lambda item: (item[0] is not None, item[0] or 0, item[1]))
+        return [name for _, _, name in available]
+
+    def acquire(self, name: str) -> bool:
+        """开始调用前确认服务商仍可用（半开状态的试探调用只放行一个）"""
+        with self._lock:
+            stats = self.stats[name]
+            now = time.monotonic()
+            if not stats.available(now):
+                return False
+            if stats.state == HALF_OPEN:
+                stats.start_trial(now)
+            return True
+
+    def record(self, name: str, success: bool, latency: float, error: Optional[str] = None,
+               streaming: bool = False) -> None:
+        with self._lock:
+            self.stats[name].record(success, latency, time.monotonic(), error, streaming)
+
+    def _timed_call(self, name: str, call: Callable[[str], object]) -> Tuple[str, object]:
+        started = time.perf_counter()
+        try:
+            result = call(name)
+        except Exception as e:
+            self.record(name, False, time.perf_counter() - started, str(e))
+            raise
+        self.record(name, True, time.perf_counter() - started)
+        return name, result
+
+    def call(self, call: Callable[[str], object]) -> Optional[object]:
+        """
+        按路由顺序调用 call(服务商名称)，返回第一个成功的结果；
+        call 失败时抛出异常。所有服务商都不可用或都失败时返回 None
+        """
+        decision = self.new_decision()
+        remaining = list(decision['order'])
+        result = None
+        try:
+            if self.hedge_after and len(remaining) > 1:
+                result = self._call_hedged(call, remaining, decision)
+            else:
+                result = self._call_sequential(call, remaining, decision)
+        finally:
+            self.finish_decision(decision)
+        return result
+
+    def new_decision(self, streaming: bool = False) -> Dict:
+        """开始一次路由决策，记录此刻的候选顺序"""
+        return {'time': time.time(), 'order': self.candidates(streaming), 'attempted': [], 'hedged': False,
+                'streaming': streaming, 'provider': None, '_started': time.perf_counter()}
+
+    def finish_decision(self, decision: Dict) -> None:
+        """记录路由决策的结果和总耗时"""
+        decision['latency_ms'] = round((time.perf_counter() - decision.pop('_started')) * 1000, 1)
+        decision['fallback'] = decision['provider'] is None
+        with self._lock:
+            self.decisions.append(decision)
+
+    def _call_sequential(self, call, remaining: List[str], decision: Dict):
+        while remaining:
+            name = remaining.pop(0)
+            if not self.acquire(name):
+                continue
+            decision['attempted'].append(name)
+            try:
+                _, result = self._timed_call(name, call)
+            except Exception:
+                continue
+            decision['provider'] = name
+            return result
+        return None
+
+    def _call_hedged(self, call, remaining: List[str], decision: Dict):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix='llm-router')
+        executor = self._executor
+        pending = set()
+
+        def start_next() -> bool:
+            while remaining:
+                name = remaining.pop(0)
+                if self.acquire(name):
+                    decision['attempted'].append(name)
+                    pending.add(executor.submit(self._timed_call, name, call))
+                    return True
+            return False
+
+        start_next()
+        while pending:
+            # 只有一个请求在进行时等到延迟预算用完，再对冲下一个服务商
+            timeout = self.hedge_after if len(pending) == 1 and remaining else None
+            done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                if start_next():
+                    decision['hedged'] = True
+                continue
+            for future in done:
+                if future.exception() is None:
+                    # 落后的请求继续在后台完成，结果只计入统计
+                    name, result = future.result()
+                    decision['provider'] = name
+                    return result
+            if not pending:
+                start_next()
+        return None
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {
+                'providers': [stats.to_dict() for stats in sorted(self.stats.values(), key=lambda s: s.priority)],
+                'hedge_after_ms': round(self.hedge_after * 1000, 1) if self.hedge_after else None,
+                'recent_decisions': list(self.decisions)
+            }
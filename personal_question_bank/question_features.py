@@ -0,0 +1,98 @@
+"""
+题库特征矩阵
+推荐引擎按题库模式在内存中保存一份题目特征（难度、题型、知识点、预计用时），
+打分和挑选都在NumPy数组上完成，最后只为选中的题目id加载ORM对象。
+特征矩阵随题库版本号（见 bank_version.py）自动刷新，导入题目后无需重启服务。
+
+每个特征都编码成“取值词表 + 每道题的编码”：每种取值只需要打一次分，
+再用编码一次索引得到所有题目的分数。
+"""
+
+from typing import Iterable, List, Tuple
+
+import numpy as np
+
+from models import db, Question
+
+DEFAULT_ESTIMATED_TIME = 10  # 分钟，与 Question.estimated_time 为空时的处理一致
+MISSING_ID = -1
+
+
+def encode_values(values: List) -> Tuple[List, np.ndarray]:
+    """把取值列表编码为 (词表, 编码数组)，取值可以包含None"""
+    vocab = {}
+    codes = np.empty(len(values), dtype=np.int32)
+    for index, value in enumerate(values):
+        codes[index] = vocab.setdefault(value, len(vocab))
+    return list(vocab), codes
+
+
+class QuestionFeatures:
+    """
+    单个题库模式的题目特征，按题目id升序排列
+
+    - ids: 题目id（int64）
+    - *_values / *_codes: 难度、题型、知识点id（为空时为 -1）、预计用时（分钟，为空或0时按10分钟）
+      的取值词表和每道题在词表中的编码
+    """
+
+    def __init__(self, mode: str, ids, difficulties: List, question_types: List,
+                 knowledge_point_ids: List, estimated_times: List):
+        self.mode = mode
+        self.ids = np.asarray(ids, dtype=np.int64)
+        self.difficulty_values, self.difficulty_codes = encode_values(difficulties)
+        self.type_values, self.type_codes = encode_values(question_types)
+        self.knowledge_point_values, self.knowledge_point_codes = encode_values(knowledge_point_ids)
+        self.estimated_time_values, self.estimated_time_codes = encode_values(estimated_times)
+
+        self._type_index = {value: code for code, value in enumerate(self.type_values)}
+
+    @classmethod
+    def load(cls, mode: str) -> 'QuestionFeatures':
+        """只查询打分需要的列，不创建ORM对象"""
+        rows = db.session.query(
+            Question.id,
+            Question.difficulty,
+            Question.question_type,
+            Question.knowledge_point_id,
+            Question.estimated_time
+        ).filter(Question.question_bank_mode == mode).order_by(Question.id).all()
+
+        return cls(
+            mode,
+            ids=[row[0] for row in rows],
+            difficulties=[row[1] for row in rows],
+            question_types=[row[2] for row in rows],
+            knowledge_point_ids=[row[3] if row[3] is not None else MISSING_ID for row in rows],
+            estimated_times=[row[4] or DEFAULT_ESTIMATED_TIME for row in rows]
+        )
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def type_code(self, question_type) -> int:
+        """词表里没有的题型返回 -1，不会与任何题目相等"""
+        return self._type_index.get(question_type, -1)
+
+    def type_codes_for(self, question_types: Iterable) -> np.ndarray:
+        return np.array([self._type_index[t] for t in question_types if t in self._type_index], dtype=np.int32)
+
+    def type_mask(self, question_types: Iterable) -> np.ndarray:
+        """每道题的题型是否属于给定题型集合"""
+        lookup = np.zeros(len(self.type_values), dtype=bool)
+        lookup[self.type_codes_for(question_types)] = True
+        return lookup[self.type_codes]
+
+    def positions_of(self, question_ids: Iterable[int]) -> np.ndarray:
+        """把题目id映射为矩阵中的行号（不在本题库中的id被忽略）"""
+        question_ids = np.fromiter(question_ids, dtype=np.int64)
+        if len(self.ids) == 0 or len(question_ids) == 0:
+            return np.empty(0, dtype=np.int64)
+        positions = np.clip(np.searchsorted(self.ids, question_ids), 0, len(self.ids) - 1)
+        return positions[self.ids[positions] == question_ids]
+
+    def mask_of(self, question_ids: Iterable[int]) -> np.ndarray:
+        """题目id集合对应的布尔掩码"""
+        mask = np.zeros(len(self.ids), dtype=bool)
+        mask[self.positions_of(question_ids)] = True
+        return mask
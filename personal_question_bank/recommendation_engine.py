@@ -1,55 +1,164 @@
 import numpy as np
 import pandas as pd
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
-from sklearn.cluster import KMeans
 from datetime import datetime, timedelta
 import json
+import logging
 from typing import List, Dict, Tuple
 from collections import defaultdict
 
-from models import db, User, Question, LearningRecord, KnowledgePoint, UserKnowledgeStats
+from sqlalchemy import func
+from sqlalchemy.orm import joinedload
+
+from config import Config
+from models import db, User, Question, LearningRecord, KnowledgePoint, UserKnowledgeStats, DailyRecommendation
+from bank_version import BankVersionCache, get_bank_version
+from question_features import QuestionFeatures
+from user_profile_store import AnswerEvent, UserProfileStore
+from co_mistake import CoMistakeStore
+from learner_clusters import LearnerClusterStore, learner_vector
+
+DAILY_QUESTION_COUNT = 6
+RECENT_MISTAKE_LIMIT = 10  # 协同打分参考的最近错题数量
+
+logger = logging.getLogger(__name__)
 
 class RecommendationEngine:
     """个性化推荐引擎"""
     
     def __init__(self):
-        self.user_profiles = {}
-        self.question_features = {}
+        self.user_profiles = UserProfileStore(ttl=Config.RECOMMENDATION_CONFIG['cache_ttl'])  # 增量维护的用户画像计数
+        self.question_features = BankVersionCache()  # 按题库模式缓存特征矩阵，题库版本变化时重建
+        self.co_mistakes = CoMistakeStore()  # 题目之间的共同错题计数（协同推荐）
+        self.learner_clusters = LearnerClusterStore()  # 学习者聚类和每个聚类预排序的题目（冷启动）
+        self.weights = Config.RECOMMENDATION_CONFIG
         self.difficulty_weights = {'easy': 1, 'medium': 2, 'hard': 3}
         self.type_weights = {'theory': 1, 'multiple_choice': 1, 'practical': 2, 'coding': 3}
     
     def recommend_questions(self, user_id: int, count: int = 10, question_bank_mode: str = 'academic') -> List[Question]:
         """为用户推荐个性化题目"""
         
-        # 1. 构建用户画像
-        user_profile = self._build_user_profile(user_id)
-        print(f"用户 {user_id} 画像: 偏好难度={user_profile.get('preferred_difficulty')}, "
-              f"偏好题型={user_profile.get('preferred_types')}, "
-              f"薄弱知识点={len(user_profile.get('weak_knowledge_points', []))}个")
+        # 每日6题优先读取离线预计算的结果（见 precompute_daily.py），没有或已过期时实时计算
+        if count == DAILY_QUESTION_COUNT:
+            stored_ids = self.get_stored_daily_question_ids(user_id, question_bank_mode)
+            if stored_ids is not None:
+                logger.info("用户 %s 使用预计算的每日题目: %s", user_id, stored_ids)
+                return self._load_questions(stored_ids)
+        
+        # 只为最终选中的题目加载ORM对象
+        final_questions = self._load_questions(self.recommend_question_ids(user_id, count, question_bank_mode))
+        logger.info("最终推荐 %d 道题目", len(final_questions))
         
-        # 2. 获取候选题目
-        candidate_questions = self._get_candidate_questions(user_id, user_profile, question_bank_mode)
-        print(f"候选题目数量: {len(candidate_questions)}")
+        return final_questions
+    
+    def recommend_question_ids(self, user_id: int, count: int = 10, question_bank_mode: str = 'academic') -> List[int]:
+        """实时计算推荐题目id（按展示顺序）"""
         
-        if not candidate_questions:
-            print("警告: 没有找到候选题目!")
+        # 1. 构建用户画像
+        user_profile = self._build_user_profile(user_id)
+        logger.debug("用户 %s 画像: 偏好难度=%s, 偏好题型=%s, 薄弱知识点=%d个", user_id,
+                     user_profile.get('preferred_difficulty'), user_profile.get('preferred_types'),
+                     len(user_profile.get('weak_knowledge_points', [])))
+        
+        # 最近答题很少的用户直接使用所属聚类预先排好的题目（见 learner_clusters.py），不逐题打分
+        if user_profile['recent_activity'] < self.weights['cold_start_threshold']:
+            cluster_question_ids = self._recommend_from_cluster(user_profile, count, question_bank_mode)
+            if cluster_question_ids is not None:
+                return cluster_question_ids
+        
+        # 2. 获取候选题目（特征矩阵中的行号）
+        features = self.get_question_features(question_bank_mode)
+        candidates = self._get_candidate_positions(user_id, user_profile, features)
+        logger.debug("候选题目数量: %d", len(candidates))
+        
+        if len(candidates) == 0:
+            logger.warning("用户 %s 没有找到候选题目 (%s)", user_id, question_bank_mode)
             return []
         
-        # 3. 计算推荐分数
-        scored_questions = self._score_questions(user_profile, candidate_questions)
-        print(f"评分完成，前3题分数: {[(q.title, round(score, 2)) for q, score in scored_questions[:3]]}")
+        # 3. 计算推荐分数（向量化）
+        ranked, ranked_scores = self.score_questions(user_profile, features, candidates)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("评分完成，前3题分数: %s",
+                         [(int(features.ids[p]), round(float(s), 2)) for p, s in zip(ranked[:3], ranked_scores[:3])])
         
         # 4. 按照用户要求排列：前4道非编程题，后2道编程题
-        if count == 6:  # 每日6道题的特殊处理
-            final_questions = self._arrange_daily_questions(scored_questions, question_bank_mode)
+        if count == DAILY_QUESTION_COUNT:  # 每日6道题的特殊处理
+            selected = self._arrange_daily_questions(features, ranked, ranked_scores)
         else:
             # 其他情况使用原有的多样性调整
-            final_questions = self._diversify_recommendations(scored_questions, count)
+            selected = self._diversify_recommendations(features, ranked, count)
         
-        print(f"最终推荐 {len(final_questions)} 道题目")
-        
-        return final_questions
+        return [int(features.ids[p]) for p in selected]
+    
+    def get_stored_daily_question_ids(self, user_id: int, question_bank_mode: str):
+        """
+        读取今天预计算的每日题目id；不存在、不是今天的、题库已变化，
+        或其中有题目在预计算之后已经做过时返回None（实时计算会排除最近做过的题）
+        """
+        record = DailyRecommendation.query.filter_by(
+            user_id=user_id,
+            question_bank_mode=question_bank_mode,
+            recommend_date=datetime.utcnow().date()
+        ).first()
+        
+        if record is None or record.bank_version != get_bank_version(question_bank_mode):
+            return None
+        
+        question_ids = record.parsed_question_ids
+        if question_ids and record.created_at is not None:
+            # 走 (user_id, completed_at) 索引，只查预计算之后的答题
+            answered = db.session.query(LearningRecord.id).filter(
+                LearningRecord.user_id == user_id,
+                LearningRecord.completed_at >= record.created_at,
+                LearningRecord.question_id.in_(question_ids)
+            ).first()
+            if answered is not None:
+                return None
+        return question_ids
+    
+    def _recommend_from_cluster(self, user_profile: Dict, count: int, question_bank_mode: str):
+        """从所属聚类预排序的题目中去掉做过的题再挑选；没有聚类结果、已过期或题目不够时返回None"""
+        # 聚类中心按30天内的汇总训练，用户向量也用同一窗口的汇总计算
+        history = user_profile['recent_history']
+        vector = learner_vector(
+            history['total'], history['correct'], history['time_spent'],
+            history['type_counts'], history['interview_count'],
+            user_profile['preferred_types'], user_profile['preferred_mode']
+        )
+        events = user_profile['recent_events']
+        
+        cached = self.learner_clusters.ranked_questions(vector, question_bank_mode)
+        features = self.get_question_features(question_bank_mode)
+        if cached is None or len(features) == 0:
+            return None
+        
+        cluster, question_ids, scores = cached
+        positions = np.clip(np.searchsorted(features.ids, question_ids), 0, len(features) - 1)
+        keep = (features.ids[positions] == question_ids) & ~np.isin(question_ids, [e.question_id for e in events])
+        ranked, ranked_scores = positions[keep], scores[keep]
+        if len(ranked) < count:
+            return None
+        
+        logger.info("用户 %s 使用学习者聚类 %s 的预排序题目", user_profile['user_id'], cluster)
+        if count == DAILY_QUESTION_COUNT:
+            selected = self._arrange_daily_questions(features, ranked, ranked_scores)
+        else:
+            selected = self._diversify_recommendations(features, ranked, count)
+        return [int(features.ids[p]) for p in selected]
+    
+    def get_question_features(self, question_bank_mode: str) -> QuestionFeatures:
+        """获取题库特征矩阵（导入题目后随题库版本号自动刷新）"""
+        return self.question_features.get_or_compute(
+            question_bank_mode, 'features', lambda: QuestionFeatures.load(question_bank_mode)
+        )
+    
+    def _load_questions(self, question_ids: List[int]) -> List[Question]:
+        """按给定顺序加载题目（连同知识点一次JOIN）"""
+        if not question_ids:
+            return []
+        questions = Question.query.options(joinedload(Question.knowledge_point))\
+                                  .filter(Question.id.in_(question_ids)).all()
+        questions_by_id = {q.id: q for q in questions}
+        return [questions_by_id[qid] for qid in question_ids if qid in questions_by_id]
     
     def _build_user_profile(self, user_id: int) -> Dict:
         """构建用户画像"""
@@ -62,32 +171,20 @@ class RecommendationEngine:
             'user_id': user_id,
             'preferred_difficulty': user.preferred_difficulty,
             'preferred_types': json.loads(user.preferred_question_types) if user.preferred_question_types else [],
-            'preferred_interaction': user.preferred_interaction_type
+            'preferred_interaction': user.preferred_interaction_type,
+            'preferred_mode': user.preferred_mode
         }
         
-        # 学习历史分析
-        recent_records = LearningRecord.query.filter_by(user_id=user_id)\
-                                           .filter(LearningRecord.completed_at >= datetime.utcnow() - timedelta(days=30))\
-                                           .all()
+        # 学习历史分析（30天内的计数由画像缓存增量维护）
+        history = self.user_profiles.get(user_id)
         
-        if recent_records:
-            # 计算各知识点掌握情况
-            kp_stats = defaultdict(lambda: {'total': 0, 'correct': 0, 'avg_time': 0})
-            
-            for record in recent_records:
-                kp_id = record.question.knowledge_point_id
-                kp_stats[kp_id]['total'] += 1
-                if record.is_correct:
-                    kp_stats[kp_id]['correct'] += 1
-                kp_stats[kp_id]['avg_time'] += record.time_spent
-            
+        if history['total']:
             # 计算掌握程度和学习模式
             weak_knowledge_points = []
             strong_knowledge_points = []
             
-            for kp_id, stats in kp_stats.items():
+            for kp_id, stats in history['kp_stats'].items():
                 accuracy = stats['correct'] / stats['total']
-                avg_time = stats['avg_time'] / stats['total']
                 
                 if accuracy < 0.6:  # 掌握度较低
                     weak_knowledge_points.append(kp_id)
@@ -97,9 +194,9 @@ class RecommendationEngine:
             profile.update({
                 'weak_knowledge_points': weak_knowledge_points,
                 'strong_knowledge_points': strong_knowledge_points,
-                'recent_activity': len(recent_records),
-                'avg_accuracy': sum(r.is_correct for r in recent_records) / len(recent_records),
-                'avg_time_per_question': sum(r.time_spent for r in recent_records) / len(recent_records)
+                'recent_activity': history['total'],
+                'avg_accuracy': history['correct'] / history['total'],
+                'avg_time_per_question': history['time_spent'] / history['total']
             })
         else:
             # 新用户，基于偏好推荐
@@ -112,16 +209,23 @@ class RecommendationEngine:
             })
         
         # 学习节奏分析
-        profile['learning_pattern'] = self._analyze_learning_pattern(user_id)
+        profile['learning_pattern'] = self._analyze_learning_pattern(history['latest'])
+        profile['recent_events'] = history['latest']
+        profile['recent_history'] = history  # 30天内的汇总（与学习者聚类的训练数据同一口径）
+        
+        # 最近答错的题目（用于共同错题打分）
+        recent_mistakes = []
+        for event in history['latest']:
+            if not event.is_correct and event.question_id not in recent_mistakes:
+                recent_mistakes.append(event.question_id)
+                if len(recent_mistakes) == RECENT_MISTAKE_LIMIT:
+                    break
+        profile['recent_mistakes'] = recent_mistakes
         
         return profile
     
-    def _analyze_learning_pattern(self, user_id: int) -> Dict:
-        """分析用户学习模式"""
-        records = LearningRecord.query.filter_by(user_id=user_id)\
-                                    .order_by(LearningRecord.completed_at.desc())\
-                                    .limit(50).all()
-        
+    def _analyze_learning_pattern(self, records: List[AnswerEvent]) -> Dict:
+        """分析用户学习模式（records 为最近50次答题，最新的在前）"""
         if not records:
             return {'type': 'new_learner', 'intensity': 'medium'}
         
@@ -140,7 +244,7 @@ class RecommendationEngine:
         # 分析偏好题型
         type_counts = defaultdict(int)
         for record in records:
-            type_counts[record.question.question_type] += 1
+            type_counts[record.question_type] += 1
         
         most_preferred_type = max(type_counts.items(), key=lambda x: x[1])[0] if type_counts else 'theory'
         
@@ -173,93 +277,140 @@ class RecommendationEngine:
         else:
             return 'low'
     
-    def _get_candidate_questions(self, user_id: int, user_profile: Dict, question_bank_mode: str) -> List[Question]:
-        """获取候选题目"""
-        # 首先尝试获取最近1天内没做过的题目，并根据模式过滤
-        recent_question_ids_1d = db.session.query(LearningRecord.question_id)\
-                                      .filter_by(user_id=user_id)\
-                                      .filter(LearningRecord.completed_at >= datetime.utcnow() - timedelta(days=1))\
-                                      .subquery()
+    def _last_attempt_ages(self, user_id: int, features: QuestionFeatures, now: datetime) -> np.ndarray:
+        """
+        一次分组查询取出用户最近3天内每道题的最后作答时间，
+        返回与特征矩阵对齐的“距今秒数”数组，3天内没做过的题目为无穷大
+        """
+        rows = db.session.query(LearningRecord.question_id, func.max(LearningRecord.completed_at))\
+                         .filter(LearningRecord.user_id == user_id)\
+                         .filter(LearningRecord.completed_at >= now - timedelta(days=3))\
+                         .group_by(LearningRecord.question_id)\
+                         .all()
+        
+        ages = np.full(len(features), np.inf)
+        if rows:
+            question_ids = np.array([row[0] for row in rows], dtype=np.int64)
+            row_ages = np.array([(now - row[1]).total_seconds() for row in rows])
+            positions = np.searchsorted(features.ids, question_ids)
+            in_bank = positions < len(features)
+            in_bank[in_bank] = features.ids[positions[in_bank]] == question_ids[in_bank]
+            ages[positions[in_bank]] = row_ages[in_bank]
+        return ages
+    
+    def _get_candidate_positions(self, user_id: int, user_profile: Dict, features: QuestionFeatures) -> np.ndarray:
+        """
+        获取候选题目，返回特征矩阵中的行号（按题目id升序）
+        
+        按最近作答时间分层放宽：先排除1天内做过的，不够再排除3天内做过的，
+        再不够只排除今天做过的，最后保底返回全部题目。候选池超过上限时按用户和日期固定抽样。
+        """
+        now = datetime.utcnow()
+        ages = self._last_attempt_ages(user_id, features, now)
         
-        query = Question.query.filter(Question.question_bank_mode == question_bank_mode)\
-                              .filter(~Question.id.in_(recent_question_ids_1d))
+        # 首先尝试获取最近1天内没做过的题目
+        available = ages > timedelta(days=1).total_seconds()
         
         # 基于用户偏好过滤（如果有偏好的话）
         preferred_types = user_profile.get('preferred_types', [])
         if preferred_types:
-            query_with_preference = query.filter(Question.question_type.in_(preferred_types))
-            candidates = query_with_preference.all()
+            is_preferred = features.type_mask(preferred_types)
+            candidates = np.flatnonzero(available & is_preferred)
             
-            # 如果偏好类型的题目不够，加入其他类型（同一模式下）
+            # 如果偏好类型的题目不够，加入其他类型
             if len(candidates) < 5:
-                candidates.extend(query.filter(~Question.question_type.in_(preferred_types)).limit(10).all())
+                candidates = np.concatenate([candidates, np.flatnonzero(available & ~is_preferred)[:10]])
         else:
-            candidates = query.all()
+            candidates = np.flatnonzero(available)
         
-        # 如果1天内的过滤结果太少，放宽到3天（同一模式下）
+        # 如果1天内的过滤结果太少，放宽到3天
         if len(candidates) < 10:
-            recent_question_ids_3d = db.session.query(LearningRecord.question_id)\
-                                          .filter_by(user_id=user_id)\
-                                          .filter(LearningRecord.completed_at >= datetime.utcnow() - timedelta(days=3))\
-                                          .subquery()
-            
-            candidates = Question.query.filter(Question.question_bank_mode == question_bank_mode)\
-                                     .filter(~Question.id.in_(recent_question_ids_3d)).all()
+            candidates = np.flatnonzero(np.isinf(ages))
         
-        # 如果还是太少，只排除今天做过的（同一模式下）
+        # 如果还是太少，只排除今天做过的
         if len(candidates) < 5:
-            recent_question_ids_today = db.session.query(LearningRecord.question_id)\
-                                              .filter_by(user_id=user_id)\
-                                              .filter(LearningRecord.completed_at >= datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0))\
-                                              .subquery()
-            
-            candidates = Question.query.filter(Question.question_bank_mode == question_bank_mode)\
-                                     .filter(~Question.id.in_(recent_question_ids_today)).all()
+            today = now.replace(hour=0, minute=0, second=0, microsecond=0)
+            candidates = np.flatnonzero(ages > (now - today).total_seconds())
         
         # 最后的保底：如果实在没有，返回该模式下的所有题目
         if len(candidates) < 3:
-            candidates = Question.query.filter(Question.question_bank_mode == question_bank_mode).all()
+            candidates = np.arange(len(features))
+        
+        # 限制候选池大小，同一用户同一天的抽样结果固定
+        pool_size = self.weights['candidate_pool_size']
+        if len(candidates) > pool_size:
+            rng = np.random.default_rng([user_id, now.date().toordinal()])
+            candidates = np.sort(rng.choice(candidates, size=pool_size, replace=False))
         
         return candidates
     
-    def _score_questions(self, user_profile: Dict, questions: List[Question]) -> List[Tuple[Question, float]]:
-        """为题目打分"""
-        scored_questions = []
-        
-        for question in questions:
-            score = self._calculate_question_score(user_profile, question)
-            scored_questions.append((question, score))
-        
-        # 按分数排序
-        scored_questions.sort(key=lambda x: x[1], reverse=True)
-        return scored_questions
+    def score_questions(self, user_profile: Dict, features: QuestionFeatures,
+                        candidates: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """为候选题目打分，返回按分数降序排列的 (行号, 分数)，同分保持候选顺序"""
+        scores = self._calculate_question_scores(user_profile, features, candidates)
+        order = np.argsort(-scores, kind='stable')
+        return candidates[order], scores[order]
     
-    def _calculate_question_score(self, user_profile: Dict, question: Question) -> float:
-        """计算单个题目的推荐分数"""
-        score = 0.0
-        
-        # 1. 难度匹配度 (权重: 30%)
-        difficulty_score = self._calculate_difficulty_score(user_profile, question)
-        score += difficulty_score * 0.3
-        
-        # 2. 题型偏好度 (权重: 25%)
-        type_score = self._calculate_type_score(user_profile, question)
-        score += type_score * 0.25
-        
-        # 3. 知识点需求度 (权重: 35%)
-        knowledge_score = self._calculate_knowledge_score(user_profile, question)
-        score += knowledge_score * 0.35
-        
-        # 4. 时间匹配度 (权重: 10%)
-        time_score = self._calculate_time_score(user_profile, question)
-        score += time_score * 0.1
+    def _calculate_question_scores(self, user_profile: Dict, features: QuestionFeatures,
+                                   candidates: np.ndarray) -> np.ndarray:
+        """批量计算推荐分数，权重来自 Config.RECOMMENDATION_CONFIG"""
+        # 1. 难度匹配度 (默认权重: 30%)
+        difficulty_scores = self._lookup_scores(
+            features.difficulty_values, features.difficulty_codes, candidates,
+            lambda difficulty: self._calculate_difficulty_score(user_profile, difficulty)
+        )
+        score = difficulty_scores * self.weights['difficulty_weight']
+        
+        # 2. 题型偏好度 (默认权重: 25%)
+        type_scores = self._lookup_scores(
+            features.type_values, features.type_codes, candidates,
+            lambda question_type: self._calculate_type_score(user_profile, question_type)
+        )
+        score = score + type_scores * self.weights['type_weight']
+        
+        # 3. 知识点需求度 (默认权重: 35%)
+        knowledge_table = self._calculate_knowledge_scores(user_profile, features.knowledge_point_values)
+        score = score + knowledge_table[features.knowledge_point_codes[candidates]] * self.weights['knowledge_weight']
+        
+        # 4. 时间匹配度 (默认权重: 10%)
+        time_scores = self._lookup_scores(
+            features.estimated_time_values, features.estimated_time_codes, candidates,
+            lambda estimated_time: self._calculate_time_score(user_profile, estimated_time)
+        )
+        score = score + time_scores * self.weights['time_weight']
+        
+        # 5. 共同错题 (默认权重: 15%，只对和用户近期错题经常一起出错的题目加分)
+        co_mistake_scores = self._calculate_co_mistake_scores(user_profile, features, candidates)
+        score = score + co_mistake_scores * self.weights['co_mistake_weight']
         
         return score
     
-    def _calculate_difficulty_score(self, user_profile: Dict, question: Question) -> float:
+    @staticmethod
+    def _lookup_scores(values: List, codes: np.ndarray, candidates: np.ndarray, score_fn) -> np.ndarray:
+        """每种特征取值只打一次分，再按编码映射到所有候选题目"""
+        table = np.array([score_fn(value) for value in values], dtype=np.float64)
+        return table[codes[candidates]]
+    
+    def _calculate_co_mistake_scores(self, user_profile: Dict, features: QuestionFeatures,
+                                     candidates: np.ndarray) -> np.ndarray:
+        """共同错题分数：只查询近期错题对应的矩阵行，其余题目为0"""
+        scores = np.zeros(len(candidates))
+        neighbor_scores = self.co_mistakes.scores(user_profile.get('recent_mistakes', []))
+        if not neighbor_scores or len(features) == 0:
+            return scores
+        
+        question_ids = np.fromiter(neighbor_scores.keys(), dtype=np.int64, count=len(neighbor_scores))
+        values = np.fromiter(neighbor_scores.values(), dtype=np.float64, count=len(neighbor_scores))
+        positions = np.clip(np.searchsorted(features.ids, question_ids), 0, len(features) - 1)
+        found = features.ids[positions] == question_ids
+        
+        table = np.zeros(len(features))
+        table[positions[found]] = values[found]
+        return table[candidates]
+    
+    def _calculate_difficulty_score(self, user_profile: Dict, question_difficulty: str) -> float:
         """计算难度匹配分数"""
         user_difficulty = user_profile['preferred_difficulty']
-        question_difficulty = question.difficulty
         user_accuracy = user_profile.get('avg_accuracy', 0.5)
         
         # 基础匹配分数
@@ -287,7 +438,7 @@ class RecommendationEngine:
         
         return min(base_score, 1.0)
     
-    def _calculate_type_score(self, user_profile: Dict, question: Question) -> float:
+    def _calculate_type_score(self, user_profile: Dict, question_type: str) -> float:
         """计算题型偏好分数"""
         preferred_types = user_profile.get('preferred_types', [])
         learning_pattern = user_profile.get('learning_pattern', {})
@@ -295,44 +446,40 @@ class RecommendationEngine:
         if not preferred_types:
             return 0.5  # 中性分数
         
-        if question.question_type in preferred_types:
+        if question_type in preferred_types:
             base_score = 1.0
         else:
             base_score = 0.3
         
         # 根据学习模式调整
         pattern_preferred_type = learning_pattern.get('preferred_type', '')
-        if pattern_preferred_type == question.question_type:
+        if pattern_preferred_type == question_type:
             base_score += 0.2
         
         # 实践类题目优先级提升
-        if question.question_type in ['coding', 'practical']:
+        if question_type in ['coding', 'practical']:
             base_score += 0.1
         
         return min(base_score, 1.0)
     
-    def _calculate_knowledge_score(self, user_profile: Dict, question: Question) -> float:
-        """计算知识点需求分数"""
-        weak_kps = user_profile.get('weak_knowledge_points', [])
-        strong_kps = user_profile.get('strong_knowledge_points', [])
-        
-        question_kp = question.knowledge_point_id
-        
-        # 优先推荐薄弱知识点
-        if question_kp in weak_kps:
-            return 1.0
-        
-        # 避免过多重复强项知识点
-        if question_kp in strong_kps:
-            return 0.3
-        
-        # 新知识点给中等分数
-        return 0.6
+    def _calculate_knowledge_scores(self, user_profile: Dict, knowledge_point_ids: List[int]) -> np.ndarray:
+        """计算知识点需求分数（按知识点id词表返回）"""
+        weak_kps = [kp for kp in user_profile.get('weak_knowledge_points', []) if kp is not None]
+        strong_kps = [kp for kp in user_profile.get('strong_knowledge_points', []) if kp is not None]
+        knowledge_point_ids = np.asarray(knowledge_point_ids, dtype=np.int64)
+        
+        # 优先推荐薄弱知识点，避免过多重复强项知识点，新知识点给中等分数
+        return np.where(np.isin(knowledge_point_ids, weak_kps), 1.0,
+                        np.where(np.isin(knowledge_point_ids, strong_kps), 0.3, 0.6))
     
-    def _calculate_time_score(self, user_profile: Dict, question: Question) -> float:
+    def _calculate_time_score(self, user_profile: Dict, estimated_time: float) -> float:
         """计算时间匹配分数"""
         user_avg_time = user_profile.get('avg_time_per_question', 300)
-        question_estimated_time = (question.estimated_time or 10) * 60  # 转换为秒
+        question_estimated_time = estimated_time * 60  # 转换为秒
+        
+        # 用户平均用时为0时无法比较，按最低分处理
+        if not user_avg_time:
+            return 0.3
         
         # 计算时间比例
         time_ratio = question_estimated_time / user_avg_time
@@ -345,155 +492,146 @@ class RecommendationEngine:
         else:
             return 0.3
     
-    def _diversify_recommendations(self, scored_questions: List[Tuple[Question, float]], count: int) -> List[Question]:
-        """多样化推荐结果"""
-        if len(scored_questions) <= count:
-            return [q for q, _ in scored_questions]
+    def _diversify_recommendations(self, features: QuestionFeatures, ranked: np.ndarray, count: int) -> List[int]:
+        """多样化推荐结果，返回特征矩阵行号"""
+        if len(ranked) <= count:
+            return ranked.tolist()
         
-        selected_questions = []
+        selected = []
         used_knowledge_points = set()
-        used_types = set()
+        type_counts = defaultdict(int)
         
         # 第一轮：选择高分且多样化的题目
-        for question, score in scored_questions:
-            if len(selected_questions) >= count:
+        for position in ranked:
+            if len(selected) >= count:
                 break
-                
-            kp_id = question.knowledge_point_id
-            q_type = question.question_type
+            
+            kp_id = int(features.knowledge_point_codes[position])
+            q_type = int(features.type_codes[position])
             
             # 多样性检查
             kp_diversity = kp_id not in used_knowledge_points
-            type_diversity = len([q for q in selected_questions if q.question_type == q_type]) < count // 3
+            type_diversity = type_counts[q_type] < count // 3
             
-            if kp_diversity or type_diversity or len(selected_questions) < count // 2:
-                selected_questions.append(question)
+            if kp_diversity or type_diversity or len(selected) < count // 2:
+                selected.append(int(position))
                 used_knowledge_points.add(kp_id)
-                used_types.add(q_type)
+                type_counts[q_type] += 1
         
         # 第二轮：如果还没够数，按分数补充
-        if len(selected_questions) < count:
-            remaining_count = count - len(selected_questions)
-            selected_ids = {q.id for q in selected_questions}
-            
-            for question, score in scored_questions:
-                if question.id not in selected_ids:
-                    selected_questions.append(question)
-                    remaining_count -= 1
-                    if remaining_count == 0:
-                        break
-        
-        return selected_questions[:count]
+        if len(selected) < count:
+            selected.extend(self._take_unused(ranked, set(selected), count - len(selected)))
+        
+        return selected[:count]
+    
+    @staticmethod
+    def _take_unused(ranked: np.ndarray, used: set, limit: int) -> List[int]:
+        """按排名顺序取出未被选中的行号"""
+        taken = []
+        for position in ranked:
+            if len(taken) >= limit:
+                break
+            if int(position) not in used:
+                taken.append(int(position))
+        return taken
     
-    def _arrange_daily_questions(self, scored_questions: List[Tuple[Question, float]], question_bank_mode: str) -> List[Question]:
-        """安排每日6道题：前4道非编程题，后2道编程题"""
+    def _arrange_daily_questions(self, features: QuestionFeatures, ranked: np.ndarray,
+                                 ranked_scores: np.ndarray) -> List[int]:
+        """安排每日6道题：前4道非编程题，后2道编程题，返回特征矩阵行号"""
         
         # 分离编程题和非编程题
-        coding_questions = []
-        non_coding_questions = []
-        
-        for question, score in scored_questions:
-            if question.question_type == 'coding':
-                coding_questions.append((question, score))
-            else:
-                non_coding_questions.append((question, score))
+        coding_code = features.type_code('coding')
+        is_coding = features.type_codes[ranked] == coding_code
+        coding_questions, coding_scores = ranked[is_coding], ranked_scores[is_coding]
+        non_coding_questions = ranked[~is_coding]
         
-        print(f"可用编程题: {len(coding_questions)} 道，非编程题: {len(non_coding_questions)} 道")
+        logger.debug("可用编程题: %d 道，非编程题: %d 道", len(coding_questions), len(non_coding_questions))
         
-        # 如果编程题不够，从数据库中强制获取
+        # 如果编程题不够，从同一模式的全部编程题中补充
         if len(coding_questions) < 2:
-            print("编程题不够，从数据库强制获取...")
-            from models import Question as QuestionModel
-            # Ensure we only fetch coding questions from the relevant question_bank_mode
-            all_coding = QuestionModel.query.filter_by(question_type='coding', question_bank_mode=question_bank_mode).limit(4).all()
-            for q in all_coding:
-                if q not in [cq[0] for cq in coding_questions]:
-                    coding_questions.append((q, 0.5))  # Give default score
+            logger.debug("编程题不够，从题库强制获取...")
+            all_coding = np.flatnonzero(features.type_codes == coding_code)[:4]
+            extra = all_coding[~np.isin(all_coding, coding_questions)]
+            coding_questions = np.concatenate([coding_questions, extra])
+            coding_scores = np.concatenate([coding_scores, np.full(len(extra), 0.5)])  # Give default score
         
         final_questions = []
         
         # 1. 选择4道非编程题（尽量多样化）
-        non_coding_selected = self._select_diverse_non_coding(non_coding_questions, 4)
-        final_questions.extend(non_coding_selected)
+        final_questions.extend(self._select_diverse_non_coding(features, non_coding_questions, 4))
         
         # 2. 选择2道编程题
-        coding_selected = self._select_top_coding(coding_questions, 2)
-        final_questions.extend(coding_selected)
+        final_questions.extend(self._select_top_coding(coding_questions, coding_scores, 2))
         
         # 3. 如果题目不够，用最高分的题目补充
         if len(final_questions) < 6:
-            remaining_count = 6 - len(final_questions)
-            used_ids = {q.id for q in final_questions}
-            
-            # 从所有剩余题目中选择最高分的，并确保是同一模式
-            remaining_questions = [
-                q for q, _ in scored_questions 
-                if q.id not in used_ids and q.question_bank_mode == question_bank_mode
-            ][:remaining_count]
-            
-            final_questions.extend(remaining_questions)
+            final_questions.extend(self._take_unused(ranked, set(final_questions), 6 - len(final_questions)))
         
-        print(f"每日题目安排: {[f'{q.title}({q.question_type})' for q in final_questions]}")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("每日题目安排: %s",
+                         [f'{features.ids[p]}({features.type_values[features.type_codes[p]]})' for p in final_questions])
         return final_questions
     
-    def _select_diverse_non_coding(self, non_coding_questions: List[Tuple[Question, float]], count: int) -> List[Question]:
-        """选择多样化的非编程题"""
-        if not non_coding_questions:
+    def _select_diverse_non_coding(self, features: QuestionFeatures, non_coding_questions: np.ndarray,
+                                   count: int) -> List[int]:
+        """选择多样化的非编程题（non_coding_questions 已按分数降序）"""
+        if len(non_coding_questions) == 0:
             return []
         
         selected = []
-        used_types = set()
-        used_knowledge_points = set()
+        type_codes = features.type_codes[non_coding_questions]
         
         # 优先选择不同类型的题目
         type_priority = ['multiple_choice', 'fill_blank', 'theory']
         
-        # 按类型分组
-        questions_by_type = {}
-        for question, score in non_coding_questions:
-            q_type = question.question_type
-            if q_type not in questions_by_type:
-                questions_by_type[q_type] = []
-            questions_by_type[q_type].append((question, score))
-        
-        # 每种类型至少选一道（如果有的话）
+        # 每种类型至少选一道（如果有的话），已按分数降序，第一道即该类型中分数最高的题目
         for q_type in type_priority:
-            if q_type in questions_by_type and len(selected) < count:
-                # 选择该类型中分数最高的题目
-                best_question = max(questions_by_type[q_type], key=lambda x: x[1])[0]
-                selected.append(best_question)
-                used_types.add(q_type)
-                used_knowledge_points.add(best_question.knowledge_point_id)
-        
-        # 如果还需要更多题目，选择剩余的高分题目
+            matches = np.flatnonzero(type_codes == features.type_code(q_type))
+            if len(matches) > 0 and len(selected) < count:
+                selected.append(int(non_coding_questions[matches[0]]))
+        
+        # 如果还需要更多题目，选择剩余的题目（按题目id倒序；行号与题目id同序，取最大的行号即可）
         if len(selected) < count:
-            remaining_questions = [
-                q for q, _ in non_coding_questions 
-                if q.id not in {s.id for s in selected}
-            ]
-            remaining_questions.sort(key=lambda q: q.id, reverse=True)  # 按分数排序
-            
-            for question in remaining_questions:
-                if len(selected) >= count:
-                    break
-                selected.append(question)
+            remaining = np.zeros(len(features), dtype=bool)
+            remaining[non_coding_questions] = True
+            remaining[selected] = False
+            selected.extend(int(p) for p in np.flatnonzero(remaining)[::-1][:count - len(selected)])
         
         return selected[:count]
     
-    def _select_top_coding(self, coding_questions: List[Tuple[Question, float]], count: int) -> List[Question]:
+    def _select_top_coding(self, coding_questions: np.ndarray, coding_scores: np.ndarray, count: int) -> List[int]:
         """选择最佳的编程题"""
-        if not coding_questions:
+        if len(coding_questions) == 0:
             return []
         
         # 按分数排序，选择前count道
-        coding_questions.sort(key=lambda x: x[1], reverse=True)
-        return [q for q, _ in coding_questions[:count]]
+        order = np.argsort(-coding_scores, kind='stable')
+        return [int(p) for p in coding_questions[order[:count]]]
     
-    def update_user_model(self, user_id: int, question_id: int, is_correct: bool, time_spent: int):
-        """更新用户模型（实时学习）"""
-        # 这里可以实现在线学习算法，根据用户的实时反馈调整推荐模型
-        # 例如：更新用户偏好权重、调整难度预测等
-        pass
+    def update_user_model(self, user_id: int, question_id: int, is_correct: bool, time_spent: int,
+                          knowledge_point_id: int = None, question_type: str = None, completed_at: datetime = None,
+                          question_bank_mode: str = None):
+        """更新用户模型（实时学习）：把一次答题追加到已缓存的用户画像，O(1)"""
+        if knowledge_point_id is None or question_type is None or question_bank_mode is None:
+            question = Question.query.get(question_id)
+            if question is None:
+                return
+            knowledge_point_id, question_type = question.knowledge_point_id, question.question_type
+            question_bank_mode = question.question_bank_mode
+        
+        completed_at = completed_at or datetime.utcnow()
+        self.user_profiles.record_answer(user_id, AnswerEvent(
+            completed_at=completed_at,
+            question_id=question_id,
+            knowledge_point_id=knowledge_point_id,
+            question_type=question_type,
+            is_correct=bool(is_correct),
+            time_spent=time_spent or 0,
+            question_bank_mode=question_bank_mode
+        ))
+        
+        if not is_correct:
+            self.co_mistakes.record_mistake(user_id, question_id, completed_at)
     
     def get_learning_path(self, user_id: int) -> List[Dict]:
         """生成学习路径推荐"""
@@ -7,8 +7,9 @@
 import os
 import sys
 from app import app, db
-from models import User, Question, LearningRecord, KnowledgePoint, UserKnowledgeStats
+from models import User, Question, LearningRecord, KnowledgePoint, UserKnowledgeStats, UserStatsSummary, DailyRecommendation
 from data_generator import generate_sample_data
+from co_mistake import CoMistakeStore
 
 def regenerate_database():
     """重新生成数据库"""
@@ -19,6 +20,8 @@ def regenerate_database():
         print("📝 清空现有数据...")
         LearningRecord.query.delete()
         UserKnowledgeStats.query.delete()
+        UserStatsSummary.query.delete()
+        DailyRecommendation.query.delete()
         Question.query.delete()
         User.query.delete()
         KnowledgePoint.query.delete()
@@ -28,6 +31,9 @@ def regenerate_database():
         print("🔄 生成新的示例数据...")
         generate_sample_data()
         
+        # 学习记录已全部替换，重建共同错题矩阵
+        CoMistakeStore().rebuild()
+        
         # 显示统计信息
         users_count = User.query.count()
         questions_count = Question.query.count()
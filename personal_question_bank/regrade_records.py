@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+批量重新评分
+修改评分规则或同义词表之后，历史学习记录的 partial_score / is_correct 仍是旧规则的结果。
+这里按当前评分器重新评分理论题、填空题和实践题的学习记录，并同步更新知识点统计：
+
+- 按记录id分批读取（每批 BATCH_SIZE 条），批内按题目排序后交给 grade_answers_bulk 在进程池中分块评分
+- 只写回分数有变化的记录，每批一次批量UPDATE
+- 对正误发生变化的 (用户, 知识点)，按变化量调整 UserKnowledgeStats.correct_attempts 并重新计算掌握程度，
+  最后重建受影响用户的统计汇总
+
+选择题和编程题的评分规则与评分器无关，不参与重新评分。
+运行中的服务进程里的用户画像缓存会在 cache_ttl 过期后按新分数重建。
+
+    python regrade_records.py          # 所有题目
+    python regrade_records.py 12 15    # 只重新评分指定题目的记录
+
+并行进程数默认为CPU核数，可通过环境变量 GRADING_WORKERS 调整（设为1则在当前进程内评分）。
+"""
+
+import sys
+import time
+from collections import Counter
+from typing import Dict, Iterable, Optional
+
+from sqlalchemy import update
+
+from app import app, compute_mastery_level
+from models import db, LearningRecord, Question, UserKnowledgeStats
+from stats_summary import rebuild_stats_summaries
+from theory_grader import grade_answers_bulk
+from tokenizer import init_tokenizer
+
+REGRADE_QUESTION_TYPES = ('theory', 'fill_blank', 'practical')
+BATCH_SIZE = 5000
+SCORE_TOLERANCE = 1e-6
+
+
+def regrade_batch(after_id: int, question_ids: Optional[Iterable[int]] = None,
+                  workers: Optional[int] = None) -> Dict:
+    """重新评分id大于 after_id 的一批记录，返回 {last_id, graded, updated, correct_deltas}"""
+    query = db.session.query(
+        LearningRecord.id, LearningRecord.user_id, LearningRecord.user_answer,
+        LearningRecord.is_correct, LearningRecord.partial_score,
+        Question.id, Question.question_type, Question.correct_answer, Question.content, Question.knowledge_point_id
+    ).join(Question, LearningRecord.question_id == Question.id)\
+     .filter(LearningRecord.id > after_id, Question.question_type.in_(REGRADE_QUESTION_TYPES))
+    if question_ids is not None:
+        query = query.filter(Question.id.in_(list(question_ids)))
+    rows = query.order_by(LearningRecord.id).limit(BATCH_SIZE).all()
+    if not rows:
+        return {'last_id': None, 'graded': 0, 'updated': 0, 'correct_deltas': Counter()}
+
+    # 同一道题的答案相邻，评分器的标准答案缓存可以连续命中
+    rows.sort(key=lambda row: (row[5], row[0]))
+    results = grade_answers_bulk(
+        ((question_type, user_answer, correct_answer, content, question_id)
+         for _, _, user_answer, _, _, question_id, question_type, correct_answer, content, _ in rows),
+        workers=workers
+    )
+
+    changes = []
+    correct_deltas = Counter()
+    for row, result in zip(rows, results):
+        record_id, user_id, _, old_correct, old_score, _, _, _, _, kp_id = row
+        is_correct, score = bool(result['is_correct']), float(result['score'])
+        if bool(old_correct) == is_correct and old_score is not None and abs(old_score - score) < SCORE_TOLERANCE:
+            continue
+        changes.append({'id': record_id, 'is_correct': is_correct, 'partial_score': score})
+        if bool(old_correct) != is_correct:
+            correct_deltas[(user_id, kp_id)] += 1 if is_correct else -1
+
+    if changes:
+        db.session.execute(update(LearningRecord), changes)
+    db.session.commit()
+    return {'last_id': max(row[0] for row in rows), 'graded': len(rows), 'updated': len(changes),
+            'correct_deltas': correct_deltas}
+
+
+def apply_correct_deltas(correct_deltas: Counter) -> int:
+    """按正误变化量更新知识点统计和掌握程度，返回更新的统计行数"""
+    deltas = {key: delta for key, delta in correct_deltas.items() if delta}
+    if not deltas:
+        return 0
+
+    user_ids = {user_id for user_id, _ in deltas}
+    stats_rows = UserKnowledgeStats.query.filter(UserKnowledgeStats.user_id.in_(user_ids)).all()
+
+    updates = []
+    for stats in stats_rows:
+        delta = deltas.get((stats.user_id, stats.knowledge_point_id))
+        if delta is None:
+            continue
+        total = stats.total_attempts or 0
+        correct = min(max((stats.correct_attempts or 0) + delta, 0), total)
+        updates.append({'id': stats.id, 'correct_attempts': correct,
+                        'mastery_level': compute_mastery_level(correct, total)})
+
+    if updates:
+        db.session.execute(update(UserKnowledgeStats), updates)
+    db.session.commit()
+    return len(updates)
+
+
+def regrade_learning_records(question_ids: Optional[Iterable[int]] = None, workers: Optional[int] = None) -> Dict:
+    """按当前评分规则重新评分学习记录并更新统计（需要在应用上下文中调用）"""
+    question_ids = list(question_ids) if question_ids is not None else None
+    # 与服务进程使用同一份领域词典分词
+    init_tokenizer()
+    totals = {'graded': 0, 'updated': 0, 'stats_updated': 0, 'users': 0}
+    correct_deltas = Counter()
+
+    after_id = 0
+    while True:
+        batch = regrade_batch(after_id, question_ids, workers)
+        if batch['last_id'] is None:
+            break
+        after_id = batch['last_id']
+        totals['graded'] += batch['graded']
+        totals['updated'] += batch['updated']
+        correct_deltas.update(batch['correct_deltas'])
+        print(f"   已评分 {totals['graded']} 条，分数变化 {totals['updated']} 条")
+
+    totals['stats_updated'] = apply_correct_deltas(correct_deltas)
+    affected_users = sorted({user_id for (user_id, _), delta in correct_deltas.items() if delta})
+    if affected_users:
+        totals['users'] = rebuild_stats_summaries(affected_users)
+    return totals
+
+
+if __name__ == "__main__":
+    target_question_ids = [int(arg) for arg in sys.argv[1:]] or None
+
+    with app.app_context():
+        db.create_all()
+        print("🔄 开始重新评分学习记录...")
+        started = time.perf_counter()
+        totals = regrade_learning_records(target_question_ids)
+        print(f"✅ 重新评分 {totals['graded']} 条记录，{totals['updated']} 条分数有变化，"
+              f"更新 {totals['stats_updated']} 条知识点统计，用时 {time.perf_counter() - started:.1f} 秒")
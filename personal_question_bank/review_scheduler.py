@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+错题复习调度（SM-2）
+
+每道错题保存自己的调度状态：难易度因子 ease_factor、当前复习间隔 interval_days、连续掌握次数 repetitions。
+每次复习按掌握程度 q（1-5，即 SM-2 的回答质量）更新：
+
+- q < 3：连续掌握次数清零，间隔回到 failure_interval_days
+- 否则连续掌握次数加1，间隔依次为 first_interval_days、second_interval_days，之后为 上次间隔 × 难易度因子
+- 难易度因子 EF' = EF + 0.1 - (5-q)(0.08 + 0.02(5-q))，不低于 min_ease
+
+下次复习时间 = 上次复习时间 + min(间隔 × interval_modifier, max_interval_days)。
+参数在 Config.REVIEW_SCHEDULER_CONFIG 中，修改 interval_modifier / max_interval_days / min_ease 之后，
+运行批量任务按已保存的状态重新计算所有复习过的错题的下次复习时间：
+
+    python review_scheduler.py
+
+批量任务按id分块读取列值，用NumPy数组运算计算，只对有变化的行执行一次批量UPDATE（executemany）。
+单次复习（POST /api/wrong-questions/<id>/review）使用同一套数组运算，数组长度为1。
+复习时间和下次复习时间都是UTC时间，与到期队列（due_query）和迁移脚本的回填保持一致。
+"""
+
+import time
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import bindparam, select, update
+
+from config import Config
+from models import db, WrongQuestion
+
+PASSING_QUALITY = 3
+RESCHEDULE_CHUNK_SIZE = 100_000
+MICROSECONDS_PER_DAY = 86_400 * 1_000_000
+
+
+def sm2_update(ease, interval_days, repetitions, quality,
+               params: Optional[Dict] = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    按一次复习的掌握程度更新调度状态，参数可以是标量或等长数组
+
+    ease 为 NaN（从未复习过）时按 initial_ease 计算，返回 (难易度因子, 间隔天数, 连续掌握次数)。
+    """
+    params = params or Config.REVIEW_SCHEDULER_CONFIG
+    ease = np.asarray(ease, dtype=float)
+    ease = np.where(np.isnan(ease), params['initial_ease'], ease)
+    interval_days = np.nan_to_num(np.asarray(interval_days, dtype=float))
+    repetitions = np.asarray(repetitions, dtype=np.int64)
+    quality = np.clip(np.asarray(quality, dtype=float), 0, 5)
+
+    passed = quality >= PASSING_QUALITY
+    repetitions = np.where(passed, repetitions + 1, 0)
+    grown = np.select(
+        [repetitions == 1, repetitions == 2],
+        [params['first_interval_days'], params['second_interval_days']],
+        interval_days * ease
+    )
+    interval_days = np.where(passed, grown, params['failure_interval_days'])
+
+    lapse = 5 - quality
+    ease = np.maximum(ease + 0.1 - lapse * (0.08 + lapse * 0.02), params['min_ease'])
+    return ease, interval_days, repetitions
+
+
+def next_review_dates(reviewed_at, interval_days, params: Optional[Dict] = None) -> np.ndarray:
+    """上次复习时间（datetime64）+ 调整后的间隔"""
+    params = params or Config.REVIEW_SCHEDULER_CONFIG
+    days = np.minimum(np.asarray(interval_days, dtype=float) * params['interval_modifier'],
+                      params['max_interval_days'])
+    offsets = np.rint(days * MICROSECONDS_PER_DAY).astype('timedelta64[us]')
+    return np.asarray(reviewed_at, dtype='datetime64[us]') + offsets
+
+
+def apply_review(wrong_question: WrongQuestion, mastery_level: int,
+                 reviewed_at: Optional[datetime] = None) -> None:
+    """记录一次复习并更新调度状态（不提交）"""
+    reviewed_at = reviewed_at or datetime.utcnow()
+    ease = wrong_question.ease_factor if wrong_question.ease_factor is not None else np.nan
+    ease, interval_days, repetitions = sm2_update(
+        ease, wrong_question.interval_days or 0.0, wrong_question.repetitions or 0, mastery_level
+    )
+
+    wrong_question.review_count = (wrong_question.review_count or 0) + 1
+    wrong_question.mastery_level = mastery_level
+    wrong_question.ease_factor = float(ease)
+    wrong_question.interval_days = float(interval_days)
+    wrong_question.repetitions = int(repetitions)
+    wrong_question.last_review_date = reviewed_at
+    wrong_question.next_review_date = next_review_dates(np.datetime64(reviewed_at, 'us'), interval_days).item()
+    wrong_question.updated_at = reviewed_at
+
+
+def due_query(user_id: int, mode: str, now: Optional[datetime] = None):
+    """到期需要复习的错题查询（未排序），走 (user_id, question_bank_mode, next_review_date) 索引"""
+    now = now or datetime.utcnow()
+    return WrongQuestion.query.filter(
+        WrongQuestion.user_id == user_id,
+        WrongQuestion.question_bank_mode == mode,
+        WrongQuestion.next_review_date <= now
+    )
+
+
+def _to_datetime64(values) -> np.ndarray:
+    """datetime 列表（可以有None）转换成 datetime64 数组，比 np.array 逐个转换快得多"""
+    return pd.to_datetime(list(values)).values.astype('datetime64[us]')
+
+
+def reschedule_all(params: Optional[Dict] = None, chunk_size: int = RESCHEDULE_CHUNK_SIZE) -> Tuple[int, int]:
+    """
+    按当前参数重新计算所有复习过的错题的下次复习时间（需要在应用上下文中调用）
+
+    从未复习过的错题仍在加入错题本时到期，不受影响。返回 (处理行数, 更新行数)。
+    """
+    params = params or Config.REVIEW_SCHEDULER_CONFIG
+    # 只读取需要的列（不构造ORM对象）；有变化的行用同一条按主键的UPDATE批量执行（executemany），
+    # 直接使用表对象，省去ORM按主键批量更新的逐行处理
+    columns = (WrongQuestion.id, WrongQuestion.last_review_date, WrongQuestion.interval_days,
+               WrongQuestion.ease_factor, WrongQuestion.next_review_date)
+    table = WrongQuestion.__table__
+    update_schedule = (
+        update(table)
+        .where(table.c.id == bindparam('row_id'))
+        .values(next_review_date=bindparam('next_date'), ease_factor=bindparam('ease'))
+    )
+
+    processed = updated = 0
+    after_id = 0
+    while True:
+        rows = db.session.execute(
+            select(*columns)
+            .where(WrongQuestion.id > after_id, WrongQuestion.last_review_date.isnot(None))
+            .order_by(WrongQuestion.id)
+            .limit(chunk_size)
+        ).all()
+        if not rows:
+            break
+        ids, reviewed_at, interval_days, ease, current = zip(*rows)
+        after_id = ids[-1]
+
+        ease = np.array(ease, dtype=float)
+        new_ease = np.maximum(ease, params['min_ease'])  # NaN（从未复习过）保持为NaN
+        next_dates = next_review_dates(
+            _to_datetime64(reviewed_at), np.nan_to_num(np.array(interval_days, dtype=float)), params
+        )
+        ease_changed = (new_ease != ease) & ~np.isnan(ease)
+        changed = np.flatnonzero((next_dates != _to_datetime64(current)) | ease_changed)
+
+        if len(changed):
+            db.session.execute(update_schedule, [
+                {'row_id': row_id, 'next_date': next_date, 'ease': row_ease}
+                for row_id, next_date, row_ease in zip(
+                    np.array(ids)[changed].tolist(),
+                    next_dates[changed].tolist(),
+                    np.where(np.isnan(new_ease[changed]), None, new_ease[changed]).tolist()
+                )
+            ])
+        db.session.commit()
+        processed += len(ids)
+        updated += len(changed)
+    return processed, updated
+
+
+if __name__ == "__main__":
+    from app import app
+
+    with app.app_context():
+        db.create_all()
+        print("🔄 按当前调度参数重新计算错题复习时间...")
+        started = time.perf_counter()
+        processed, updated = reschedule_all()
+        print(f"✅ 处理 {processed} 条复习过的错题，更新 {updated} 条，用时 {time.perf_counter() - started:.1f} 秒")
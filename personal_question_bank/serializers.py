@@ -0,0 +1,70 @@
+"""
+列表接口的序列化层
+
+- 通过 joinedload / selectinload 预加载关联对象，避免逐行调用 to_dict() 时的 N+1 懒加载
+- 题目支持 full（Question.to_dict()）和 light（列表展示用的轻量字段 Question.LIGHT_FIELDS）两种字段集，
+  light 字段集只从数据库读取需要的列；字段列表只在模型中定义一次
+- options / test_cases 等JSON字段按行缓存解析结果（见 models.cached_json_column）
+"""
+
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy.orm import joinedload, load_only, selectinload
+
+from models import KnowledgePoint, LearningRecord, Question, WrongQuestion
+
+FULL = 'full'
+LIGHT = 'light'
+
+# 轻量字段集：列表页只需要题干和基本属性，不加载答案、解析、代码和测试用例
+QUESTION_LIGHT_COLUMNS = tuple(getattr(Question, field) for field in Question.LIGHT_FIELDS) + (
+    Question.knowledge_point_id,
+)
+
+
+def resolve_fields(fields: Optional[str]) -> str:
+    """把请求参数规范成 full / light，未知取值按 full 处理以兼容旧客户端"""
+    return LIGHT if fields == LIGHT else FULL
+
+
+def question_load_options(fields: str = FULL) -> tuple:
+    """查询题目列表时使用的加载选项"""
+    if fields == LIGHT:
+        return (load_only(*QUESTION_LIGHT_COLUMNS), joinedload(Question.knowledge_point))
+    return (joinedload(Question.knowledge_point),)
+
+
+def learning_record_load_options() -> tuple:
+    """学习记录连同题目和知识点一次JOIN加载"""
+    return (joinedload(LearningRecord.question).joinedload(Question.knowledge_point),)
+
+
+def wrong_question_load_options(fields: str = FULL) -> tuple:
+    """错题列表用 selectinload 批量加载题目（一次IN查询），题目再JOIN知识点"""
+    question_loader = selectinload(WrongQuestion.question)
+    if fields == LIGHT:
+        question_loader = question_loader.load_only(*QUESTION_LIGHT_COLUMNS)
+    return (question_loader.joinedload(Question.knowledge_point),)
+
+
+def serialize_knowledge_point(knowledge_point: Optional[KnowledgePoint]) -> Optional[Dict]:
+    return knowledge_point.to_dict() if knowledge_point else None
+
+
+def serialize_question(question: Optional[Question], fields: str = FULL) -> Optional[Dict]:
+    """序列化单个题目，full 字段集即 Question.to_dict()"""
+    if question is None:
+        return None
+    return question.to_dict(light=fields == LIGHT)
+
+
+def serialize_questions(questions: Iterable[Question], fields: str = FULL) -> List[Dict]:
+    return [serialize_question(question, fields) for question in questions]
+
+
+def serialize_learning_record(record: LearningRecord, fields: str = FULL) -> Dict:
+    return record.to_dict(light_question=fields == LIGHT)
+
+
+def serialize_wrong_question(wrong_question: WrongQuestion, fields: str = FULL) -> Dict:
+    return wrong_question.to_dict(light_question=fields == LIGHT)
@@ -0,0 +1,216 @@
+"""
+举一反三题目预生成
+错题加入错题本（答题接口、批量答题接口、添加错题接口）并提交后，把生成任务交给后台线程池：
+从相似题目索引取内容最相近的题目（索引中没有时使用模板题目），写入 SimilarQuestion。
+
+- 任务按 (原题id, 错题id) 去重：同一个键在进程内只有一个任务在执行，
+  执行前先查库，已有生成结果的直接返回，所以每道错题只生成一次
+- 生成的题目按顺序写入序号 slot，多个进程同时为同一道错题生成时，
+  由 (原题id, 错题id, slot) 唯一索引拦下后写入的一方，后写入的一方回滚并返回先写入的结果
+- POST /api/wrong-questions/<id>/similar 直接返回已生成的题目；
+  还没有生成（历史错题、任务仍在排队）时提交同一个任务后立即返回 202，前端稍后再请求
+
+线程数默认为2，可通过环境变量 SIMILAR_QUESTION_WORKERS 调整。
+"""
+
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, Tuple
+
+from sqlalchemy.exc import IntegrityError
+
+from models import db, Question, WrongQuestion, SimilarQuestion
+
+SIMILAR_QUESTION_COUNT = 3
+DEFAULT_WORKERS = 2
+
+
+def build_generation_prompt(original_question: Question) -> str:
+    """构建生成相似题目的提示词（随生成结果一起保存）"""
+    return f"""
+基于以下错题，生成3道相似的题目用于举一反三练习：
+
+原题标题：{original_question.title}
+原题内容：{original_question.content}
+题目类型：{original_question.question_type}
+难度：{original_question.difficulty}
+知识点：{original_question.knowledge_point.name if original_question.knowledge_point else ''}
+
+要求：
+1. 保持相同的知识点和难度
+2. 变换题目的具体场景和参数
+3. 题目要有一定的区分度
+4. 提供标准答案和解析
+
+请按照以下JSON格式返回：
+[
+    {{
+        "title": "题目标题",
+        "content": "题目内容",
+        "correct_answer": "正确答案",
+        "explanation": "答案解析",
+        "similarity_type": "相似类型"
+    }},
+    ...
+]
+"""
+
+
+def load_similar_questions(neighbors):
+    """按相似度顺序加载索引返回的近邻题目，返回 [(题目, 相似度)]"""
+    if not neighbors:
+        return []
+    questions = Question.query.filter(Question.id.in_([question_id for question_id, _ in neighbors])).all()
+    by_id = {question.id: question for question in questions}
+    return [(by_id[question_id], score) for question_id, score in neighbors if question_id in by_id]
+
+
+def build_similar_question(original_question, question, score):
+    """用题库中的真实题目构建相似题目记录（未保存）"""
+    same_knowledge_point = question.knowledge_point_id == original_question.knowledge_point_id
+    return SimilarQuestion(
+        original_question_id=original_question.id,
+        title=question.title,
+        content=question.content,
+        question_type=question.question_type,
+        difficulty=question.difficulty,
+        estimated_time=question.estimated_time,
+        similarity_type='knowledge_point_match' if same_knowledge_point else 'content_match',
+        similarity_score=round(score, 4),
+        generated_by='similarity_index',
+        correct_answer=question.correct_answer,
+        explanation=question.explanation,
+        question_bank_mode=question.question_bank_mode
+    )
+
+
+def build_template_questions(original_question, wrong_question):
+    """索引中没有相似题目时使用的模板题目（未保存）"""
+    knowledge_point = original_question.knowledge_point.name if original_question.knowledge_point else '相关知识点'
+    templates = [
+        {
+            "title": f"{original_question.title} - 变式练习",
+            "content": f"基于 {knowledge_point} 的类似问题练习",
+            "similarity_type": "knowledge_point_similar"
+        },
+        {
+            "title": f"相关练习题 - {original_question.question_type}",
+            "content": f"针对 {original_question.difficulty} 难度的 {original_question.question_type} 题目练习",
+            "similarity_type": "type_similar"
+        }
+    ]
+    return [
+        SimilarQuestion(
+            original_question_id=original_question.id,
+            title=template['title'],
+            content=template['content'],
+            question_type=original_question.question_type,
+            difficulty=original_question.difficulty,
+            estimated_time=original_question.estimated_time,
+            similarity_type=template['similarity_type'],
+            similarity_score=0.6,
+            generated_by='template',
+            correct_answer=f"参考原题答案：{original_question.correct_answer}",
+            explanation=f"参考原题解析：{original_question.explanation}",
+            question_bank_mode=wrong_question.question_bank_mode
+        )
+        for template in templates
+    ]
+
+
+def load_generated(original_question_id: int, wrong_question_id: int) -> List[SimilarQuestion]:
+    """已为该错题生成的相似题目（按生成顺序）"""
+    return SimilarQuestion.query.filter_by(
+        original_question_id=original_question_id,
+        wrong_question_id=wrong_question_id
+    ).order_by(SimilarQuestion.slot, SimilarQuestion.id).all()
+
+
+def generate_for_wrong_question(wrong_question: WrongQuestion, indexes) -> List[SimilarQuestion]:
+    """
+    为错题生成相似题目并提交，已生成过的直接返回已有结果（需要在应用上下文中调用）
+    indexes 为 SimilarityIndexStore
+    """
+    existing = load_generated(wrong_question.question_id, wrong_question.id)
+    if existing:
+        return existing
+
+    original_question = wrong_question.question
+    # 在后台线程中执行，索引落后于题库版本时等待更新完成
+    neighbors = indexes.neighbors(original_question.id, wrong_question.question_bank_mode,
+                                  limit=SIMILAR_QUESTION_COUNT, wait=True)
+    similar_from_db = load_similar_questions(neighbors)
+    if similar_from_db:
+        similar_questions = [build_similar_question(original_question, question, score)
+                             for question, score in similar_from_db]
+    else:
+        similar_questions = build_template_questions(original_question, wrong_question)
+
+    prompt = build_generation_prompt(original_question)
+    for slot, similar_question in enumerate(similar_questions):
+        similar_question.slot = slot
+        similar_question.wrong_question_id = wrong_question.id
+        similar_question.generation_prompt = prompt
+        similar_question.question_bank_mode = wrong_question.question_bank_mode
+    db.session.add_all(similar_questions)
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # 其它进程已经为这道错题写入了相似题目
+        db.session.rollback()
+        return load_generated(wrong_question.question_id, wrong_question.id)
+    return similar_questions
+
+
+class SimilarQuestionWorker:
+    """按 (原题id, 错题id) 去重的后台生成线程池"""
+
+    def __init__(self, app, indexes, max_workers: int = None):
+        self.app = app
+        self.indexes = indexes
+        self.max_workers = max_workers or int(os.getenv('SIMILAR_QUESTION_WORKERS', DEFAULT_WORKERS))
+        self._executor = None
+        self._pending: Dict[Tuple[int, int], Future] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, original_question_id: int, wrong_question_id: int) -> Future:
+        """提交生成任务；同一个键已有任务在排队或执行时返回该任务。任务结果为生成的相似题目id列表"""
+        key = (original_question_id, wrong_question_id)
+        with self._lock:
+            future = self._pending.get(key)
+            if future is not None:
+                return future
+            if self._executor is None:
+                # 第一次提交时才创建线程池
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                    thread_name_prefix='similar-questions')
+            future = self._executor.submit(self._run, wrong_question_id)
+            self._pending[key] = future
+        future.add_done_callback(lambda _: self._finish(key))
+        return future
+
+    def submit_all(self, keys) -> None:
+        """批量提交生成任务，keys 为 [(原题id, 错题id)]"""
+        for original_question_id, wrong_question_id in keys:
+            self.submit(original_question_id, wrong_question_id)
+
+    def _finish(self, key) -> None:
+        with self._lock:
+            self._pending.pop(key, None)
+
+    def _run(self, wrong_question_id: int) -> List[int]:
+        with self.app.app_context():
+            try:
+                wrong_question = db.session.get(WrongQuestion, wrong_question_id)
+                if wrong_question is None:
+                    return []
+                return [sq.id for sq in generate_for_wrong_question(wrong_question, self.indexes)]
+            except Exception:
+                db.session.rollback()
+                self.app.logger.exception("生成相似题目失败: wrong_question_id=%s", wrong_question_id)
+                raise
+
+    def pending_count(self) -> int:
+        with self._lock:
+            return len(self._pending)
@@ -0,0 +1,424 @@
+#!/usr/bin/env python3
+"""
+相似题目索引
+对每个题库模式，用jieba分词后的题目标题、内容和解析构建TF-IDF稀疏矩阵，
+并预计算每道题余弦相似度最高的前K个近邻。举一反三和相似题目接口直接查近邻表。
+
+- 索引保存在 instance/similarity_index_<mode>.npz（数组和词表，不序列化类），记录构建时的题库版本号（见 bank_version.py）
+- 题库版本变化后按题目文本摘要增量更新：只对新增/修改的题目分词和向量化，
+  删除题目或近邻受影响的题目重新计算近邻；变化累计超过一定比例时全量重建（重新拟合词表）
+- 导入脚本在提交后调用 refresh_similarity_index() 预先更新，Web进程启动时加载；
+  请求路径上不构建索引，索引落后时先用旧索引应答并在后台更新
+
+    python similarity_index.py              # 全量重建两种模式的索引
+    python similarity_index.py interview    # 只重建指定模式
+"""
+
+import copy
+import hashlib
+import os
+import re
+import sys
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import jieba
+import numpy as np
+from flask import current_app
+from scipy import sparse
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+from models import db, Question
+from bank_version import get_bank_version
+from tokenizer import init_tokenizer, prepare_tokenizer
+
+QUESTION_BANK_MODES = ('academic', 'interview')
+TOP_K = 10
+REBUILD_RATIO = 0.2  # 自上次全量重建以来变化的题目超过该比例时重新拟合词表
+BLOCK_CELLS = 4_000_000  # 分块计算相似度时每块的最大元素数
+
+_PUNCTUATION = re.compile(r'^[\W_]+$')
+
+
+def tokenize(text: str) -> List[str]:
+    """jieba分词，去掉空白和纯标点"""
+    tokens = []
+    for word in jieba.cut(text or ''):
+        word = word.strip().lower()
+        if word and not _PUNCTUATION.match(word):
+            tokens.append(word)
+    return tokens
+
+
+def question_text(title: Optional[str], content: Optional[str], explanation: Optional[str]) -> str:
+    return '\n'.join(part for part in (title, content, explanation) if part)
+
+
+def _new_vectorizer() -> TfidfVectorizer:
+    return TfidfVectorizer(tokenizer=tokenize, lowercase=False, token_pattern=None, sublinear_tf=True)
+
+
+def _digest(text: str) -> str:
+    return hashlib.md5(text.encode('utf-8')).hexdigest()
+
+
+def _top_k(query: sparse.csr_matrix, query_ids: np.ndarray,
+           matrix: sparse.csr_matrix, matrix_ids: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    计算 query 每一行在 matrix 中余弦相似度最高的k行（排除同一道题，行向量已L2归一化）
+
+    返回 (近邻id, 相似度)，形状均为 (query行数, k)；不足k个或相似度为0的位置id为-1。
+    """
+    neighbor_ids = np.full((query.shape[0], k), -1, dtype=np.int64)
+    neighbor_scores = np.zeros((query.shape[0], k), dtype=np.float32)
+    if query.shape[0] == 0 or matrix.shape[0] == 0:
+        return neighbor_ids, neighbor_scores
+
+    kk = min(k, matrix.shape[0])
+    matrix_t = matrix.T.tocsc()
+    block = max(1, BLOCK_CELLS // matrix.shape[0])
+
+    for start in range(0, query.shape[0], block):
+        stop = min(start + block, query.shape[0])
+        scores = (query[start:stop] @ matrix_t).toarray().astype(np.float32)
+        scores[matrix_ids[None, :] == query_ids[start:stop, None]] = 0.0
+
+        top = np.argpartition(-scores, kk - 1, axis=1)[:, :kk]
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1, kind='stable')
+        top = np.take_along_axis(top, order, axis=1)
+        top_scores = np.take_along_axis(top_scores, order, axis=1)
+
+        ids = matrix_ids[top]
+        ids[top_scores <= 0] = -1
+        neighbor_ids[start:stop, :kk] = ids
+        neighbor_scores[start:stop, :kk] = np.maximum(top_scores, 0)
+
+    return neighbor_ids, neighbor_scores
+
+
+def _merge_top_k(ids_a, scores_a, ids_b, scores_b, k) -> Tuple[np.ndarray, np.ndarray]:
+    """合并两组近邻候选，按相似度保留前k个"""
+    ids = np.concatenate([ids_a, ids_b], axis=1)
+    scores = np.concatenate([scores_a, scores_b], axis=1).astype(np.float32)
+    scores[ids < 0] = -1.0
+    order = np.argsort(-scores, axis=1, kind='stable')[:, :k]
+    ids = np.take_along_axis(ids, order, axis=1)
+    scores = np.take_along_axis(scores, order, axis=1)
+    ids[scores <= 0] = -1
+    return ids, np.maximum(scores, 0)
+
+
+class SimilarityIndex:
+    """单个题库模式的TF-IDF矩阵和近邻表"""
+
+    def __init__(self, mode: str, k: int = TOP_K):
+        self.mode = mode
+        self.k = k
+        self.version = -1
+        self.vectorizer: Optional[TfidfVectorizer] = None
+        self.ids = np.empty(0, dtype=np.int64)
+        self.digests: List[str] = []
+        self.matrix = sparse.csr_matrix((0, 0), dtype=np.float64)
+        self.neighbor_ids = np.empty((0, k), dtype=np.int64)
+        self.neighbor_scores = np.empty((0, k), dtype=np.float32)
+        self.changed_since_rebuild = 0
+        self._positions: Dict[int, int] = {}
+
+    def _reindex(self) -> None:
+        self._positions = {int(question_id): position for position, question_id in enumerate(self.ids)}
+
+    def neighbors(self, question_id: int, limit: int = 3) -> List[Tuple[int, float]]:
+        """返回 [(题目id, 相似度)]，按相似度降序"""
+        position = self._positions.get(question_id)
+        if position is None:
+            return []
+        return [
+            (int(neighbor_id), float(score))
+            for neighbor_id, score in zip(self.neighbor_ids[position][:limit], self.neighbor_scores[position][:limit])
+            if neighbor_id >= 0
+        ]
+
+    def rebuild(self, rows: List[Tuple[int, str]], version: int) -> None:
+        """全量重建：重新拟合词表和IDF，计算所有题目的近邻"""
+        self.ids = np.array([question_id for question_id, _ in rows], dtype=np.int64)
+        texts = [text for _, text in rows]
+        self.digests = [_digest(text) for text in texts]
+
+        if rows:
+            self.vectorizer = _new_vectorizer()
+            self.matrix = self.vectorizer.fit_transform(texts).tocsr()
+        else:
+            self.vectorizer = None
+            self.matrix = sparse.csr_matrix((0, 0), dtype=np.float64)
+
+        self.neighbor_ids, self.neighbor_scores = _top_k(self.matrix, self.ids, self.matrix, self.ids, self.k)
+        self.changed_since_rebuild = 0
+        self.version = version
+        self._reindex()
+
+    def update(self, rows: List[Tuple[int, str]], version: int) -> None:
+        """按文本摘要增量更新，变化过多或尚未构建时全量重建"""
+        current = {question_id: (text, _digest(text)) for question_id, text in rows}
+        known = dict(zip(self.ids.tolist(), self.digests))
+
+        changed_ids = [qid for qid, (_, digest) in current.items() if known.get(qid) != digest]
+        removed_ids = [qid for qid in known if qid not in current]
+        changed_total = self.changed_since_rebuild + len(changed_ids) + len(removed_ids)
+
+        if self.vectorizer is None or changed_total > REBUILD_RATIO * max(len(current), 1):
+            self.rebuild(rows, version)
+            return
+
+        if changed_ids or removed_ids:
+            self._apply_changes(current, changed_ids, removed_ids)
+            self.changed_since_rebuild = changed_total
+        self.version = version
+
+    def _apply_changes(self, current: Dict[int, Tuple[str, str]], changed_ids: List[int], removed_ids: List[int]) -> None:
+        dropped = np.array(changed_ids + removed_ids, dtype=np.int64)
+
+        # 1. 删除已删除和已修改的题目（修改的题目稍后重新加入）
+        keep = ~np.isin(self.ids, dropped)
+        ids = self.ids[keep]
+        digests = [digest for digest, kept in zip(self.digests, keep) if kept]
+        matrix = self.matrix[np.flatnonzero(keep)]
+        neighbor_ids = self.neighbor_ids[keep]
+        neighbor_scores = self.neighbor_scores[keep]
+
+        # 2. 沿用已有词表向量化新增/修改的题目
+        added_ids = np.array(changed_ids, dtype=np.int64)
+        if len(added_ids):
+            added_matrix = self.vectorizer.transform([current[qid][0] for qid in changed_ids]).tocsr()
+        else:
+            added_matrix = sparse.csr_matrix((0, matrix.shape[1]), dtype=matrix.dtype)
+
+        all_ids = np.concatenate([ids, added_ids])
+        all_matrix = sparse.vstack([matrix, added_matrix]).tocsr()
+
+        # 3. 近邻中包含被删除/修改题目的旧题目需要重新计算
+        dirty = np.isin(neighbor_ids, dropped).any(axis=1)
+        if dirty.any():
+            dirty_rows = np.flatnonzero(dirty)
+            neighbor_ids[dirty_rows], neighbor_scores[dirty_rows] = _top_k(
+                matrix[dirty_rows], ids[dirty_rows], all_matrix, all_ids, self.k
+            )
+
+        # 4. 其余旧题目只需要把新题目作为候选合并进前K个
+        clean_rows = np.flatnonzero(~dirty)
+        if len(added_ids) and len(clean_rows):
+            candidate_ids, candidate_scores = _top_k(
+                matrix[clean_rows], ids[clean_rows], added_matrix, added_ids, self.k
+            )
+            neighbor_ids[clean_rows], neighbor_scores[clean_rows] = _merge_top_k(
+                neighbor_ids[clean_rows], neighbor_scores[clean_rows], candidate_ids, candidate_scores, self.k
+            )
+
+        # 5. 新题目在全部题目中计算近邻
+        added_neighbor_ids, added_neighbor_scores = _top_k(added_matrix, added_ids, all_matrix, all_ids, self.k)
+
+        self.ids = all_ids
+        self.digests = digests + [current[qid][1] for qid in changed_ids]
+        self.matrix = all_matrix
+        self.neighbor_ids = np.vstack([neighbor_ids, added_neighbor_ids])
+        self.neighbor_scores = np.vstack([neighbor_scores, added_neighbor_scores])
+        self._reindex()
+
+    def save(self, path: str) -> None:
+        """
+        保存为npz（只保存数组和词表，不序列化类，以脚本方式构建的索引也能被Web进程加载）；
+        先写临时文件再替换，避免其它进程读到写了一半的索引
+        """
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if self.vectorizer is not None:
+            vocabulary = self.vectorizer.vocabulary_
+            terms = np.array(sorted(vocabulary, key=vocabulary.get), dtype=str)
+            idf = self.vectorizer.idf_
+        else:
+            terms, idf = np.empty(0, dtype=str), np.empty(0, dtype=np.float64)
+        temp_path = f'{path}.tmp{os.getpid()}.npz'
+        np.savez(
+            temp_path,
+            mode=np.array(self.mode),
+            k=np.array(self.k),
+            version=np.array(self.version),
+            changed_since_rebuild=np.array(self.changed_since_rebuild),
+            ids=self.ids,
+            digests=np.array(self.digests, dtype=str),
+            data=self.matrix.data,
+            indices=self.matrix.indices,
+            indptr=self.matrix.indptr,
+            shape=np.array(self.matrix.shape),
+            neighbor_ids=self.neighbor_ids,
+            neighbor_scores=self.neighbor_scores,
+            terms=terms,
+            idf=idf
+        )
+        os.replace(temp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> Optional['SimilarityIndex']:
+        """从npz加载，文件不存在或格式不对时返回 None"""
+        try:
+            with np.load(path, allow_pickle=False) as stored:
+                index = cls(str(stored['mode']), int(stored['k']))
+                index.version = int(stored['version'])
+                index.changed_since_rebuild = int(stored['changed_since_rebuild'])
+                index.ids = stored['ids'].astype(np.int64)
+                index.digests = stored['digests'].tolist()
+                index.matrix = sparse.csr_matrix(
+                    (stored['data'], stored['indices'], stored['indptr']), shape=tuple(stored['shape'])
+                )
+                index.neighbor_ids = stored['neighbor_ids']
+                index.neighbor_scores = stored['neighbor_scores']
+                terms, idf = stored['terms'], stored['idf']
+        except (OSError, ValueError, KeyError):
+            return None
+
+        if len(terms):
+            index.vectorizer = _new_vectorizer()
+            index.vectorizer.vocabulary_ = {term: column for column, term in enumerate(terms.tolist())}
+            index.vectorizer.idf_ = idf
+        index._reindex()
+        return index
+
+
+def load_question_texts(mode: str) -> List[Tuple[int, str]]:
+    rows = db.session.query(Question.id, Question.title, Question.content, Question.explanation)\
+                     .filter(Question.question_bank_mode == mode)\
+                     .order_by(Question.id).all()
+    return [(question_id, question_text(title, content, explanation))
+            for question_id, title, content, explanation in rows]
+
+
+def index_path(mode: str) -> str:
+    return os.path.join(current_app.instance_path, f'similarity_index_{mode}.npz')
+
+
+class SimilarityIndexStore:
+    """
+    按题库模式管理相似题目索引（需要在应用上下文中使用）
+    请求路径上只从内存或磁盘读取索引，不在请求中分词和计算近邻：索引落后于题库版本时
+    先用旧索引（没有时为空索引）应答，同时在后台线程更新；启动时和导入脚本调用 refresh() 预先构建
+    """
+
+    def __init__(self):
+        self._indexes: Dict[str, SimilarityIndex] = {}
+        self._lock = threading.Lock()          # 保护 _indexes / _refreshing，只在读写时短暂持有
+        self._refresh_lock = threading.Lock()  # 同时只有一个线程在构建索引
+        self._refreshing = set()
+
+    def get(self, mode: str, wait: bool = False) -> SimilarityIndex:
+        """
+        返回当前可用的索引；wait=True 时索引落后于题库版本则同步更新后返回（后台任务使用），
+        否则返回旧索引并在后台更新
+        """
+        version = get_bank_version(mode)
+        index = self._indexes.get(mode)
+        if index is not None and index.version == version:
+            return index
+        if wait:
+            return self.refresh(mode)
+
+        with self._lock:
+            index = self._indexes.get(mode)
+            if index is None:
+                # 进程内还没有索引时读取磁盘上的一份（可能是旧版本）
+                index = SimilarityIndex.load(index_path(mode))
+                if index is not None:
+                    self._indexes[mode] = index
+            if index is not None and index.version == version:
+                return index
+            self._refresh_in_background(mode)
+        return index if index is not None else SimilarityIndex(mode)
+
+    def refresh(self, mode: str) -> SimilarityIndex:
+        """按当前题库版本加载或增量更新并保存索引"""
+        with self._refresh_lock:
+            version = get_bank_version(mode)
+            index = self._indexes.get(mode)
+            if index is None or index.version != version:
+                index = self._refresh(mode, version, index)
+                with self._lock:
+                    self._indexes[mode] = index
+        return index
+
+    def _refresh_in_background(self, mode: str) -> None:
+        """每个模式同时只有一个后台更新线程（调用方持有锁）"""
+        if mode in self._refreshing:
+            return
+        self._refreshing.add(mode)
+        app = current_app._get_current_object()
+
+        def run():
+            try:
+                with app.app_context():
+                    self.refresh(mode)
+            except Exception:
+                app.logger.exception("更新相似题目索引失败: mode=%s", mode)
+            finally:
+                with self._lock:
+                    self._refreshing.discard(mode)
+
+        threading.Thread(target=run, name=f'similarity-index-{mode}', daemon=True).start()
+
+    def _refresh(self, mode: str, version: int, index: Optional[SimilarityIndex]) -> SimilarityIndex:
+        init_tokenizer()
+        path = index_path(mode)
+        stored = SimilarityIndex.load(path)
+        if stored is not None and stored.version == version:
+            return stored
+
+        # 从较新的一份开始增量更新
+        if index is None or (stored is not None and stored.version > index.version):
+            index = stored
+        if index is None:
+            index = SimilarityIndex(mode)
+        else:
+            # 在副本上更新（update 只替换属性），请求线程继续读取旧索引
+            index = copy.copy(index)
+
+        index.update(load_question_texts(mode), version)
+        index.save(path)
+        return index
+
+    def neighbors(self, question_id: int, mode: str, limit: int = 3, wait: bool = False) -> List[Tuple[int, float]]:
+        return self.get(mode, wait=wait).neighbors(question_id, limit)
+
+    def warm(self, modes=QUESTION_BANK_MODES) -> None:
+        """启动时调用：预先加载或更新所有模式的索引"""
+        for mode in modes:
+            self.refresh(mode)
+
+    def rebuild(self, mode: str) -> SimilarityIndex:
+        """全量重建并保存"""
+        with self._refresh_lock:
+            index = SimilarityIndex(mode)
+            index.rebuild(load_question_texts(mode), get_bank_version(mode))
+            index.save(index_path(mode))
+            with self._lock:
+                self._indexes[mode] = index
+        return index
+
+
+def refresh_similarity_index(modes=QUESTION_BANK_MODES) -> None:
+    """导入题目后调用：更新领域词典，再按当前题库版本增量更新并保存索引（需要在应用上下文中调用）"""
+    prepare_tokenizer()
+    SimilarityIndexStore().warm(modes)
+
+
+if __name__ == "__main__":
+    # 通过模块导入使用索引类，与Web进程中的是同一个类（脚本本身的 __main__ 是另一份副本）
+    import similarity_index
+    from app import app
+
+    target_modes = sys.argv[1:] or list(QUESTION_BANK_MODES)
+
+    with app.app_context():
+        db.create_all()
+        prepare_tokenizer()
+        store = similarity_index.SimilarityIndexStore()
+        for mode in target_modes:
+            print(f"🔄 重建 {mode} 模式的相似题目索引...")
+            index = store.rebuild(mode)
+            print(f"✅ {mode}: {len(index.ids)} 道题目，词表 {index.matrix.shape[1]} 个词")
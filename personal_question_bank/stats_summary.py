@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+用户学习统计汇总
+答题接口在同一事务中增量维护 UserStatsSummary，统计/进度接口直接读取汇总行。
+汇总与明细不一致时（例如批量导入了学习记录），可以用本脚本从 LearningRecord 重建：
+
+    python stats_summary.py        # 重建所有用户
+    python stats_summary.py 3 5    # 只重建指定用户
+"""
+
+import sys
+from typing import Dict, Iterable, Optional
+
+from sqlalchemy import and_, case, func
+
+from models import db, LearningRecord, UserKnowledgeStats, UserStatsSummary
+
+
+def compute_summary_values(user_ids: Optional[Iterable[int]] = None) -> Dict[int, Dict]:
+    """按用户聚合学习记录和知识点统计，返回 {user_id: 汇总字段}"""
+    record_query = db.session.query(
+        LearningRecord.user_id,
+        func.count(LearningRecord.id),
+        func.sum(case((LearningRecord.is_correct == True, 1), else_=0)),
+        func.coalesce(func.sum(LearningRecord.time_spent), 0)
+    )
+    mastery = func.coalesce(UserKnowledgeStats.mastery_level, 0.0)
+    stats_query = db.session.query(
+        UserKnowledgeStats.user_id,
+        func.sum(case((mastery > 0.7, 1), else_=0)),
+        func.sum(case((and_(mastery >= 0.3, mastery <= 0.7), 1), else_=0)),
+        func.sum(case((mastery < 0.3, 1), else_=0)),
+        func.sum(mastery)
+    )
+
+    if user_ids is not None:
+        user_ids = list(user_ids)
+        record_query = record_query.filter(LearningRecord.user_id.in_(user_ids))
+        stats_query = stats_query.filter(UserKnowledgeStats.user_id.in_(user_ids))
+
+    values = {}
+
+    def empty_values():
+        return {
+            'total_questions': 0,
+            'correct_answers': 0,
+            'total_time_spent': 0,
+            'mastered_knowledge_points': 0,
+            'learning_knowledge_points': 0,
+            'weak_knowledge_points': 0,
+            'mastery_sum': 0.0
+        }
+
+    for user_id, total, correct, time_spent in record_query.group_by(LearningRecord.user_id).all():
+        row = values.setdefault(user_id, empty_values())
+        row['total_questions'] = total or 0
+        row['correct_answers'] = int(correct or 0)
+        row['total_time_spent'] = int(time_spent or 0)
+
+    for user_id, mastered, learning, weak, mastery_sum in stats_query.group_by(UserKnowledgeStats.user_id).all():
+        row = values.setdefault(user_id, empty_values())
+        row['mastered_knowledge_points'] = int(mastered or 0)
+        row['learning_knowledge_points'] = int(learning or 0)
+        row['weak_knowledge_points'] = int(weak or 0)
+        row['mastery_sum'] = float(mastery_sum or 0.0)
+
+    return values
+
+
+def get_or_create_summary(user_id: int) -> UserStatsSummary:
+    """
+    获取用户的统计汇总，不存在时从历史记录计算一份（不提交，由调用方提交）
+
+    注意：需要在本次事务添加新的学习记录之前调用，否则autoflush会把新记录也算进去。
+    """
+    summary = UserStatsSummary.query.filter_by(user_id=user_id).first()
+    if summary is None:
+        values = compute_summary_values([user_id]).get(user_id, {})
+        summary = UserStatsSummary(user_id=user_id, **values)
+        db.session.add(summary)
+    return summary
+
+
+def rebuild_stats_summaries(user_ids: Optional[Iterable[int]] = None) -> int:
+    """从 LearningRecord / UserKnowledgeStats 重建汇总行，返回重建的用户数"""
+    if user_ids is not None:
+        user_ids = list(user_ids)
+    values = compute_summary_values(user_ids)
+
+    existing_query = UserStatsSummary.query
+    if user_ids is not None:
+        existing_query = existing_query.filter(UserStatsSummary.user_id.in_(user_ids))
+    existing = {summary.user_id: summary for summary in existing_query.all()}
+
+    for user_id, summary in existing.items():
+        if user_id not in values:
+            # 已经没有任何学习数据的用户
+            db.session.delete(summary)
+
+    for user_id, row in values.items():
+        summary = existing.get(user_id)
+        if summary is None:
+            db.session.add(UserStatsSummary(user_id=user_id, **row))
+        else:
+            for field, value in row.items():
+                setattr(summary, field, value)
+
+    db.session.commit()
+    return len(values)
+
+
+if __name__ == "__main__":
+    from app import app
+
+    target_user_ids = [int(arg) for arg in sys.argv[1:]] or None
+
+    with app.app_context():
+        db.create_all()
+        print("🔄 开始重建用户学习统计汇总...")
+        rebuilt = rebuild_stats_summaries(target_user_ids)
+        print(f"✅ 已重建 {rebuilt} 个用户的统计汇总")
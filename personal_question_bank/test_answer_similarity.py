@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+测试长答案的文本相似度和评分长度上限
+"""
+
+import difflib
+import random
+
+from theory_grader import TheoryQuestionGrader, MAX_ANSWER_CHARS, SIMILARITY_MAX_CHARS
+
+REFERENCE = "哈希表是通过哈希函数将键映射到数组索引的数据结构，提供快速查找，冲突可以用链地址法或开放寻址法解决。"
+
+
+def test_short_texts_match_sequence_matcher():
+    """两段文本都不超过上限时，相似度与完整的 SequenceMatcher.ratio() 相同"""
+    grader = TheoryQuestionGrader()
+    rng = random.Random(0)
+    corpus = grader._clean_text(REFERENCE * 3)
+    for _ in range(200):
+        user_text = ''.join(rng.sample(corpus, rng.randint(1, 60)))
+        correct_text = corpus[:rng.randint(1, len(corpus))]
+        assert grader._calculate_similarity(user_text, correct_text) == \
+            difflib.SequenceMatcher(None, user_text, correct_text).ratio()
+    assert grader._calculate_similarity('', corpus) == 0.0
+
+
+def test_long_texts_close_to_full_comparison():
+    """超过上限时只比较前面部分，与完整比较的偏差很小"""
+    grader = TheoryQuestionGrader()
+    rng = random.Random(1)
+    correct_text = grader._clean_text(REFERENCE)
+    for length in (SIMILARITY_MAX_CHARS * 2, SIMILARITY_MAX_CHARS * 5):
+        user_text = ''.join(correct_text[start:start + 10]
+                            for start in (rng.randrange(len(correct_text) - 10) for _ in range(length // 10)))
+        bounded = grader._calculate_similarity(user_text, correct_text)
+        full = difflib.SequenceMatcher(None, user_text, correct_text).ratio()
+        assert 0.0 <= bounded <= full
+        assert full - bounded < 0.01
+
+
+def test_answer_truncated_before_grading():
+    """用户答案只有前 MAX_ANSWER_CHARS 个字符参与评分"""
+    grader = TheoryQuestionGrader()
+    prefix = ('栈是后进先出的数据结构' * MAX_ANSWER_CHARS)[:MAX_ANSWER_CHARS]
+    assert len(grader.normalize_answer(prefix + '队列是先进先出的数据结构' * 100)) == MAX_ANSWER_CHARS
+
+    first = grader.grade_theory_question(prefix + '哈希表' * 1000, REFERENCE)
+    second = grader.grade_theory_question(prefix + '链地址法' * 1000, REFERENCE)
+    assert first.score == second.score
+    assert first.correct_keywords == second.correct_keywords
+
+
+if __name__ == "__main__":
+    test_short_texts_match_sequence_matcher()
+    test_long_texts_close_to_full_comparison()
+    test_answer_truncated_before_grading()
+    print("🎉 长答案相似度测试通过！")
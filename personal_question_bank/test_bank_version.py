@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+测试题库版本号在各种写入方式下的递增
+"""
+
+from flask import Flask
+from sqlalchemy import update
+
+from models import db, User, Company, KnowledgePoint, Question, WrongQuestion
+from bank_version import BankVersionCache, get_bank_version
+
+
+def create_app():
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    db.init_app(app)
+    return app
+
+
+def versions():
+    return get_bank_version('academic'), get_bank_version('interview')
+
+
+def seed():
+    knowledge_point = KnowledgePoint(name='栈', category='数据结构', question_bank_mode='academic')
+    db.session.add(knowledge_point)
+    db.session.flush()
+    db.session.add(Question(title='题目', content='内容', question_type='theory', difficulty='easy',
+                            knowledge_point_id=knowledge_point.id, question_bank_mode='academic'))
+    db.session.commit()
+
+
+def test_flush_bumps_changed_mode_only():
+    """通过ORM对象新增、修改题目时只递增该题目所属模式的版本号"""
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        seed()
+        academic, interview = versions()
+        assert academic > 0 and interview == 0
+
+        question = Question.query.first()
+        question.title = '新标题'
+        db.session.commit()
+        assert versions() == (academic + 1, 0)
+
+        db.session.add(Company(name='某公司'))
+        db.session.commit()
+        assert versions() == (academic + 1, 1)
+
+
+def test_bulk_statements_bump_versions():
+    """query.delete() 和批量 UPDATE 不经过flush，也会递增版本号；无关的表不受影响"""
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        seed()
+        academic, interview = versions()
+
+        db.session.execute(update(Question).values(difficulty='hard'))
+        db.session.commit()
+        assert versions() == (academic + 1, interview + 1)
+
+        user = User(username='tester', email='tester@example.com')
+        db.session.add(user)
+        db.session.commit()
+        WrongQuestion.query.filter_by(user_id=user.id).delete()
+        db.session.commit()
+        assert versions() == (academic + 1, interview + 1)
+
+        Question.query.filter_by(question_bank_mode='academic').delete()
+        db.session.commit()
+        assert versions() == (academic + 2, interview + 2)
+
+        Company.query.delete()
+        db.session.commit()
+        assert versions() == (academic + 2, interview + 3)
+
+
+def test_cache_recomputes_after_bulk_delete():
+    """批量删除题目后，按版本号缓存的结果重新计算"""
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        seed()
+        cache = BankVersionCache()
+        count = lambda: Question.query.count()
+        assert cache.get_or_compute('academic', 'count', count) == 1
+
+        Question.query.delete()
+        db.session.commit()
+        assert cache.get_or_compute('academic', 'count', count) == 0
+
+
+if __name__ == "__main__":
+    test_flush_bumps_changed_mode_only()
+    test_bulk_statements_bump_versions()
+    test_cache_recomputes_after_bulk_delete()
+    print("🎉 题库版本号测试通过！")
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+测试推荐候选题目的生成（一次查询最近作答时间，按时间分层放宽）
+"""
+
+from datetime import datetime, timedelta
+
+import numpy as np
+from flask import Flask
+from sqlalchemy import event
+
+from models import db, User, KnowledgePoint, Question, LearningRecord
+from recommendation_engine import RecommendationEngine
+
+
+def create_app():
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    db.init_app(app)
+    return app
+
+
+def seed(question_types, answered):
+    """
+    按题型列表创建题目，answered 为 {题目序号: 几小时前作答}，另有一道面试模式的题目也被作答过
+    返回 (用户id, 题目id列表)
+    """
+    user = User(username='tester', email='tester@example.com')
+    knowledge_point = KnowledgePoint(name='栈', category='数据结构')
+    db.session.add_all([user, knowledge_point])
+    db.session.flush()
+    questions = [Question(title=f'题目{i}', content='内容', question_type=question_type, difficulty='easy',
+                          knowledge_point_id=knowledge_point.id, question_bank_mode='academic')
+                 for i, question_type in enumerate(question_types)]
+    other_mode = Question(title='面试题', content='内容', question_type='theory', difficulty='easy',
+                          knowledge_point_id=knowledge_point.id, question_bank_mode='interview')
+    db.session.add_all(questions + [other_mode])
+    db.session.flush()
+
+    now = datetime.utcnow()
+    for question, hours_ago in [(questions[index], hours) for index, hours in answered.items()] + [(other_mode, 1)]:
+        db.session.add(LearningRecord(user_id=user.id, question_id=question.id, is_correct=True, time_spent=60,
+                                      started_at=now - timedelta(hours=hours_ago),
+                                      completed_at=now - timedelta(hours=hours_ago)))
+    db.session.commit()
+    return user.id, [question.id for question in questions]
+
+
+def test_last_attempt_ages_single_query():
+    """一次查询得到3天内每道题的最后作答时间，其它题目为无穷大，其它模式的题目被忽略"""
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        user_id, _ = seed(['theory'] * 4, {0: 2, 1: 48, 2: 120})
+        engine = RecommendationEngine()
+        features = engine.get_question_features('academic')
+
+        statements = []
+        event.listen(db.engine, 'before_cursor_execute', lambda *args: statements.append(args[2]))
+        ages = engine._last_attempt_ages(user_id, features, datetime.utcnow())
+
+        assert len(statements) == 1
+        assert abs(ages[0] - 2 * 3600) < 60 and abs(ages[1] - 48 * 3600) < 60
+        assert np.isinf(ages[2]) and np.isinf(ages[3])
+
+
+def test_candidates_relax_by_recency():
+    """先排除1天内做过的题目，不足10道时排除3天内做过的，全部做过时保底返回所有题目"""
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        user_id, _ = seed(['theory'] * 20, {0: 2, 1: 48})
+        engine = RecommendationEngine()
+        features = engine.get_question_features('academic')
+        assert engine._get_candidate_positions(user_id, {}, features).tolist() == list(range(1, 20))
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        user_id, _ = seed(['theory'] * 11, {0: 2, 1: 2, 2: 48})
+        engine = RecommendationEngine()
+        features = engine.get_question_features('academic')
+        assert engine._get_candidate_positions(user_id, {}, features).tolist() == list(range(3, 11))
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        user_id, _ = seed(['theory'] * 3, {0: 0.5, 1: 0.5, 2: 0.5})
+        engine = RecommendationEngine()
+        features = engine.get_question_features('academic')
+        assert engine._get_candidate_positions(user_id, {}, features).tolist() == [0, 1, 2]
+
+
+def test_preferred_types_topped_up():
+    """偏好题型的题目不足5道时补充最多10道其它题型的题目"""
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        user_id, _ = seed(['coding', 'coding'] + ['theory'] * 18, {})
+        engine = RecommendationEngine()
+        features = engine.get_question_features('academic')
+        candidates = engine._get_candidate_positions(user_id, {'preferred_types': ['coding']}, features)
+        assert candidates.tolist() == [0, 1] + list(range(2, 12))
+
+
+def test_candidate_pool_sampled_stably():
+    """候选池超过上限时抽样，同一用户同一天结果固定"""
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        user_id, _ = seed(['theory'] * 30, {})
+        engine = RecommendationEngine()
+        engine.weights = dict(engine.weights, candidate_pool_size=12)
+        features = engine.get_question_features('academic')
+
+        first = engine._get_candidate_positions(user_id, {}, features)
+        second = engine._get_candidate_positions(user_id, {}, features)
+        assert len(first) == 12
+        assert first.tolist() == sorted(first.tolist()) == second.tolist()
+
+
+if __name__ == "__main__":
+    test_last_attempt_ages_single_query()
+    test_candidates_relax_by_recency()
+    test_preferred_types_topped_up()
+    test_candidate_pool_sampled_stably()
+    print("🎉 推荐候选题目生成测试通过！")
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+测试评分结果缓存
+"""
+
+from theory_grader import (
+    GradingCache, TheoryQuestionGrader, grade_fill_blank_answer, fill_blank_results, grading_cache_stats, theory_grader
+)
+
+
+def test_hit_returns_copy_without_regrading():
+    """命中时不再调用评分函数，返回的是副本，修改返回值不影响缓存"""
+    cache = GradingCache(capacity=10)
+    calls = []
+
+    def grade():
+        calls.append(1)
+        return {'score': 0.5, 'correct_keywords': ['栈']}
+
+    first = cache.get_or_grade(('q1',), grade)
+    first['correct_keywords'].append('队列')
+    second = cache.get_or_grade(('q1',), grade)
+
+    assert len(calls) == 1
+    assert second == {'score': 0.5, 'correct_keywords': ['栈']}
+    assert cache.stats() == {'size': 1, 'capacity': 10, 'hits': 1, 'misses': 1, 'hit_rate': 0.5}
+
+
+def test_least_recently_used_is_evicted():
+    """超过容量时淘汰最久未使用的结果"""
+    cache = GradingCache(capacity=2)
+    cache.get_or_grade('a', lambda: {'score': 1})
+    cache.get_or_grade('b', lambda: {'score': 2})
+    cache.get_or_grade('a', lambda: {'score': -1})  # 访问 a，b 成为最久未使用
+    cache.get_or_grade('c', lambda: {'score': 3})
+
+    assert cache.get_or_grade('a', lambda: {'score': -1}) == {'score': 1}
+    assert cache.get_or_grade('b', lambda: {'score': -2}) == {'score': -2}
+    assert cache.stats()['size'] == 2
+
+
+def test_clear_keeps_counters():
+    cache = GradingCache(capacity=2)
+    cache.get_or_grade('a', lambda: {'score': 1})
+    cache.clear()
+    assert cache.get_or_grade('a', lambda: {'score': 2}) == {'score': 2}
+    assert cache.stats()['size'] == 1 and cache.stats()['misses'] == 2
+
+
+def test_fill_blank_answers_share_normalized_key():
+    """填空题按规范化后的答案缓存，分隔符、空白和大小写不同的相同答案命中同一条"""
+    fill_blank_results.clear()
+    hits = fill_blank_results.stats()['hits']
+    first = grade_fill_blank_answer('O(1), O(n)', 'O(1),O(n)')
+    second = grade_fill_blank_answer(' o(1)；O(N) ', 'O(1),O(n)')
+
+    assert first['is_correct'] and second == first
+    assert fill_blank_results.stats()['hits'] == hits + 1
+
+
+def test_reference_cache_size():
+    """同一道题的标准答案只预处理一次，修改同义词后预处理结果失效"""
+    grader = TheoryQuestionGrader()
+    assert grader.warm_references([(1, '栈是后进先出的数据结构'), (1, '栈是后进先出的数据结构'),
+                                   (2, '队列是先进先出的数据结构')]) == 3
+    assert grader.reference_cache_size() == 2
+
+    grader.add_synonyms({'栈': ['堆栈']})
+    assert grader.reference_cache_size() == 0
+    assert grading_cache_stats()['references']['size'] == theory_grader.reference_cache_size()
+
+
+if __name__ == "__main__":
+    test_hit_returns_copy_without_regrading()
+    test_least_recently_used_is_evicted()
+    test_clear_keeps_counters()
+    test_fill_blank_answers_share_normalized_key()
+    test_reference_cache_size()
+    print("🎉 评分缓存测试通过！")
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+测试AI面试官流式回应的增量解析
+"""
+
+import json
+
+from interview_stream import FeedbackStreamParser, iter_sse_data, format_sse
+
+
+def feed_all(chunks):
+    parser = FeedbackStreamParser()
+    deltas = [parser.feed(chunk) for chunk in chunks]
+    return parser, deltas
+
+
+def test_feedback_decoded_across_chunks():
+    """feedback 字段跨片段到达时逐段返回新解码的文字，字段结束后不再输出"""
+    parser, deltas = feed_all(['{"evaluation": "good", "feed', 'back": "回答', '很完整', '", "tone": "鼓励"}'])
+    assert deltas == ['', '回答', '很完整', '']
+    assert parser.feedback == '回答很完整'
+    assert json.loads(parser.text)['tone'] == '鼓励'
+
+
+def test_escape_split_between_chunks():
+    """转义序列和 \\u 代理对被拆到两个片段时等待后续片段再解码"""
+    text = json.dumps({'feedback': '第一行\n"引号"😀'})
+    parser, _ = feed_all([text[i:i + 3] for i in range(0, len(text), 3)])
+    assert parser.feedback == '第一行\n"引号"😀'
+
+    parser, deltas = feed_all(['{"feedback": "a\\', 'nb\\ud83d', '\\ude00"}'])
+    assert deltas == ['a', '\nb', '😀']
+
+
+def test_code_block_and_plain_text():
+    """```json 代码块按JSON解析；模型没有按JSON返回时原文即为反馈"""
+    parser, _ = feed_all(['```json\n{"feedback": "不错"}\n```'])
+    assert parser.feedback == '不错'
+
+    parser, deltas = feed_all(['  ', '你的回答', '还可以'])
+    assert deltas == ['', '你的回答', '还可以']
+    assert parser.feedback == '你的回答还可以'
+
+
+class FakeResponse:
+    def __init__(self, lines):
+        self.lines = lines
+
+    def iter_lines(self):
+        return iter(self.lines)
+
+
+def test_sse_round_trip():
+    """iter_sse_data 按空行分隔事件并拼接多行 data；format_sse 生成的事件可以被解析回来"""
+    response = FakeResponse([b'data: {"a": 1}', b'', b': comment', b'data:line1', b'data: line2', b'',
+                             b'data: [DONE]'])
+    assert list(iter_sse_data(response)) == ['{"a": 1}', 'line1\nline2', '[DONE]']
+
+    event = format_sse('feedback', {'text': '中文'})
+    assert event.startswith('event: feedback\n')
+    lines = [line.encode('utf-8') for line in event.split('\n')]
+    assert [json.loads(data) for data in iter_sse_data(FakeResponse(lines))] == [{'text': '中文'}]
+
+
+if __name__ == "__main__":
+    test_feedback_decoded_across_chunks()
+    test_escape_split_between_chunks()
+    test_code_block_and_plain_text()
+    test_sse_round_trip()
+    print("🎉 流式解析测试通过！")
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+测试学习者聚类和聚类预排序题目
+"""
+
+import tempfile
+from datetime import datetime
+
+import numpy as np
+from flask import Flask
+
+from models import db, User, KnowledgePoint, Question, LearningRecord
+from bank_version import bump_bank_version
+from learner_clusters import (
+    LearnerClusterStore, build_learner_clusters, learner_vector, save_learner_clusters, LEARNER_QUESTION_TYPES
+)
+from recommendation_engine import RecommendationEngine
+
+
+def test_learner_vector_defaults_to_preferences():
+    """没有答题记录时按偏好题型和偏好模式计算，有记录时按实际分布计算"""
+    vector = learner_vector(0, 0, 0, {}, 0, ['coding', 'theory', 'unknown'], 'interview')
+    assert vector[0] == 0.5 and vector[-1] == 1.0
+    type_mix = vector[2:2 + len(LEARNER_QUESTION_TYPES)]
+    assert type_mix[LEARNER_QUESTION_TYPES.index('coding')] == 0.5
+    assert type_mix.sum() == 1.0
+
+    vector = learner_vector(4, 3, 4 * 600, {'theory': 1, 'coding': 3}, 1)
+    assert vector[0] == 0.75
+    assert vector[1] == 600 / 1200
+    assert vector[2 + LEARNER_QUESTION_TYPES.index('coding')] == 0.75
+    assert vector[-1] == 0.25
+
+
+def seed():
+    """两组用户：一组只做学术模式理论题，另一组只做面试模式编程题"""
+    users = [User(username=f'user{i}', email=f'user{i}@example.com') for i in range(4)]
+    knowledge_points = [KnowledgePoint(name='栈', category='数据结构', question_bank_mode='academic'),
+                        KnowledgePoint(name='动态规划', category='算法', question_bank_mode='interview')]
+    db.session.add_all(users + knowledge_points)
+    db.session.flush()
+    questions = []
+    for mode, question_type, knowledge_point in [('academic', 'theory', knowledge_points[0]),
+                                                 ('interview', 'coding', knowledge_points[1])]:
+        questions += [Question(title=f'{mode}{i}', content='内容', question_type=question_type, difficulty='medium',
+                               knowledge_point_id=knowledge_point.id, question_bank_mode=mode) for i in range(8)]
+    db.session.add_all(questions)
+    db.session.flush()
+
+    now = datetime.utcnow()
+    for index, user in enumerate(users):
+        mode_questions = questions[:8] if index < 2 else questions[8:]
+        db.session.add_all([
+            LearningRecord(user_id=user.id, question_id=question.id, is_correct=True, time_spent=120,
+                           started_at=now, completed_at=now)
+            for question in mode_questions[:3]
+        ])
+    db.session.commit()
+    return users
+
+
+def test_clusters_rank_questions_per_mode():
+    """相似的用户分到同一类；每个聚类为每个模式排好该模式的题目，题库变化后结果过期"""
+    with tempfile.TemporaryDirectory() as instance_path:
+        app = Flask(__name__, instance_path=instance_path)
+        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+        db.init_app(app)
+        with app.app_context():
+            db.create_all()
+            seed()
+            model = build_learner_clusters(RecommendationEngine(), cluster_count=2)
+            save_learner_clusters(model)
+            assert sorted(model['sizes'].tolist()) == [2, 2]
+
+            store = LearnerClusterStore()
+            theory_user = learner_vector(3, 3, 360, {'theory': 3}, 0)
+            coding_user = learner_vector(3, 3, 360, {'coding': 3}, 3)
+            theory_cluster, question_ids, scores = store.ranked_questions(theory_user, 'academic')
+            coding_cluster, _, _ = store.ranked_questions(coding_user, 'academic')
+
+            assert theory_cluster != coding_cluster
+            academic_ids = {q.id for q in Question.query.filter_by(question_bank_mode='academic')}
+            assert set(question_ids.tolist()) == academic_ids
+            assert np.all(np.diff(scores) <= 0)
+
+            bump_bank_version(db.session, ['academic'])
+            db.session.commit()
+            assert store.ranked_questions(theory_user, 'academic') is None
+            assert store.ranked_questions(theory_user, 'interview') is not None
+
+
+if __name__ == "__main__":
+    test_learner_vector_defaults_to_preferences()
+    test_clusters_rank_questions_per_mode()
+    print("🎉 学习者聚类测试通过！")
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+测试列表接口的游标分页和计数缓存
+"""
+
+from contextlib import contextmanager
+
+from sqlalchemy import Column, Integer, create_engine
+from sqlalchemy.orm import Session, declarative_base
+
+import pagination
+from pagination import (
+    InvalidCursor, keyset_page, cached_count, clamp_per_page, clear_count_cache, decode_cursor, encode_cursor
+)
+
+Base = declarative_base()
+
+
+class Item(Base):
+    __tablename__ = 'items'
+    id = Column(Integer, primary_key=True)
+    group = Column(Integer)
+
+
+@contextmanager
+def make_session():
+    """内存数据库中的23行数据，退出时清空计数缓存"""
+    engine = create_engine('sqlite://')
+    Base.metadata.create_all(engine)
+    try:
+        with Session(engine) as session:
+            session.add_all([Item(id=item_id, group=item_id % 2) for item_id in range(1, 24)])
+            session.commit()
+            yield session
+    finally:
+        clear_count_cache()
+
+
+def collect_pages(query, per_page, descending=False):
+    pages, cursor = [], None
+    while True:
+        rows, cursor = keyset_page(query, Item.id, cursor, per_page, descending=descending)
+        pages.append([row.id for row in rows])
+        if cursor is None:
+            return pages
+
+
+def test_keyset_pages_cover_all_rows():
+    """按 id 翻页不重不漏，最后一页游标为 None；过滤条件在各页之间保持"""
+    with make_session() as session:
+        pages = collect_pages(session.query(Item), per_page=10)
+        assert pages == [list(range(1, 11)), list(range(11, 21)), [21, 22, 23]]
+
+        pages = collect_pages(session.query(Item).filter(Item.group == 1), per_page=5, descending=True)
+        assert sum(pages, []) == list(range(23, 0, -2))
+        assert all(len(page) == 5 for page in pages[:-1])
+
+
+def test_exact_multiple_has_no_empty_page():
+    """行数正好是每页数量的整数倍时，最后一页直接返回 None 游标，不会多出一页空数据"""
+    with make_session() as session:
+        rows, cursor = keyset_page(session.query(Item).filter(Item.id <= 20), Item.id, None, 20)
+        assert len(rows) == 20 and cursor is None
+
+
+def test_cursor_round_trip_and_invalid():
+    """游标可以解码回id，无法解析的游标抛出 InvalidCursor"""
+    assert decode_cursor(encode_cursor(42)) == 42
+    assert decode_cursor('') is None
+    for bad in ('not-base64!', encode_cursor(1)[:-2] + '@@', 'eyJpZCI6ICJ4In0'):
+        try:
+            decode_cursor(bad)
+        except InvalidCursor:
+            continue
+        raise AssertionError(f"游标 {bad!r} 应该无法解析")
+
+
+def test_clamp_per_page():
+    assert clamp_per_page(None) == pagination.DEFAULT_PER_PAGE
+    assert clamp_per_page(0) == pagination.DEFAULT_PER_PAGE
+    assert clamp_per_page(5) == 5
+    assert clamp_per_page(10_000) == pagination.MAX_PER_PAGE
+
+
+def test_cached_count_reuses_value_until_expired():
+    """同一个缓存键在有效期内返回缓存的总数，过期或清空缓存后重新计数"""
+    now = [1000.0]
+    monotonic = pagination.time.monotonic
+    pagination.time.monotonic = lambda: now[0]
+    try:
+        with make_session() as session:
+            query = session.query(Item).order_by(Item.id.desc())
+            assert cached_count(query, ('items',)) == 23
+
+            session.add(Item(id=100, group=0))
+            session.commit()
+            assert cached_count(query, ('items',)) == 23
+            assert cached_count(query, ('items', 'other-filter')) == 24
+
+            now[0] += pagination.COUNT_CACHE_TTL
+            assert cached_count(query, ('items',)) == 24
+
+            session.add(Item(id=101, group=1))
+            session.commit()
+            clear_count_cache()
+            assert cached_count(query, ('items',)) == 25
+    finally:
+        pagination.time.monotonic = monotonic
+
+
+if __name__ == "__main__":
+    test_keyset_pages_cover_all_rows()
+    test_exact_multiple_has_no_empty_page()
+    test_cursor_round_trip_and_invalid()
+    test_clamp_per_page()
+    test_cached_count_reuses_value_until_expired()
+    print("🎉 游标分页和计数缓存测试通过！")
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+测试每日6题的离线预计算和读取
+"""
+
+import json
+import logging
+from datetime import datetime, timedelta
+
+from flask import Flask
+
+from models import db, User, KnowledgePoint, Question, LearningRecord, DailyRecommendation
+from bank_version import bump_bank_version
+from precompute_daily import precompute_daily_recommendations, quiet_engine_logs, select_active_users
+from recommendation_engine import RecommendationEngine, DAILY_QUESTION_COUNT
+
+
+def create_app():
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    db.init_app(app)
+    return app
+
+
+def seed():
+    """一个活跃用户、一个很久没有答题的用户，两种模式各有理论题和编程题"""
+    users = [User(username='active', email='active@example.com'), User(username='idle', email='idle@example.com')]
+    db.session.add_all(users)
+    db.session.flush()
+    for mode in ('academic', 'interview'):
+        knowledge_point = KnowledgePoint(name=f'{mode}知识点', category='算法', question_bank_mode=mode)
+        db.session.add(knowledge_point)
+        db.session.flush()
+        db.session.add_all([
+            Question(title=f'{mode}-{question_type}-{i}', content='内容', question_type=question_type,
+                     difficulty='medium', knowledge_point_id=knowledge_point.id, question_bank_mode=mode)
+            for question_type in ('theory', 'coding') for i in range(5)
+        ])
+    db.session.flush()
+
+    now = datetime.utcnow()
+    first_question = Question.query.order_by(Question.id).first()
+    db.session.add_all([
+        LearningRecord(user_id=users[0].id, question_id=first_question.id, is_correct=True, time_spent=60,
+                       started_at=now - timedelta(days=1), completed_at=now - timedelta(days=1)),
+        LearningRecord(user_id=users[1].id, question_id=first_question.id, is_correct=False, time_spent=60,
+                       started_at=now - timedelta(days=90), completed_at=now - timedelta(days=90)),
+    ])
+    db.session.commit()
+    return users
+
+
+def test_stored_daily_set_is_served_until_stale():
+    """预计算结果当天直接返回；题目在预计算之后被做过，或题库版本变化后视为过期"""
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        active, _ = seed()
+        assert select_active_users() == [active.id]
+
+        assert precompute_daily_recommendations([active.id], workers=1) == 2
+        record = DailyRecommendation.query.filter_by(user_id=active.id, question_bank_mode='academic').one()
+        stored_ids = json.loads(record.question_ids)
+        assert len(stored_ids) == DAILY_QUESTION_COUNT
+
+        engine = RecommendationEngine()
+        assert engine.get_stored_daily_question_ids(active.id, 'academic') == stored_ids
+        assert [q.id for q in engine.recommend_questions(active.id, DAILY_QUESTION_COUNT, 'academic')] == stored_ids
+
+        # 做过其中一道题之后，academic 的结果过期，interview 不受影响
+        now = datetime.utcnow()
+        db.session.add(LearningRecord(user_id=active.id, question_id=stored_ids[0], is_correct=True,
+                                      time_spent=30, started_at=now, completed_at=now))
+        db.session.commit()
+        assert engine.get_stored_daily_question_ids(active.id, 'academic') is None
+        assert engine.get_stored_daily_question_ids(active.id, 'interview') is not None
+
+        bump_bank_version(db.session, ['interview'])
+        db.session.commit()
+        assert engine.get_stored_daily_question_ids(active.id, 'interview') is None
+
+
+def test_batch_job_quiets_engine_logs():
+    """批量任务只保留推荐引擎 WARNING 及以上级别的日志"""
+    engine_logger = logging.getLogger('recommendation_engine')
+    level = engine_logger.level
+    try:
+        quiet_engine_logs()
+        assert not engine_logger.isEnabledFor(logging.INFO)
+        assert engine_logger.isEnabledFor(logging.WARNING)
+    finally:
+        engine_logger.setLevel(level)
+
+
+if __name__ == "__main__":
+    test_stored_daily_set_is_served_until_stale()
+    test_batch_job_quiets_engine_logs()
+    print("🎉 每日题目预计算测试通过！")
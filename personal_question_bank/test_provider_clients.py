@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+测试服务商HTTP会话复用和凭证缓存
+"""
+
+import threading
+import time
+
+import provider_clients
+from provider_clients import (
+    TokenCache, baidu_access_token, get_session, invalidate_token, post, DEFAULT_TIMEOUT, PROVIDER_POOL_SIZES
+)
+
+
+class FakeResponse:
+    def __init__(self, payload):
+        self._payload = payload
+
+    def json(self):
+        return self._payload
+
+
+class FakeSession:
+    """记录请求参数的会话，返回固定的JSON"""
+
+    def __init__(self, payload):
+        self.payload = payload
+        self.calls = []
+
+    def post(self, url, **kwargs):
+        self.calls.append((url, kwargs))
+        return FakeResponse(self.payload)
+
+
+def test_session_reused_per_provider():
+    """同一服务商复用同一个会话，连接池大小按服务商配置"""
+    session = get_session('qwen')
+    assert get_session('qwen') is session
+    assert get_session('zhipu') is not session
+    assert session.get_adapter('https://dashscope.aliyuncs.com')._pool_maxsize == PROVIDER_POOL_SIZES['qwen']
+
+
+def test_post_uses_default_timeout():
+    """请求默认带连接和读取超时，也可以单独指定"""
+    fake = FakeSession({})
+    provider_clients._sessions['test-provider'] = fake
+    try:
+        post('test-provider', 'https://example.com/chat', json={'prompt': '你好'})
+        post('test-provider', 'https://example.com/chat', timeout=5)
+    finally:
+        provider_clients._sessions.pop('test-provider')
+
+    assert fake.calls[0][1] == {'timeout': DEFAULT_TIMEOUT, 'json': {'prompt': '你好'}}
+    assert fake.calls[1][1] == {'timeout': 5}
+
+
+def test_token_cached_until_refresh_margin():
+    """凭证在过期前 refresh_margin 秒内复用；获取失败不缓存；失效后重新获取"""
+    cache = TokenCache(refresh_margin=300)
+    fetched = []
+
+    def fetch():
+        fetched.append(1)
+        return f'token{len(fetched)}', 3600.0
+
+    assert cache.get('key', fetch) == 'token1'
+    assert cache.get('key', fetch) == 'token1'
+    assert len(fetched) == 1
+    assert cache._tokens['key'][1] - time.monotonic() <= 3300
+
+    cache._tokens['key'] = ('token1', time.monotonic() - 1)
+    assert cache.get('key', fetch) == 'token2'
+
+    cache.invalidate('key')
+    assert cache.get('key', fetch) == 'token3'
+
+    assert cache.get('empty', lambda: ('', 0)) == ''
+    assert 'empty' not in cache._tokens
+
+
+def test_token_fetched_once_under_concurrency():
+    """多个线程同时请求同一个凭证时只获取一次"""
+    cache = TokenCache()
+    fetched = []
+
+    def fetch():
+        fetched.append(1)
+        time.sleep(0.05)
+        return 'token', 3600.0
+
+    threads = [threading.Thread(target=cache.get, args=('key', fetch)) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(fetched) == 1
+
+
+def test_baidu_token_fetched_once():
+    """百度 access_token 只在第一次和失效后请求开放平台"""
+    fake = FakeSession({'access_token': 'baidu-token', 'expires_in': 2592000})
+    original = provider_clients._sessions.get('baidu')
+    provider_clients._sessions['baidu'] = fake
+    try:
+        assert baidu_access_token('test-api-key', 'secret') == 'baidu-token'
+        assert baidu_access_token('test-api-key', 'secret') == 'baidu-token'
+        assert len(fake.calls) == 1
+        assert fake.calls[0][1]['params']['client_id'] == 'test-api-key'
+
+        invalidate_token('baidu', 'test-api-key')
+        baidu_access_token('test-api-key', 'secret')
+        assert len(fake.calls) == 2
+    finally:
+        invalidate_token('baidu', 'test-api-key')
+        if original is None:
+            provider_clients._sessions.pop('baidu')
+        else:
+            provider_clients._sessions['baidu'] = original
+
+
+if __name__ == "__main__":
+    test_session_reused_per_provider()
+    test_post_uses_default_timeout()
+    test_token_cached_until_refresh_margin()
+    test_token_fetched_once_under_concurrency()
+    test_baidu_token_fetched_once()
+    print("🎉 服务商HTTP客户端测试通过！")
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+测试大模型服务商路由的统计和熔断状态
+"""
+
+import provider_router
+from provider_router import ProviderStats, ProviderRouter, CLOSED, OPEN, HALF_OPEN
+
+
+def test_latency_ewma_and_p95():
+    """成功调用更新EWMA和p95延迟；流式调用的首个片段延迟单独统计"""
+    stats = ProviderStats('qwen', 0)
+    stats.record(True, 1.0, now=0)
+    stats.record(True, 2.0, now=1)
+    assert stats.ewma_latency == provider_router.EWMA_ALPHA * 2.0 + (1 - provider_router.EWMA_ALPHA) * 1.0
+    assert 1.0 < stats.p95_latency() <= 2.0
+
+    stats.record(True, 0.2, now=2, streaming=True)
+    assert stats.routing_latency(streaming=True) == 0.2
+    assert stats.routing_latency() == stats.ewma_latency
+    assert stats.to_dict()['stream_first_chunk_ewma_ms'] == 200.0
+
+
+def test_consecutive_failures_open_circuit():
+    """连续失败 CIRCUIT_FAILURES 次后打开熔断器，冷却期内不可用，成功一次后重置"""
+    stats = ProviderStats('baidu', 1)
+    for i in range(provider_router.CIRCUIT_FAILURES - 1):
+        stats.record(False, 1.0, now=i, error='timeout')
+    assert stats.state == CLOSED
+
+    stats.record(False, 1.0, now=10, error='timeout')
+    assert stats.state == OPEN
+    assert not stats.available(10 + provider_router.CIRCUIT_COOLDOWN - 1)
+    assert stats.to_dict()['last_error'] == 'timeout'
+
+
+def test_error_rate_opens_circuit():
+    """最近的错误率超过阈值（样本足够时）也会打开熔断器"""
+    stats = ProviderStats('zhipu', 2)
+    # 失败不超过连续2次，第10次调用后错误率 0.6
+    outcomes = [True, False, True, False, False, True, False, False, True, False]
+    for i, success in enumerate(outcomes[:-1]):
+        stats.record(success, 1.0, now=i)
+    assert stats.state == CLOSED
+
+    stats.record(outcomes[-1], 1.0, now=len(outcomes))
+    assert stats.consecutive_failures < provider_router.CIRCUIT_FAILURES
+    assert stats.error_rate() > provider_router.CIRCUIT_ERROR_RATE
+    assert stats.state == OPEN
+
+
+def test_half_open_allows_single_trial():
+    """冷却结束后半开，只放行一次试探；试探失败重新打开，成功则关闭"""
+    stats = ProviderStats('qwen', 0)
+    stats.state, stats.opened_at = OPEN, 0
+    now = provider_router.CIRCUIT_COOLDOWN
+
+    assert stats.available(now)
+    assert stats.state == HALF_OPEN
+    stats.start_trial(now)
+    assert not stats.available(now + 1)
+
+    stats.record(False, 1.0, now=now + 1)
+    assert stats.state == OPEN and stats.opened_at == now + 1
+
+    stats.available(now + 1 + provider_router.CIRCUIT_COOLDOWN)
+    stats.start_trial(now + 1 + provider_router.CIRCUIT_COOLDOWN)
+    stats.record(True, 1.0, now=now + 2 + provider_router.CIRCUIT_COOLDOWN)
+    assert stats.state == CLOSED and stats.consecutive_failures == 0
+
+
+def test_lost_trial_expires():
+    """试探调用一直没有记录结果时，超过 TRIAL_TIMEOUT 后重新放行"""
+    stats = ProviderStats('qwen', 0)
+    stats.state, stats.opened_at = OPEN, 0
+    now = provider_router.CIRCUIT_COOLDOWN
+    stats.available(now)
+    stats.start_trial(now)
+
+    assert not stats.available(now + provider_router.TRIAL_TIMEOUT - 1)
+    assert stats.available(now + provider_router.TRIAL_TIMEOUT)
+
+
+def test_router_falls_back_to_next_provider():
+    """首选服务商失败时换下一个，路由决策记录尝试过的服务商"""
+    router = ProviderRouter(['qwen', 'baidu'], hedge_after=None)
+
+    def call(name):
+        if name == 'qwen':
+            raise RuntimeError('boom')
+        return f'{name} ok'
+
+    assert router.call(call) == 'baidu ok'
+    decision = router.snapshot()['recent_decisions'][-1]
+    assert decision['attempted'] == ['qwen', 'baidu']
+    assert decision['provider'] == 'baidu' and not decision['fallback']
+    # 有延迟数据的服务商排在后面，失败的 qwen 仍没有延迟数据，排在前面
+    assert router.candidates() == ['qwen', 'baidu']
+
+
+if __name__ == "__main__":
+    test_latency_ewma_and_p95()
+    test_consecutive_failures_open_circuit()
+    test_error_rate_opens_circuit()
+    test_half_open_allows_single_trial()
+    test_lost_trial_expires()
+    test_router_falls_back_to_next_provider()
+    print("🎉 服务商路由测试通过！")
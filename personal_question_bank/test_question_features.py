@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+测试题库特征矩阵和向量化推荐打分
+"""
+
+import numpy as np
+from flask import Flask
+
+from models import db, KnowledgePoint, Question
+from question_features import QuestionFeatures, encode_values, DEFAULT_ESTIMATED_TIME, MISSING_ID
+from recommendation_engine import RecommendationEngine
+
+
+def create_app():
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    db.init_app(app)
+    return app
+
+
+def build_features():
+    return QuestionFeatures(
+        'academic',
+        ids=[3, 5, 8, 13, 21],
+        difficulties=['easy', 'medium', 'hard', 'medium', 'easy'],
+        question_types=['theory', 'coding', 'theory', 'fill_blank', 'practical'],
+        knowledge_point_ids=[1, 2, 3, MISSING_ID, 1],
+        estimated_times=[5, 10, 30, 10, 2]
+    )
+
+
+def test_encode_and_lookup():
+    """取值编码为词表和编码数组；题目id映射到行号时忽略不存在的id"""
+    vocab, codes = encode_values(['b', None, 'b', 'a'])
+    assert vocab == ['b', None, 'a']
+    assert codes.tolist() == [0, 1, 0, 2]
+
+    features = build_features()
+    assert len(features) == 5
+    assert features.positions_of([21, 4, 3, 100]).tolist() == [4, 0]
+    assert features.mask_of([5, 13]).tolist() == [False, True, False, True, False]
+    assert features.type_mask(['theory', 'unknown']).tolist() == [True, False, True, False, False]
+    assert features.type_code('unknown') == -1
+
+
+def test_load_only_reads_mode_columns():
+    """从数据库加载时只包含该模式的题目，预计用时为空时取默认值"""
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        knowledge_point = KnowledgePoint(name='栈', category='数据结构')
+        db.session.add(knowledge_point)
+        db.session.flush()
+        db.session.add_all([
+            Question(title='题目1', content='内容', question_type='theory', difficulty='easy',
+                     knowledge_point_id=knowledge_point.id, estimated_time=15, question_bank_mode='academic'),
+            Question(title='题目2', content='内容', question_type='coding', difficulty='hard',
+                     knowledge_point_id=knowledge_point.id, estimated_time=None, question_bank_mode='academic'),
+            Question(title='题目3', content='内容', question_type='coding', difficulty='hard',
+                     knowledge_point_id=knowledge_point.id, question_bank_mode='interview'),
+        ])
+        db.session.commit()
+
+        features = QuestionFeatures.load('academic')
+        assert len(features) == 2
+        assert features.knowledge_point_values == [knowledge_point.id]
+        assert features.type_values == ['theory', 'coding']
+        assert [features.estimated_time_values[c] for c in features.estimated_time_codes] == \
+            [15, DEFAULT_ESTIMATED_TIME]
+
+
+def test_vectorized_scores_match_per_question_rules():
+    """向量化打分与逐题调用打分规则的加权和一致，并按分数降序返回"""
+    engine = RecommendationEngine()
+    features = build_features()
+    profile = {
+        'preferred_difficulty': 'medium',
+        'avg_accuracy': 0.85,
+        'preferred_types': ['coding', 'theory'],
+        'learning_pattern': {'preferred_type': 'theory'},
+        'weak_knowledge_points': [2],
+        'strong_knowledge_points': [1],
+        'avg_time_per_question': 600,
+        'recent_mistakes': []
+    }
+    candidates = np.array([0, 1, 2, 3, 4])
+    weights = engine.weights
+
+    expected = []
+    for row in candidates:
+        difficulty = features.difficulty_values[features.difficulty_codes[row]]
+        question_type = features.type_values[features.type_codes[row]]
+        knowledge_point_id = features.knowledge_point_values[features.knowledge_point_codes[row]]
+        estimated_time = features.estimated_time_values[features.estimated_time_codes[row]]
+        knowledge_score = 1.0 if knowledge_point_id == 2 else 0.3 if knowledge_point_id == 1 else 0.6
+        expected.append(
+            engine._calculate_difficulty_score(profile, difficulty) * weights['difficulty_weight']
+            + engine._calculate_type_score(profile, question_type) * weights['type_weight']
+            + knowledge_score * weights['knowledge_weight']
+            + engine._calculate_time_score(profile, estimated_time) * weights['time_weight']
+        )
+    expected = np.array(expected)
+
+    ranked, scores = engine.score_questions(profile, features, candidates)
+
+    assert np.allclose(scores, np.sort(expected)[::-1])
+    assert np.allclose(expected[ranked], scores)
+    assert ranked[0] == 1  # 中等难度、偏好的编程题、薄弱知识点
+
+
+def test_feature_cache_follows_bank_version():
+    """题库不变时复用特征矩阵，新增题目后重新加载"""
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        knowledge_point = KnowledgePoint(name='栈', category='数据结构')
+        db.session.add(knowledge_point)
+        db.session.flush()
+        db.session.add(Question(title='题目1', content='内容', question_type='theory', difficulty='easy',
+                                knowledge_point_id=knowledge_point.id))
+        db.session.commit()
+
+        engine = RecommendationEngine()
+        features = engine.get_question_features('academic')
+        assert engine.get_question_features('academic') is features
+
+        db.session.add(Question(title='题目2', content='内容', question_type='theory', difficulty='easy',
+                                knowledge_point_id=knowledge_point.id))
+        db.session.commit()
+        assert len(engine.get_question_features('academic')) == 2
+
+
+if __name__ == "__main__":
+    test_encode_and_lookup()
+    test_load_only_reads_mode_columns()
+    test_vectorized_scores_match_per_question_rules()
+    test_feature_cache_follows_bank_version()
+    print("🎉 题库特征矩阵测试通过！")
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+测试错题复习调度（SM-2）的状态更新
+"""
+
+from datetime import datetime, timedelta
+
+import numpy as np
+from flask import Flask
+
+from models import db, User, KnowledgePoint, Question, WrongQuestion
+from review_scheduler import sm2_update, next_review_dates, apply_review, due_query, reschedule_all
+
+PARAMS = {
+    'initial_ease': 2.5,
+    'min_ease': 1.3,
+    'first_interval_days': 1.0,
+    'second_interval_days': 6.0,
+    'failure_interval_days': 1.0,
+    'interval_modifier': 1.0,
+    'max_interval_days': 365.0
+}
+
+
+def test_first_reviews_use_fixed_intervals():
+    """从未复习过（ease 为 NaN）的错题按 initial_ease 计算，前两次使用固定间隔"""
+    ease, interval, repetitions = sm2_update(np.nan, 0.0, 0, 5, PARAMS)
+    assert float(ease) == 2.6
+    assert float(interval) == 1.0
+    assert int(repetitions) == 1
+
+    ease, interval, repetitions = sm2_update(ease, interval, repetitions, 4, PARAMS)
+    assert float(interval) == 6.0
+    assert int(repetitions) == 2
+    assert np.isclose(float(ease), 2.6)
+
+
+def test_later_reviews_grow_by_ease():
+    """第三次起间隔为 上次间隔 × 难易度因子（使用更新前的因子）"""
+    ease, interval, repetitions = sm2_update(2.5, 6.0, 2, 4, PARAMS)
+    assert np.isclose(float(interval), 15.0)
+    assert int(repetitions) == 3
+
+
+def test_failed_review_resets_schedule():
+    """掌握程度低于3时连续掌握次数清零，间隔回到 failure_interval_days，难易度因子不低于 min_ease"""
+    ease, interval, repetitions = sm2_update(1.4, 30.0, 5, 1, PARAMS)
+    assert int(repetitions) == 0
+    assert float(interval) == 1.0
+    assert float(ease) == 1.3
+
+
+def test_vectorized_matches_scalar():
+    """数组输入与逐个标量计算的结果一致"""
+    ease = np.array([np.nan, 2.5, 1.8, 2.2])
+    interval = np.array([0.0, 6.0, 10.0, 1.0])
+    repetitions = np.array([0, 2, 4, 1])
+    quality = np.array([3, 5, 2, 4])
+
+    batch = sm2_update(ease, interval, repetitions, quality, PARAMS)
+    for i in range(len(ease)):
+        single = sm2_update(ease[i], interval[i], repetitions[i], quality[i], PARAMS)
+        for batch_values, single_value in zip(batch, single):
+            assert np.isclose(batch_values[i], single_value)
+
+
+def test_next_review_date_is_capped():
+    """下次复习时间的间隔不超过 max_interval_days"""
+    reviewed_at = np.datetime64('2024-01-01T08:00:00', 'us')
+    assert next_review_dates(reviewed_at, 1.5, PARAMS) == np.datetime64('2024-01-02T20:00:00', 'us')
+    assert next_review_dates(reviewed_at, 1000.0, PARAMS) == reviewed_at + np.timedelta64(365, 'D')
+
+
+def test_due_queue_uses_utc_and_live_count():
+    """新错题按UTC时间立即到期；复习后按UTC时间排到以后，到期数立即减少"""
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        user = User(username='tester', email='tester@example.com')
+        knowledge_point = KnowledgePoint(name='栈', category='数据结构')
+        db.session.add_all([user, knowledge_point])
+        db.session.flush()
+        questions = [Question(title=f'题目{i}', content='内容', question_type='theory', difficulty='easy',
+                              knowledge_point_id=knowledge_point.id) for i in range(2)]
+        db.session.add_all(questions)
+        db.session.flush()
+        wrong_questions = [WrongQuestion(user_id=user.id, question_id=question.id, question_bank_mode='academic')
+                           for question in questions]
+        db.session.add_all(wrong_questions)
+        db.session.commit()
+
+        assert abs(wrong_questions[0].next_review_date - datetime.utcnow()) < timedelta(minutes=1)
+        assert due_query(user.id, 'academic').count() == 2
+        assert due_query(user.id, 'interview').count() == 0
+
+        before = datetime.utcnow()
+        apply_review(wrong_questions[0], 5)
+        db.session.commit()
+        assert before <= wrong_questions[0].last_review_date <= datetime.utcnow()
+        assert due_query(user.id, 'academic').count() == 1
+        assert due_query(user.id, 'academic', now=before + timedelta(days=2)).count() == 2
+
+
+def test_reschedule_all_updates_changed_rows():
+    """修改参数后按保存的状态重新计算复习过的错题，没有变化和从未复习过的错题不更新"""
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        user = User(username='tester', email='tester@example.com')
+        knowledge_point = KnowledgePoint(name='栈', category='数据结构')
+        db.session.add_all([user, knowledge_point])
+        db.session.flush()
+        question = Question(title='题目', content='内容', question_type='theory', difficulty='easy',
+                            knowledge_point_id=knowledge_point.id)
+        db.session.add(question)
+        db.session.flush()
+        reviewed_at = datetime(2024, 1, 1, 8, 0)
+        wrong_questions = [WrongQuestion(user_id=user.id, question_id=question.id, question_bank_mode='academic')
+                           for _ in range(5)]
+        db.session.add_all(wrong_questions)
+        db.session.flush()
+        for wrong_question in wrong_questions[:4]:
+            apply_review(wrong_question, 5, reviewed_at)
+        wrong_questions[3].ease_factor = 1.1  # 低于 min_ease
+        never_reviewed = wrong_questions[4].next_review_date
+        db.session.commit()
+
+        assert reschedule_all(PARAMS, chunk_size=3) == (4, 1)
+        db.session.expire_all()
+        assert wrong_questions[3].ease_factor == PARAMS['min_ease']
+
+        params = dict(PARAMS, interval_modifier=2.0)
+        assert reschedule_all(params, chunk_size=3) == (4, 4)
+        db.session.expire_all()
+        assert [wq.next_review_date for wq in wrong_questions[:4]] == [reviewed_at + timedelta(days=2)] * 4
+        assert wrong_questions[4].next_review_date == never_reviewed
+        assert reschedule_all(params) == (4, 0)
+
+
+if __name__ == "__main__":
+    test_first_reviews_use_fixed_intervals()
+    test_later_reviews_grow_by_ease()
+    test_failed_review_resets_schedule()
+    test_vectorized_matches_scalar()
+    test_next_review_date_is_capped()
+    test_due_queue_uses_utc_and_live_count()
+    test_reschedule_all_updates_changed_rows()
+    print("🎉 复习调度测试通过！")
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+测试列表接口的序列化和预加载
+"""
+
+from flask import Flask
+from sqlalchemy import event, inspect
+
+from models import db, User, KnowledgePoint, Question, WrongQuestion
+from serializers import (
+    FULL, LIGHT, question_load_options, wrong_question_load_options, serialize_question, serialize_wrong_question
+)
+
+
+def create_app():
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    db.init_app(app)
+    return app
+
+
+def seed():
+    user = User(username='tester', email='tester@example.com')
+    knowledge_points = [KnowledgePoint(name=f'知识点{i}', category='算法') for i in range(3)]
+    db.session.add_all([user] + knowledge_points)
+    db.session.flush()
+    questions = [
+        Question(title=f'题目{i}', content='内容', question_type='coding', difficulty='easy',
+                 knowledge_point_id=knowledge_points[i % 3].id, correct_answer='答案', options='["A", "B"]',
+                 test_cases='[{"input": "1", "output": "1"}]')
+        for i in range(6)
+    ]
+    db.session.add_all(questions)
+    db.session.flush()
+    db.session.add_all([WrongQuestion(user_id=user.id, question_id=question.id, wrong_answer='错误答案',
+                                      question_bank_mode='academic') for question in questions])
+    db.session.commit()
+    user_id = user.id
+    db.session.expunge_all()
+    return user_id
+
+
+def count_queries():
+    statements = []
+    event.listen(db.engine, 'before_cursor_execute', lambda *args: statements.append(args[2]))
+    return statements
+
+
+def test_light_and_full_fields():
+    """light 字段集只读取 LIGHT_FIELDS 对应的列；full 字段集与 to_dict() 一致"""
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        seed()
+
+        question = Question.query.options(*question_load_options(LIGHT)).first()
+        light = serialize_question(question, LIGHT)
+        assert set(light) == set(Question.LIGHT_FIELDS) | {'knowledge_point'}
+        assert {'correct_answer', 'options', 'test_cases'} <= inspect(question).unloaded
+
+        question = Question.query.options(*question_load_options(FULL)).first()
+        full = serialize_question(question, FULL)
+        assert full == question.to_dict()
+        assert full['options'] == ['A', 'B'] and full['test_cases'][0]['output'] == '1'
+        assert full['knowledge_point']['name'] == '知识点0'
+
+
+def test_wrong_questions_serialized_without_lazy_loads():
+    """错题列表预加载题目和知识点后，序列化过程中不再查询数据库"""
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        user_id = seed()
+
+        statements = count_queries()
+        wrong_questions = WrongQuestion.query.options(*wrong_question_load_options(LIGHT))\
+                                             .filter_by(user_id=user_id).all()
+        loaded = len(statements)
+        result = [serialize_wrong_question(wq, LIGHT) for wq in wrong_questions]
+
+        assert len(statements) == loaded
+        assert loaded <= 2
+        assert len(result) == 6
+        assert result[0]['wrong_answer'] == '错误答案' and 'learning_record_id' in result[0]
+        assert set(result[0]['question']) == set(Question.LIGHT_FIELDS) | {'knowledge_point'}
+
+
+if __name__ == "__main__":
+    test_light_and_full_fields()
+    test_wrong_questions_serialized_without_lazy_loads()
+    print("🎉 序列化测试通过！")
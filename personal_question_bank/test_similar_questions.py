@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+测试举一反三题目的生成去重
+"""
+
+from flask import Flask
+
+from models import db, User, KnowledgePoint, Question, WrongQuestion, SimilarQuestion
+from similar_questions import generate_for_wrong_question, load_generated
+
+
+class FakeIndexes:
+    """返回固定近邻的相似题目索引，before_return 用来模拟其它进程同时写入"""
+
+    def __init__(self, neighbors, before_return=None):
+        self._neighbors = neighbors
+        self.before_return = before_return
+        self.calls = 0
+
+    def neighbors(self, question_id, mode, limit=None, wait=False):
+        self.calls += 1
+        if self.before_return:
+            self.before_return()
+        return self._neighbors[:limit]
+
+
+def create_app():
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    db.init_app(app)
+    return app
+
+
+def seed():
+    """创建一道错题和两道同知识点的题目，返回 (错题, [近邻题目id])"""
+    user = User(username='tester', email='tester@example.com')
+    knowledge_point = KnowledgePoint(name='栈', category='数据结构')
+    db.session.add_all([user, knowledge_point])
+    db.session.flush()
+    questions = [
+        Question(title=f'栈题目{i}', content=f'栈的第{i}道题', question_type='theory', difficulty='easy',
+                 knowledge_point_id=knowledge_point.id, correct_answer='后进先出')
+        for i in range(3)
+    ]
+    db.session.add_all(questions)
+    db.session.flush()
+    wrong_question = WrongQuestion(user_id=user.id, question_id=questions[0].id, question_bank_mode='academic')
+    db.session.add(wrong_question)
+    db.session.commit()
+    return wrong_question, [(questions[1].id, 0.9), (questions[2].id, 0.8)]
+
+
+def test_generated_once_with_slots():
+    """生成的题目按顺序编号，再次生成直接返回已有结果"""
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        wrong_question, neighbors = seed()
+        indexes = FakeIndexes(neighbors)
+
+        first = generate_for_wrong_question(wrong_question, indexes)
+        second = generate_for_wrong_question(wrong_question, indexes)
+
+        assert [sq.slot for sq in first] == [0, 1]
+        assert [sq.id for sq in second] == [sq.id for sq in first]
+        assert indexes.calls == 1
+        assert SimilarQuestion.query.count() == 2
+
+
+def test_concurrent_generation_keeps_first_writer():
+    """生成过程中其它进程先写入时，唯一索引拦下本次写入，返回先写入的结果（标题和内容不同也不会重复）"""
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        wrong_question, neighbors = seed()
+
+        def other_process_writes():
+            db.session.add(SimilarQuestion(
+                original_question_id=wrong_question.question_id, wrong_question_id=wrong_question.id, slot=0,
+                title='另一个进程生成的题目', content='内容不同', question_type='theory', difficulty='easy'
+            ))
+            db.session.commit()
+
+        result = generate_for_wrong_question(wrong_question, FakeIndexes(neighbors, other_process_writes))
+
+        assert [sq.title for sq in result] == ['另一个进程生成的题目']
+        assert [sq.title for sq in load_generated(wrong_question.question_id, wrong_question.id)] == \
+            ['另一个进程生成的题目']
+
+
+if __name__ == "__main__":
+    test_generated_once_with_slots()
+    test_concurrent_generation_keeps_first_writer()
+    print("🎉 举一反三生成去重测试通过！")
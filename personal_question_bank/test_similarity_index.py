@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+测试相似题目索引的构建、保存和加载
+"""
+
+import os
+import tempfile
+
+from similarity_index import SimilarityIndex
+
+ROWS = [
+    (1, '栈是后进先出的数据结构，支持push和pop操作'),
+    (2, '队列是先进先出的数据结构，支持入队和出队操作'),
+    (3, '用两个栈实现一个队列，说明push和pop的过程'),
+    (4, '哈希表通过哈希函数把键映射到数组下标'),
+    (5, '二叉搜索树的中序遍历结果是有序的'),
+]
+
+
+def test_saved_index_loads_back():
+    """保存的索引（npz）加载后近邻表、版本号一致，并且可以继续增量更新"""
+    index = SimilarityIndex('academic', k=3)
+    index.rebuild(ROWS, version=7)
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'similarity_index_academic.npz')
+        index.save(path)
+        loaded = SimilarityIndex.load(path)
+
+    assert loaded is not None
+    assert loaded.mode == 'academic' and loaded.k == 3 and loaded.version == 7
+    assert loaded.ids.tolist() == index.ids.tolist()
+    assert loaded.digests == index.digests
+    assert (loaded.matrix != index.matrix).nnz == 0
+    for question_id, _ in ROWS:
+        assert loaded.neighbors(question_id) == index.neighbors(question_id)
+
+    # 加载的词表和IDF可以直接向量化新题目（增量更新不需要重新拟合）
+    loaded.update(ROWS + [(6, '用队列实现栈，比较push和pop的复杂度')], version=8)
+    assert loaded.version == 8
+    assert 6 in loaded.ids.tolist()
+    assert loaded.neighbors(6)
+
+
+def test_missing_or_invalid_file_returns_none():
+    with tempfile.TemporaryDirectory() as directory:
+        assert SimilarityIndex.load(os.path.join(directory, 'missing.npz')) is None
+
+        broken = os.path.join(directory, 'broken.npz')
+        with open(broken, 'wb') as f:
+            f.write(b'not an npz file')
+        assert SimilarityIndex.load(broken) is None
+
+
+if __name__ == "__main__":
+    test_saved_index_loads_back()
+    test_missing_or_invalid_file_returns_none()
+    print("🎉 相似题目索引测试通过！")
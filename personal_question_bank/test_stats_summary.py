@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+测试用户学习统计汇总的增量维护和重建
+"""
+
+from datetime import datetime
+
+from flask import Flask
+
+from models import db, User, KnowledgePoint, Question, LearningRecord, UserKnowledgeStats, UserStatsSummary
+from stats_summary import get_or_create_summary, rebuild_stats_summaries
+
+
+def create_app():
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    db.init_app(app)
+    return app
+
+
+def seed():
+    """一个用户在两个知识点上答了3道题（2对1错），掌握程度分别为0.8和0.2"""
+    user = User(username='tester', email='tester@example.com')
+    knowledge_points = [KnowledgePoint(name=f'知识点{i}', category='算法') for i in range(3)]
+    db.session.add_all([user] + knowledge_points)
+    db.session.flush()
+    questions = [Question(title=f'题目{i}', content='内容', question_type='theory', difficulty='easy',
+                          knowledge_point_id=knowledge_points[i].id) for i in range(3)]
+    db.session.add_all(questions)
+    db.session.flush()
+
+    now = datetime.utcnow()
+    db.session.add_all([
+        LearningRecord(user_id=user.id, question_id=questions[index].id, is_correct=is_correct, time_spent=30,
+                       started_at=now, completed_at=now)
+        for index, is_correct in [(0, True), (0, True), (1, False)]
+    ])
+    db.session.add_all([
+        UserKnowledgeStats(user_id=user.id, knowledge_point_id=knowledge_points[0].id, mastery_level=0.8),
+        UserKnowledgeStats(user_id=user.id, knowledge_point_id=knowledge_points[1].id, mastery_level=0.2),
+    ])
+    db.session.commit()
+    return user.id, questions, knowledge_points
+
+
+def summary_values(summary):
+    values = summary.to_dict()
+    values.pop('updated_at')
+    values['mastery_sum'] = round(values['mastery_sum'], 6)
+    return values
+
+
+def test_summary_built_from_history():
+    """首次读取时从学习记录和知识点统计生成汇总行"""
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        user_id, _, _ = seed()
+
+        summary = get_or_create_summary(user_id)
+        db.session.commit()
+
+        assert (summary.total_questions, summary.correct_answers, summary.total_time_spent) == (3, 2, 90)
+        assert (summary.mastered_knowledge_points, summary.learning_knowledge_points,
+                summary.weak_knowledge_points) == (1, 0, 1)
+        assert abs(summary.mastery_sum - 1.0) < 1e-9
+        assert abs(summary.accuracy_rate - 2 / 3) < 1e-9
+        assert get_or_create_summary(user_id).id == summary.id
+
+
+def test_incremental_updates_match_rebuild():
+    """答题时增量累加的结果与从明细重建的结果一致（包括新建知识点统计的情况）"""
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        user_id, questions, knowledge_points = seed()
+        summary = get_or_create_summary(user_id)
+        db.session.commit()
+        now = datetime.utcnow()
+
+        # 已有知识点：掌握程度从 0.2（薄弱）升到 0.5（学习中）
+        stats = UserKnowledgeStats.query.filter_by(user_id=user_id, knowledge_point_id=knowledge_points[1].id).one()
+        db.session.add(LearningRecord(user_id=user_id, question_id=questions[1].id, is_correct=True, time_spent=40,
+                                      started_at=now, completed_at=now))
+        stats.mastery_level = 0.5
+        summary.record_answer(True, 40, 0.2, 0.5)
+
+        # 新知识点：第一次作答
+        db.session.add(LearningRecord(user_id=user_id, question_id=questions[2].id, is_correct=False, time_spent=10,
+                                      started_at=now, completed_at=now))
+        db.session.add(UserKnowledgeStats(user_id=user_id, knowledge_point_id=knowledge_points[2].id,
+                                          mastery_level=0.1))
+        summary.record_answer(False, 10, None, 0.1)
+        db.session.commit()
+
+        incremental = summary_values(summary)
+        assert rebuild_stats_summaries() == 1
+        rebuilt = summary_values(UserStatsSummary.query.filter_by(user_id=user_id).one())
+
+        assert incremental == rebuilt
+        assert (rebuilt['total_questions'], rebuilt['correct_answers'], rebuilt['total_time_spent']) == (5, 3, 140)
+        assert (rebuilt['mastered_knowledge_points'], rebuilt['learning_knowledge_points'],
+                rebuilt['weak_knowledge_points']) == (1, 1, 1)
+
+
+def test_rebuild_removes_users_without_data():
+    """学习记录被清空的用户，重建时删除其汇总行"""
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        user_id, _, _ = seed()
+        get_or_create_summary(user_id)
+        db.session.commit()
+
+        LearningRecord.query.delete()
+        UserKnowledgeStats.query.delete()
+        db.session.commit()
+
+        assert rebuild_stats_summaries() == 0
+        assert UserStatsSummary.query.count() == 0
+
+
+if __name__ == "__main__":
+    test_summary_built_from_history()
+    test_incremental_updates_match_rebuild()
+    test_rebuild_removes_users_without_data()
+    print("🎉 用户学习统计汇总测试通过！")
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+测试同义词倒排表和模糊关键词索引
+"""
+
+import difflib
+import json
+import os
+import random
+import tempfile
+
+from theory_grader import FuzzyKeywordIndex, TheoryQuestionGrader, load_synonyms, FUZZY_MATCH_THRESHOLD
+
+
+def make_grader():
+    """关键词按空格切分的评分器，便于直接构造关键词列表"""
+    grader = TheoryQuestionGrader()
+    grader._extract_keywords = lambda text: text.split()
+    return grader
+
+
+def brute_force_match(synonyms, user_keywords, reference_keywords):
+    """逐个扫描同义词词典、逐对计算相似度的原始匹配方法"""
+    def expand(keyword):
+        forms = set()
+        for standard, words in synonyms.items():
+            if keyword == standard or keyword in words:
+                forms.add(standard)
+                forms.update(words)
+        return forms
+
+    user_normalized = set(user_keywords)
+    for keyword in user_keywords:
+        user_normalized |= expand(keyword)
+
+    matched, missing = [], []
+    for keyword in reference_keywords:
+        if keyword in user_normalized or not expand(keyword).isdisjoint(user_normalized) or \
+                any(difflib.SequenceMatcher(None, keyword, other).ratio() > FUZZY_MATCH_THRESHOLD
+                    for other in user_keywords):
+            matched.append(keyword)
+        else:
+            missing.append(keyword)
+    return matched, missing
+
+
+def test_matching_same_as_brute_force():
+    """倒排表 + 模糊索引的匹配结果与原始方法完全相同（包括共享写法的同义词组）"""
+    grader = make_grader()
+    grader.add_synonyms({'循环': ['loop', '遍历'], 'hash': ['哈希表', '散列']})
+    vocabulary = [form for standard, words in grader.synonyms.items() for form in [standard] + words
+                  if ' ' not in form and '-' not in form]
+    vocabulary += ['recursive', 'sorted', '时间复杂', '哈希表结构', '链表节点', '队列操作', 'iterations']
+
+    rng = random.Random(0)
+    for _ in range(300):
+        user_keywords = rng.sample(vocabulary, rng.randint(0, 6))
+        reference_keywords = rng.sample(vocabulary, rng.randint(1, 6))
+        reference = grader._build_reference(' '.join(reference_keywords))
+        assert grader._match_keywords(user_keywords, reference) == \
+            brute_force_match(grader.synonyms, user_keywords, reference_keywords)
+
+
+def test_fuzzy_index_same_as_pairwise_ratio():
+    """模糊索引只检查候选关键词，结论与逐对计算 ratio() 相同"""
+    rng = random.Random(1)
+    alphabet = 'abcdef栈队列'
+    for _ in range(500):
+        words = [''.join(rng.choices(alphabet, k=rng.randint(2, 8))) for _ in range(rng.randint(0, 8))]
+        target = ''.join(rng.choices(alphabet, k=rng.randint(2, 8)))
+        expected = any(difflib.SequenceMatcher(None, target, word).ratio() > FUZZY_MATCH_THRESHOLD
+                       for word in words)
+        assert FuzzyKeywordIndex(words).has_match(target) == expected
+
+
+def test_added_synonyms_link_groups():
+    """新增的同义词与已有组共享写法时两组等价，已缓存的标准答案预处理结果失效"""
+    grader = make_grader()
+    reference = grader.get_reference('栈 后进先出')
+    assert grader._match_keywords(['栈结构'], reference) == ([], ['栈', '后进先出'])
+
+    grader.add_synonyms({'堆栈': ['栈结构']})
+    assert grader.reference_cache_size() == 0
+    reference = grader.get_reference('栈 后进先出')
+    assert grader._match_keywords(['栈结构'], reference) == (['栈'], ['后进先出'])
+
+
+def test_load_synonyms_file():
+    """外部词典按小写读入"""
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'synonyms.json')
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'HashMap': ['Dict', '字典']}, f, ensure_ascii=False)
+        assert load_synonyms(path) == {'hashmap': ['dict', '字典']}
+
+
+if __name__ == "__main__":
+    test_matching_same_as_brute_force()
+    test_fuzzy_index_same_as_pairwise_ratio()
+    test_added_synonyms_link_groups()
+    test_load_synonyms_file()
+    print("🎉 同义词和模糊匹配测试通过！")
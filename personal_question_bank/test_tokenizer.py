@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+测试分词器初始化和领域词典
+"""
+
+import os
+import tempfile
+
+import jieba
+from flask import Flask
+
+from models import db, KnowledgePoint
+from tokenizer import prepare_tokenizer, sorted_domain_words, USER_DICT_NAME
+
+
+def test_domain_words_filtered():
+    """只保留含中文、不含空白的多字词，转小写后去重排序"""
+    words = sorted_domain_words(['哈希表', ' 哈希表 ', '栈', 'stack', 'hash table', 'B树', '二叉 树', '二叉树'])
+    assert words == ['b树', '二叉树', '哈希表']
+
+
+def test_prepare_writes_user_dict_and_keeps_terms_whole():
+    """领域词典包含知识点名称和同义词表中的词，加载后领域词不再被切开"""
+    with tempfile.TemporaryDirectory() as instance_path:
+        app = Flask(__name__, instance_path=instance_path)
+        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+        db.init_app(app)
+        with app.app_context():
+            db.create_all()
+            db.session.add(KnowledgePoint(name='跳表索引层', category='数据结构'))
+            db.session.commit()
+
+            count = prepare_tokenizer()
+
+            with open(os.path.join(instance_path, USER_DICT_NAME), encoding='utf-8') as f:
+                entries = dict(line.split() for line in f)
+            assert len(entries) == count
+            assert {'跳表索引层', '哈希表', '时间复杂度'} <= set(entries)
+            assert 'array' not in entries and '栈' not in entries
+            assert all(int(freq) > 0 for freq in entries.values())
+
+            assert '跳表索引层' in jieba.lcut('跳表索引层的查找过程')
+            assert '时间复杂度' in jieba.lcut('分析时间复杂度')
+
+            # 再次生成时词典内容不变
+            assert prepare_tokenizer() == count
+
+
+if __name__ == "__main__":
+    test_domain_words_filtered()
+    test_prepare_writes_user_dict_and_keeps_terms_whole()
+    print("🎉 分词器初始化测试通过！")
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+测试用户画像增量缓存
+"""
+
+from datetime import datetime, timedelta
+
+from flask import Flask
+
+from models import db, User, KnowledgePoint, Question, LearningRecord
+from user_profile_store import (
+    AnswerEvent, UserProfileState, UserProfileStore, load_profile_state, PROFILE_WINDOW_DAYS
+)
+
+
+def make_event(days_ago, knowledge_point_id=1, question_type='theory', is_correct=True, time_spent=60,
+               mode='academic', question_id=1):
+    return AnswerEvent(datetime.utcnow() - timedelta(days=days_ago), question_id, knowledge_point_id, question_type,
+                       is_correct, time_spent, mode)
+
+
+class CountingLoader:
+    """记录加载次数的画像加载函数，during_load 用来模拟加载期间提交的答题"""
+
+    def __init__(self, during_load=None):
+        self.calls = 0
+        self.during_load = during_load
+
+    def __call__(self, user_id):
+        self.calls += 1
+        if self.during_load:
+            self.during_load()
+        return UserProfileState([make_event(1)], [make_event(1)])
+
+
+def test_state_adds_and_expires_counts():
+    """新答题累加计数；超出30天窗口的记录移出时扣减计数，知识点和题型计数归零时删除"""
+    state = UserProfileState([make_event(40, knowledge_point_id=2, question_type='coding', mode='interview'),
+                              make_event(5)], [])
+    state.add(make_event(0, is_correct=False, time_spent=30))
+
+    snapshot = state.snapshot()
+    assert (snapshot['total'], snapshot['correct'], snapshot['time_spent']) == (3, 2, 150)
+    assert snapshot['interview_count'] == 1
+    assert snapshot['latest'][0].time_spent == 30
+
+    state.expire(datetime.utcnow() - timedelta(days=PROFILE_WINDOW_DAYS))
+    snapshot = state.snapshot()
+    assert (snapshot['total'], snapshot['correct'], snapshot['time_spent']) == (2, 1, 90)
+    assert snapshot['kp_stats'] == {1: {'total': 2, 'correct': 1, 'time': 90}}
+    assert snapshot['type_counts'] == {'theory': 2}
+    assert snapshot['interview_count'] == 0
+
+
+def test_store_updates_cached_users_only():
+    """已缓存的用户由答题增量更新，不重新加载；未缓存的用户在读取时加载"""
+    loader = CountingLoader()
+    store = UserProfileStore(ttl=3600, loader=loader)
+
+    store.record_answer(1, make_event(0))
+    assert loader.calls == 0
+
+    assert store.get(1)['total'] == 1
+    store.record_answer(1, make_event(0, is_correct=False))
+    snapshot = store.get(1)
+    assert (snapshot['total'], snapshot['correct']) == (2, 1)
+    assert loader.calls == 1
+
+    store.invalidate(1)
+    assert store.get(1)['total'] == 1
+    assert loader.calls == 2
+
+
+def test_store_reloads_after_ttl():
+    """缓存条目过期后从数据库重建"""
+    loader = CountingLoader()
+    store = UserProfileStore(ttl=0, loader=loader)
+    store.get(1)
+    store._states[1].loaded_at -= 1
+    store.get(1)
+    assert loader.calls == 2
+
+
+def test_answer_during_load_is_not_lost():
+    """加载期间提交了答题时不缓存加载结果，避免之后的读取丢失这次答题"""
+    store = UserProfileStore(ttl=3600)
+    store.loader = CountingLoader(during_load=lambda: store.record_answer(1, make_event(0)))
+
+    store.get(1)
+    assert 1 not in store._states
+
+    store.loader.during_load = None
+    store.get(1)
+    assert 1 in store._states
+
+
+def test_load_profile_state_from_database():
+    """从数据库加载：窗口只含30天内的记录，最近记录不受窗口限制、最新的在前"""
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        user = User(username='tester', email='tester@example.com')
+        knowledge_point = KnowledgePoint(name='栈', category='数据结构')
+        db.session.add_all([user, knowledge_point])
+        db.session.flush()
+        question = Question(title='题目', content='内容', question_type='coding', difficulty='easy',
+                            knowledge_point_id=knowledge_point.id, question_bank_mode='interview')
+        db.session.add(question)
+        db.session.flush()
+        now = datetime.utcnow()
+        db.session.add_all([
+            LearningRecord(user_id=user.id, question_id=question.id, is_correct=is_correct, time_spent=100,
+                           started_at=now - timedelta(days=days_ago), completed_at=now - timedelta(days=days_ago))
+            for days_ago, is_correct in [(40, False), (3, True)]
+        ])
+        db.session.commit()
+
+        snapshot = load_profile_state(user.id).snapshot()
+        assert (snapshot['total'], snapshot['correct'], snapshot['time_spent']) == (1, 1, 100)
+        assert snapshot['kp_stats'] == {knowledge_point.id: {'total': 1, 'correct': 1, 'time': 100}}
+        assert snapshot['type_counts'] == {'coding': 1} and snapshot['interview_count'] == 1
+        assert [event.is_correct for event in snapshot['latest']] == [True, False]
+
+
+if __name__ == "__main__":
+    test_state_adds_and_expires_counts()
+    test_store_updates_cached_users_only()
+    test_store_reloads_after_ttl()
+    test_answer_during_load_is_not_lost()
+    test_load_profile_state_from_database()
+    print("🎉 用户画像缓存测试通过！")
@@ -2,14 +2,35 @@
 """
 理论题和简答题智能评分系统
 支持关键词匹配、部分评分、详细反馈和鼓励性评语
+
+同义词词典除了内置的常用词外，还可以通过环境变量 THEORY_SYNONYMS_FILE 指定一个JSON文件扩充，
+格式与内置词典相同：{"标准词": ["同义词1", "同义词2"], ...}。词典在加载时编译成“写法 -> 同义词组”的倒排表，
+评分时每个关键词只查一次表，耗时与词典大小无关。
 """
 
+import os
 import re
+import json
+import copy
+import zlib
 import jieba
+import logging
 import difflib
-from typing import List, Dict, Tuple
+import hashlib
+import threading
+from typing import List, Dict, Tuple, Set, Iterable, Optional, Sequence
 from dataclasses import dataclass
-from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from collections import defaultdict, OrderedDict
+
+REFERENCE_CACHE_SIZE = 4096  # 缓存的标准答案预处理结果数量
+FUZZY_MATCH_THRESHOLD = 0.8  # 关键词模糊匹配的相似度阈值
+BULK_CHUNK_SIZE = 200  # 批量评分时每个子进程任务包含的答案数量
+MAX_ANSWER_CHARS = 5000  # 用户答案清理后超过该长度的部分不参与评分
+SIMILARITY_MAX_CHARS = 1000  # 序列相似度只比较两段文本的前 SIMILARITY_MAX_CHARS 个字符
+GRADING_CACHE_SIZE = 20000  # 每种题型缓存的评分结果数量
+
+logger = logging.getLogger(__name__)
 
 @dataclass
 class GradingResult:
@@ -22,10 +43,114 @@ class GradingResult:
     incorrect_parts: List[str]  # 错误的部分
     encouragement: str  # 鼓励性评语
 
+@dataclass
+class ReferenceAnswer:
+    """标准答案的预处理结果，只和标准答案有关，可以在多次评分之间复用"""
+    clean_text: str  # 清理后的标准答案
+    keywords: List[str]  # 关键词（按出现顺序，可能重复）
+    keyword_set: Set[str]
+    synonym_groups: Dict[str, frozenset]  # 关键词 -> 与它等价的同义词组编号（没有同义词的关键词不在其中）
+
+def load_synonyms(path: str) -> Dict[str, List[str]]:
+    """读取JSON格式的同义词词典 {"标准词": ["同义词", ...]}"""
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    return {str(standard).lower(): [str(word).lower() for word in words] for standard, words in data.items()}
+
+class FuzzyKeywordIndex:
+    """
+    用户关键词的字符倒排索引，用于模糊匹配
+    
+    SequenceMatcher 的相似度为 2*M/(两词长度之和)，M 不超过两词的公共字符数。
+    因此只需要检查与目标词有公共字符、长度相近的关键词，并先用 quick_ratio 上界过滤，
+    结果与逐对计算 ratio() 完全相同。
+    """
+    
+    def __init__(self, words: Iterable[str], threshold: float = FUZZY_MATCH_THRESHOLD):
+        self.threshold = threshold
+        self.words = list(dict.fromkeys(words))
+        self.by_char = defaultdict(list)
+        for index, word in enumerate(self.words):
+            for char in set(word):
+                self.by_char[char].append(index)
+    
+    def has_match(self, word: str) -> bool:
+        """是否有与 word 相似度超过阈值的关键词"""
+        candidates = set()
+        for char in set(word):
+            candidates.update(self.by_char.get(char, ()))
+        
+        for index in candidates:
+            other = self.words[index]
+            total = len(word) + len(other)
+            if 2.0 * min(len(word), len(other)) / total <= self.threshold:
+                continue
+            matcher = difflib.SequenceMatcher(None, word, other)
+            if matcher.quick_ratio() > self.threshold and matcher.ratio() > self.threshold:
+                return True
+        return False
+
+def _digest(text: str) -> str:
+    return hashlib.md5((text or '').encode('utf-8')).hexdigest()
+
+class GradingCache:
+    """
+    评分结果的LRU缓存，记录命中和未命中次数
+    
+    键由调用方给出（题目id、标准答案摘要、规范化后的用户答案摘要），
+    返回的是缓存结果的副本，调用方修改返回值不会影响缓存。
+    """
+    
+    def __init__(self, capacity: int = GRADING_CACHE_SIZE):
+        self.capacity = capacity
+        self.hits = 0
+        self.misses = 0
+        self._results: "OrderedDict[Tuple, Dict]" = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get_or_grade(self, key: Tuple, grade) -> Dict:
+        """命中时返回缓存结果，否则调用 grade() 评分并缓存"""
+        with self._lock:
+            result = self._results.get(key)
+            if result is not None:
+                self._results.move_to_end(key)
+                self.hits += 1
+                return copy.deepcopy(result)
+            self.misses += 1
+        
+        result = grade()
+        with self._lock:
+            self._results[key] = result
+            self._results.move_to_end(key)
+            while len(self._results) > self.capacity:
+                self._results.popitem(last=False)
+        return copy.deepcopy(result)
+    
+    def clear(self) -> None:
+        with self._lock:
+            self._results.clear()
+    
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._results),
+                'capacity': self.capacity,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0
+            }
+
 class TheoryQuestionGrader:
     """理论题评分器"""
     
     def __init__(self):
+        # 标准答案预处理结果的LRU缓存，键为 (题目id, 答案摘要)
+        self._references: "OrderedDict[Tuple[Optional[int], str], ReferenceAnswer]" = OrderedDict()
+        self._reference_lock = threading.Lock()
+        # 评分结果缓存，键为 (题目id, 标准答案摘要, 规范化后的用户答案摘要)
+        self.results = GradingCache()
+        
         # 同义词词典，用于关键词匹配
         self.synonyms = {
             # 数据结构相关
@@ -61,6 +186,12 @@ class TheoryQuestionGrader:
             "慢": ["低效", "slow", "inefficient"]
         }
         
+        synonyms_file = os.getenv('THEORY_SYNONYMS_FILE')
+        if synonyms_file:
+            for standard, words in load_synonyms(synonyms_file).items():
+                self.synonyms.setdefault(standard, []).extend(words)
+        self._compile_synonyms()
+        
         # 鼓励性评语模板
         self.encouragements = {
             "excellent": [
@@ -86,7 +217,7 @@ class TheoryQuestionGrader:
         }
     
     def grade_theory_question(self, user_answer: str, correct_answer: str, 
-                            question_content: str = "") -> GradingResult:
+                            question_content: str = "", question_id: Optional[int] = None) -> GradingResult:
         """
         评分理论题
         
@@ -94,13 +225,14 @@ class TheoryQuestionGrader:
             user_answer: 用户答案
             correct_answer: 标准答案
             question_content: 题目内容（用于上下文理解）
+            question_id: 题目id（用于缓存标准答案的预处理结果）
             
         Returns:
             GradingResult: 详细的评分结果
         """
-        # 预处理答案
-        user_clean = self._clean_text(user_answer)
-        correct_clean = self._clean_text(correct_answer)
+        # 标准答案的清理和分词结果来自缓存，只需要处理用户答案
+        reference = self.get_reference(correct_answer, question_id)
+        user_clean = self.normalize_answer(user_answer)
         
         if not user_clean:
             return GradingResult(
@@ -108,31 +240,28 @@ class TheoryQuestionGrader:
                 is_correct=False,
                 feedback="回答不能为空，请提供你的理解和想法。",
                 correct_keywords=[],
-                missing_keywords=self._extract_keywords(correct_clean),
+                missing_keywords=list(reference.keywords),
                 incorrect_parts=[],
                 encouragement="别担心，开始思考和表达就是学习的第一步！"
             )
         
         # 提取关键词
         user_keywords = self._extract_keywords(user_clean)
-        correct_keywords = self._extract_keywords(correct_clean)
         
         # 匹配关键词
-        matched_keywords, missing_keywords = self._match_keywords(
-            user_keywords, correct_keywords
-        )
+        matched_keywords, missing_keywords = self._match_keywords(user_keywords, reference)
         
         # 计算基础分数
-        base_score = len(matched_keywords) / len(correct_keywords) if correct_keywords else 0
+        base_score = len(matched_keywords) / len(reference.keywords) if reference.keywords else 0
         
         # 语义相似度加分
-        similarity_score = self._calculate_similarity(user_clean, correct_clean)
+        similarity_score = self._calculate_similarity(user_clean, reference.clean_text)
         
         # 综合分数
         final_score = min(base_score * 0.7 + similarity_score * 0.3, 1.0)
         
         # 检查错误信息
-        incorrect_parts = self._find_incorrect_parts(user_clean, correct_clean)
+        incorrect_parts = self._find_incorrect_parts(user_keywords, reference)
         
         # 生成反馈
         feedback = self._generate_feedback(
@@ -140,7 +269,7 @@ class TheoryQuestionGrader:
         )
         
         # 生成鼓励性评语
-        encouragement = self._generate_encouragement(final_score)
+        encouragement = self._generate_encouragement(final_score, user_clean)
         
         return GradingResult(
             score=final_score,
@@ -152,6 +281,84 @@ class TheoryQuestionGrader:
             encouragement=encouragement
         )
     
+    def get_reference(self, correct_answer: str, question_id: Optional[int] = None) -> ReferenceAnswer:
+        """取标准答案的预处理结果；按 (题目id, 答案摘要) 缓存，答案被修改后摘要不同，自然不会命中旧结果"""
+        key = (question_id, _digest(correct_answer))
+        with self._reference_lock:
+            reference = self._references.get(key)
+            if reference is not None:
+                self._references.move_to_end(key)
+                return reference
+        
+        reference = self._build_reference(correct_answer)
+        with self._reference_lock:
+            self._references[key] = reference
+            self._references.move_to_end(key)
+            while len(self._references) > REFERENCE_CACHE_SIZE:
+                self._references.popitem(last=False)
+        return reference
+    
+    def warm_references(self, answers: Iterable[Tuple[Optional[int], str]]) -> int:
+        """预先处理一批 (题目id, 标准答案)，返回处理的数量"""
+        count = 0
+        for question_id, correct_answer in answers:
+            self.get_reference(correct_answer, question_id)
+            count += 1
+        return count
+    
+    def reference_cache_size(self) -> int:
+        """已缓存的标准答案预处理结果数量"""
+        with self._reference_lock:
+            return len(self._references)
+    
+    def add_synonyms(self, synonyms: Dict[str, List[str]]) -> None:
+        """扩充同义词词典（已缓存的标准答案预处理结果和评分结果随之失效）"""
+        for standard, words in synonyms.items():
+            self.synonyms.setdefault(standard, []).extend(words)
+        self._compile_synonyms()
+        with self._reference_lock:
+            self._references.clear()
+        self.results.clear()
+    
+    def _compile_synonyms(self) -> None:
+        """
+        把同义词词典编译成倒排表：写法 -> 所在的同义词组编号
+        
+        一个写法可能出现在多个组里。用户答案中的词会展开成它所在组的全部写法，
+        所以共享写法的两个组也视为等价，这里预先算好每个组的等价组集合。
+        """
+        form_groups = defaultdict(set)
+        for group_id, (standard, words) in enumerate(self.synonyms.items()):
+            form_groups[standard].add(group_id)
+            for word in words:
+                form_groups[word].add(group_id)
+        
+        linked_groups = [{group_id} for group_id in range(len(self.synonyms))]
+        for group_ids in form_groups.values():
+            if len(group_ids) > 1:
+                for group_id in group_ids:
+                    linked_groups[group_id].update(group_ids)
+        
+        self._form_groups = {form: frozenset(group_ids) for form, group_ids in form_groups.items()}
+        self._linked_groups = [frozenset(group_ids) for group_ids in linked_groups]
+    
+    def _build_reference(self, correct_answer: str) -> ReferenceAnswer:
+        """清理、分词标准答案，并查出每个关键词的等价同义词组"""
+        clean_text = self._clean_text(correct_answer)
+        keywords = self._extract_keywords(clean_text)
+        
+        synonym_groups = {}
+        for keyword in set(keywords):
+            group_ids = self._form_groups.get(keyword)
+            if group_ids:
+                synonym_groups[keyword] = frozenset().union(*(self._linked_groups[g] for g in group_ids))
+        
+        return ReferenceAnswer(clean_text, keywords, set(keywords), synonym_groups)
+    
+    def normalize_answer(self, user_answer: str) -> str:
+        """规范化用户答案：评分只依赖这个结果，规范化后相同的答案得分和反馈都相同"""
+        return self._clean_text(user_answer)[:MAX_ANSWER_CHARS]
+    
     def _clean_text(self, text: str) -> str:
         """清理文本"""
         if not text:
@@ -186,72 +393,56 @@ class TheoryQuestionGrader:
         return keywords
     
     def _match_keywords(self, user_keywords: List[str], 
-                       correct_keywords: List[str]) -> Tuple[List[str], List[str]]:
+                       reference: ReferenceAnswer) -> Tuple[List[str], List[str]]:
         """匹配关键词，考虑同义词"""
         matched = []
         missing = []
         
-        # 创建用户关键词的标准化版本
-        user_normalized = set()
-        for keyword in user_keywords:
-            user_normalized.add(keyword)
-            # 添加同义词
-            for standard, synonyms in self.synonyms.items():
-                if keyword in synonyms or keyword == standard:
-                    user_normalized.add(standard)
-                    user_normalized.update(synonyms)
+        # 用户关键词及其所在的同义词组（每个词查一次倒排表）
+        user_keyword_set = set(user_keywords)
+        user_groups = set()
+        for keyword in user_keyword_set:
+            user_groups.update(self._form_groups.get(keyword, ()))
+        
+        fuzzy_index = None
         
         # 检查每个正确答案的关键词
-        for correct_keyword in correct_keywords:
-            found = False
+        for correct_keyword in reference.keywords:
+            # 直接匹配或同义词匹配
+            if correct_keyword in user_keyword_set or \
+                    not reference.synonym_groups.get(correct_keyword, frozenset()).isdisjoint(user_groups):
+                matched.append(correct_keyword)
+                continue
             
-            # 直接匹配
-            if correct_keyword in user_normalized:
+            # 模糊匹配（编辑距离，80%相似度）
+            if fuzzy_index is None:
+                fuzzy_index = FuzzyKeywordIndex(user_keywords)
+            if fuzzy_index.has_match(correct_keyword):
                 matched.append(correct_keyword)
-                found = True
             else:
-                # 同义词匹配
-                for standard, synonyms in self.synonyms.items():
-                    if correct_keyword == standard or correct_keyword in synonyms:
-                        if standard in user_normalized:
-                            matched.append(correct_keyword)
-                            found = True
-                            break
-                        for synonym in synonyms:
-                            if synonym in user_normalized:
-                                matched.append(correct_keyword)
-                                found = True
-                                break
-                    if found:
-                        break
-                
-                # 模糊匹配（编辑距离）
-                if not found:
-                    for user_keyword in user_keywords:
-                        similarity = difflib.SequenceMatcher(None, correct_keyword, user_keyword).ratio()
-                        if similarity > 0.8:  # 80%相似度
-                            matched.append(correct_keyword)
-                            found = True
-                            break
-            
-            if not found:
                 missing.append(correct_keyword)
         
         return matched, missing
     
     def _calculate_similarity(self, user_text: str, correct_text: str) -> float:
-        """计算文本相似度"""
+        """
+        计算文本相似度
+        
+        SequenceMatcher 的耗时随文本长度超线性增长，这里只在两段文本的前 SIMILARITY_MAX_CHARS 个字符上
+        寻找匹配块，相似度仍按完整长度计算：2*匹配字符数/(两段文本长度之和)。
+        两段文本都不超过上限时与完整比较的结果相同；超过上限时只有前面部分的匹配被计入，
+        而此时分母很大，相似度本来就接近0，与完整比较的偏差很小（见 benchmark_grading.py）。
+        """
         if not user_text or not correct_text:
             return 0.0
         
-        # 使用difflib计算序列相似度
-        similarity = difflib.SequenceMatcher(None, user_text, correct_text).ratio()
-        return similarity
+        matcher = difflib.SequenceMatcher(None, user_text[:SIMILARITY_MAX_CHARS], correct_text[:SIMILARITY_MAX_CHARS])
+        matches = sum(block.size for block in matcher.get_matching_blocks())
+        return 2.0 * matches / (len(user_text) + len(correct_text))
     
-    def _find_incorrect_parts(self, user_text: str, correct_text: str) -> List[str]:
+    def _find_incorrect_parts(self, user_keywords: List[str], reference: ReferenceAnswer) -> List[str]:
         """找出可能错误的部分"""
-        user_keywords = set(self._extract_keywords(user_text))
-        correct_keywords = set(self._extract_keywords(correct_text))
+        correct_keywords = reference.keyword_set
         
         # 找出用户答案中可能错误的关键词
         incorrect = []
@@ -265,7 +456,7 @@ class TheoryQuestionGrader:
             "递归": ["循环", "迭代"],
         }
         
-        for keyword in user_keywords:
+        for keyword in set(user_keywords):
             for correct_concept, wrong_concepts in contradictions.items():
                 if correct_concept in correct_keywords and keyword in wrong_concepts:
                     incorrect.append(f"'{keyword}'与'{correct_concept}'的特性不符")
@@ -305,10 +496,8 @@ class TheoryQuestionGrader:
         
         return "\n".join(feedback_parts)
     
-    def _generate_encouragement(self, score: float) -> str:
-        """生成鼓励性评语"""
-        import random
-        
+    def _generate_encouragement(self, score: float, user_clean: str) -> str:
+        """生成鼓励性评语（按规范化后的答案选取，同一答案总是得到同一条评语）"""
         if score >= 0.9:
             category = "excellent"
         elif score >= 0.7:
@@ -318,21 +507,35 @@ class TheoryQuestionGrader:
         else:
             category = "poor"
         
-        return random.choice(self.encouragements[category])
+        options = self.encouragements[category]
+        return options[zlib.crc32(user_clean.encode('utf-8')) % len(options)]
 
 # 全局评分器实例
 theory_grader = TheoryQuestionGrader()
 
+def warm_reference_cache(answers: Iterable[Tuple[Optional[int], str]]) -> int:
+    """启动或导入题目后预先处理 (题目id, 标准答案)，之后的评分只需要分词用户答案"""
+    return theory_grader.warm_references(answers)
+
 def grade_theory_answer(user_answer: str, correct_answer: str, 
-                       question_content: str = "") -> Dict:
+                       question_content: str = "", question_id: Optional[int] = None) -> Dict:
     """
     评分理论题答案的便捷函数
     
+    规范化后相同的答案直接返回缓存的评分结果（见 GradingCache）
+    
     Returns:
         包含评分结果的字典
     """
+    key = (question_id, _digest(correct_answer), _digest(theory_grader.normalize_answer(user_answer)))
+    return theory_grader.results.get_or_grade(
+        key, lambda: _grade_theory_answer(user_answer, correct_answer, question_content, question_id)
+    )
+
+def _grade_theory_answer(user_answer: str, correct_answer: str,
+                         question_content: str, question_id: Optional[int]) -> Dict:
     result = theory_grader.grade_theory_question(
-        user_answer, correct_answer, question_content
+        user_answer, correct_answer, question_content, question_id
     )
     
     return {
@@ -353,6 +556,19 @@ def grade_theory_answer(user_answer: str, correct_answer: str,
     }
 
 
+# 填空题评分结果缓存，键为 (标准答案摘要, 规范化后的用户答案摘要)
+fill_blank_results = GradingCache()
+
+
+def normalize_fill_blank_answer(answer: str) -> List[str]:
+    """标准化填空题答案：各种分隔符统一后拆分成小写的各部分"""
+    # 替换各种分隔符为逗号
+    answer = re.sub(r'[;；、\s]+', ',', answer.strip())
+    # 分割并清理每部分
+    parts = [part.strip().lower() for part in answer.split(',') if part.strip()]
+    return parts
+
+
 def grade_fill_blank_answer(user_answer: str, correct_answer: str) -> Dict:
     """
     评分填空题答案
@@ -363,6 +579,8 @@ def grade_fill_blank_answer(user_answer: str, correct_answer: str) -> Dict:
     - 忽略前后空格
     - 同义词匹配（部分情况）
     
+    标准化后相同的答案直接返回缓存的评分结果。
+    
     Args:
         user_answer: 用户答案
         correct_answer: 标准答案
@@ -382,18 +600,15 @@ def grade_fill_blank_answer(user_answer: str, correct_answer: str) -> Dict:
             'detailed_analysis': {'match_details': '答案为空'}
         }
     
-    # 标准化答案 - 处理多种分隔符
-    def normalize_answer(answer):
-        # 替换各种分隔符为逗号
-        answer = re.sub(r'[;；、\s]+', ',', answer.strip())
-        # 分割并清理每部分
-        parts = [part.strip().lower() for part in answer.split(',') if part.strip()]
-        return parts
-    
-    user_parts = normalize_answer(user_answer)
-    correct_parts = normalize_answer(correct_answer)
+    user_parts = normalize_fill_blank_answer(user_answer)
+    key = (_digest(correct_answer), _digest(','.join(user_parts)))
+    return fill_blank_results.get_or_grade(key, lambda: _grade_fill_blank(user_parts, correct_answer))
+
+
+def _grade_fill_blank(user_parts: List[str], correct_answer: str) -> Dict:
+    correct_parts = normalize_fill_blank_answer(correct_answer)
     
-    print(f"填空题评分 - 用户答案: {user_parts}, 标准答案: {correct_parts}")
+    logger.debug("填空题评分 - 用户答案: %s, 标准答案: %s", user_parts, correct_parts)
     
     # 精确匹配
     if user_parts == correct_parts:
@@ -483,4 +698,54 @@ def grade_fill_blank_answer(user_answer: str, correct_answer: str) -> Dict:
             'user_parts': user_parts,
             'correct_parts': correct_parts
         }
-    }
\ No newline at end of file
+    }
+
+
+def grade_answer(question_type: str, user_answer: str, correct_answer: str,
+                 question_content: str = "", question_id: Optional[int] = None) -> Dict:
+    """按题型评分：填空题精确匹配，其余主观题使用智能评分（与答题接口的规则一致）"""
+    if question_type == 'fill_blank':
+        return grade_fill_blank_answer(user_answer or '', correct_answer or '')
+    return grade_theory_answer(user_answer or '', correct_answer or '', question_content or '', question_id)
+
+
+def _grade_chunk(items: Sequence[Tuple]) -> List[Dict]:
+    return [grade_answer(*item) for item in items]
+
+
+def grade_answers_bulk(items: Iterable[Tuple[str, str, str, str, Optional[int]]],
+                       workers: Optional[int] = None, chunk_size: int = BULK_CHUNK_SIZE) -> List[Dict]:
+    """
+    批量评分，结果与输入顺序一致
+    
+    Args:
+        items: (题型, 用户答案, 标准答案, 题目内容, 题目id) 列表；同一道题的答案相邻时标准答案缓存命中率更高
+        workers: 进程数，默认取环境变量 GRADING_WORKERS，未设置时为CPU核数；为1或只有一个分块时在当前进程内评分。
+                 进程池只用于命令行脚本：在多线程的Web进程中fork子进程可能死锁，Web接口应传1
+        chunk_size: 每个进程任务的答案数量
+    """
+    items = list(items)
+    chunks = [items[start:start + chunk_size] for start in range(0, len(items), chunk_size)]
+    workers = workers or int(os.getenv('GRADING_WORKERS', os.cpu_count() or 1))
+    
+    results = []
+    if workers <= 1 or len(chunks) <= 1:
+        for chunk in chunks:
+            results.extend(_grade_chunk(chunk))
+        return results
+    
+    # 在创建子进程之前加载分词词典，子进程直接继承，不必各自加载
+    jieba.initialize()
+    with ProcessPoolExecutor(max_workers=min(workers, len(chunks))) as executor:
+        for chunk_results in executor.map(_grade_chunk, chunks):
+            results.extend(chunk_results)
+    return results
+
+
+def grading_cache_stats() -> Dict:
+    """评分结果缓存的命中统计（按题型）和标准答案预处理缓存的大小"""
+    return {
+        'theory': theory_grader.results.stats(),
+        'fill_blank': fill_blank_results.stats(),
+        'references': {'size': theory_grader.reference_cache_size(), 'capacity': REFERENCE_CACHE_SIZE}
+    }
@@ -0,0 +1,91 @@
+"""
+分词器初始化
+jieba 在第一次分词时才构建前缀词典（约1秒），每次重启或 fork 出新进程后的第一次评分都要等这一下；
+默认词典也会把“哈希表”“时间复杂度”这样的领域词切开。这里在应用启动时：
+
+- 初始化 jieba，词典缓存文件放在 instance/jieba.cache（跨重启保留，不依赖系统临时目录）
+- 用知识点名称和理论题评分的同义词表生成领域词典 instance/jieba_userdict.txt（每行“词 词频”）并加载
+
+评分器（theory_grader.py）和相似题目索引（similarity_index.py）都使用 jieba 的全局分词器，
+加载领域词典后两者的分词结果一致。
+"""
+
+import os
+import re
+import threading
+from typing import Iterable, List, Optional
+
+import jieba
+from flask import current_app, has_app_context
+
+from models import db, KnowledgePoint
+
+USER_DICT_NAME = 'jieba_userdict.txt'
+
+_CJK = re.compile(r'[\u4e00-\u9fff]')
+_lock = threading.Lock()
+_initialized = False
+
+
+def _instance_path() -> Optional[str]:
+    return current_app.instance_path if has_app_context() else None
+
+
+def init_tokenizer() -> None:
+    """加载 jieba 词典和已生成的领域词典，可重复调用；在应用上下文中调用时使用 instance 目录下的缓存"""
+    global _initialized
+    with _lock:
+        if _initialized:
+            return
+
+        instance_path = _instance_path()
+        if instance_path:
+            os.makedirs(instance_path, exist_ok=True)
+            jieba.dt.tmp_dir = instance_path
+        jieba.initialize()
+
+        if instance_path and os.path.exists(os.path.join(instance_path, USER_DICT_NAME)):
+            jieba.load_userdict(os.path.join(instance_path, USER_DICT_NAME))
+        _initialized = True
+
+
+def domain_words() -> List[str]:
+    """知识点名称和同义词表中含中文的词（需要在应用上下文中调用）"""
+    from theory_grader import theory_grader
+
+    names = [row[0] for row in db.session.query(KnowledgePoint.name).distinct() if row[0]]
+    forms = [form for standard, words in theory_grader.synonyms.items() for form in (standard, *words)]
+    return sorted_domain_words(names + forms)
+
+
+def sorted_domain_words(words: Iterable[str]) -> List[str]:
+    """去掉空白、单字和不含中文的词（英文单词 jieba 本来就不会切开），去重排序"""
+    result = set()
+    for word in words:
+        word = word.strip().lower()
+        if len(word) > 1 and not re.search(r'\s', word) and _CJK.search(word):
+            result.add(word)
+    return sorted(result)
+
+
+def prepare_tokenizer(words: Optional[Iterable[str]] = None) -> int:
+    """
+    应用启动或导入题目后调用（需要在应用上下文中调用）：
+    初始化分词器，重新生成领域词典文件并加载新增的词，返回领域词数量
+    """
+    init_tokenizer()
+    words = domain_words() if words is None else sorted_domain_words(words)
+
+    lines = []
+    for word in words:
+        freq = jieba.suggest_freq(word, tune=False)
+        if jieba.dt.FREQ.get(word) != freq:
+            jieba.add_word(word, freq)
+        lines.append(f"{word} {freq}\n")
+
+    path = os.path.join(current_app.instance_path, USER_DICT_NAME)
+    temp_path = f'{path}.tmp{os.getpid()}'
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        f.writelines(lines)
+    os.replace(temp_path, path)
+    return len(words)
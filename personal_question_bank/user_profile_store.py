@@ -0,0 +1,198 @@
+"""
+用户画像增量缓存
+
+推荐引擎每次构建画像都要重新扫描30天的学习记录和最近50条记录（逐行访问 record.question）。
+这里为每个用户缓存一份画像状态：
+
+- 首次使用时用两次列查询从数据库加载（不创建ORM对象）
+- 之后每次答题由 RecommendationEngine.update_user_model 以O(1)追加，
+  维护知识点计数、正确数、总用时、题型和面试模式计数，以及最近50次答题（用于学习节奏和题型偏好）
+- 30天窗口之外的记录在读取时从队列头部移出并扣减计数
+- 缓存条目在 RECOMMENDATION_CONFIG['cache_ttl'] 秒后过期，下次读取时从数据库重建
+- 加载在锁外进行；每个用户有一个版本号，答题和失效时加1。加载期间版本号变化（有答题提交）时，
+  加载结果可能不含这次答题，不写入缓存而是重新加载，避免丢失更新
+"""
+
+import threading
+import time
+from collections import Counter, deque
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterable, NamedTuple, Optional
+
+from models import db, LearningRecord, Question
+
+PROFILE_WINDOW_DAYS = 30
+PATTERN_RECORD_LIMIT = 50
+LOAD_ATTEMPTS = 2
+
+
+class AnswerEvent(NamedTuple):
+    """画像需要的单条答题信息"""
+    completed_at: datetime
+    question_id: int
+    knowledge_point_id: Optional[int]
+    question_type: Optional[str]
+    is_correct: bool
+    time_spent: int
+    question_bank_mode: Optional[str] = None
+
+
+class UserProfileState:
+    """单个用户的画像计数"""
+
+    def __init__(self, window_events: Iterable[AnswerEvent], latest_events: Iterable[AnswerEvent]):
+        self.window = deque()  # 30天内的答题，按完成时间升序
+        self.kp_stats: Dict[Optional[int], Dict[str, int]] = {}  # 按知识点首次出现的顺序
+        self.total = 0
+        self.correct = 0
+        self.time_spent = 0
+        self.type_counts = Counter()
+        self.interview_count = 0
+        self.latest = deque(maxlen=PATTERN_RECORD_LIMIT)  # 最近的答题，最新的在最前
+        self.loaded_at = time.monotonic()
+
+        for event in window_events:
+            self._add_to_window(event)
+        self.latest.extend(latest_events)
+
+    def _add_to_window(self, event: AnswerEvent) -> None:
+        self.window.append(event)
+        stats = self.kp_stats.setdefault(event.knowledge_point_id, {'total': 0, 'correct': 0, 'time': 0})
+        stats['total'] += 1
+        stats['correct'] += int(bool(event.is_correct))
+        stats['time'] += event.time_spent
+        self.total += 1
+        self.correct += int(bool(event.is_correct))
+        self.time_spent += event.time_spent
+        self.type_counts[event.question_type] += 1
+        self.interview_count += int(event.question_bank_mode == 'interview')
+
+    def add(self, event: AnswerEvent) -> None:
+        """记录一次新的答题"""
+        self._add_to_window(event)
+        self.latest.appendleft(event)
+
+    def expire(self, cutoff: datetime) -> None:
+        """移出完成时间早于 cutoff 的记录"""
+        while self.window and self.window[0].completed_at < cutoff:
+            event = self.window.popleft()
+            stats = self.kp_stats[event.knowledge_point_id]
+            stats['total'] -= 1
+            stats['correct'] -= int(bool(event.is_correct))
+            stats['time'] -= event.time_spent
+            if stats['total'] == 0:
+                del self.kp_stats[event.knowledge_point_id]
+            self.total -= 1
+            self.correct -= int(bool(event.is_correct))
+            self.time_spent -= event.time_spent
+            self.type_counts[event.question_type] -= 1
+            if self.type_counts[event.question_type] == 0:
+                del self.type_counts[event.question_type]
+            self.interview_count -= int(event.question_bank_mode == 'interview')
+
+    def snapshot(self) -> Dict:
+        """复制一份计数供推荐引擎读取，避免与并发的答题更新互相影响"""
+        return {
+            'kp_stats': {kp_id: dict(stats) for kp_id, stats in self.kp_stats.items()},
+            'total': self.total,
+            'correct': self.correct,
+            'time_spent': self.time_spent,
+            'type_counts': dict(self.type_counts),
+            'interview_count': self.interview_count,
+            'latest': list(self.latest)
+        }
+
+
+def _event_columns():
+    return (
+        LearningRecord.completed_at,
+        LearningRecord.question_id,
+        Question.knowledge_point_id,
+        Question.question_type,
+        LearningRecord.is_correct,
+        LearningRecord.time_spent,
+        Question.question_bank_mode
+    )
+
+
+def _to_event(row) -> AnswerEvent:
+    completed_at, question_id, knowledge_point_id, question_type, is_correct, time_spent, mode = row
+    return AnswerEvent(completed_at, question_id, knowledge_point_id, question_type, bool(is_correct), time_spent or 0,
+                       mode)
+
+
+def load_profile_state(user_id: int) -> UserProfileState:
+    """从数据库加载30天内的记录和最近50条记录"""
+    cutoff = datetime.utcnow() - timedelta(days=PROFILE_WINDOW_DAYS)
+
+    window_rows = db.session.query(*_event_columns())\
+                            .join(Question, LearningRecord.question_id == Question.id)\
+                            .filter(LearningRecord.user_id == user_id)\
+                            .filter(LearningRecord.completed_at >= cutoff)\
+                            .order_by(LearningRecord.completed_at, LearningRecord.id)\
+                            .all()
+
+    latest_rows = db.session.query(*_event_columns())\
+                            .join(Question, LearningRecord.question_id == Question.id)\
+                            .filter(LearningRecord.user_id == user_id)\
+                            .order_by(LearningRecord.completed_at.desc(), LearningRecord.id.desc())\
+                            .limit(PATTERN_RECORD_LIMIT)\
+                            .all()
+
+    return UserProfileState([_to_event(row) for row in window_rows], [_to_event(row) for row in latest_rows])
+
+
+class UserProfileStore:
+    """按用户缓存 UserProfileState，超过 ttl 秒的条目在下次读取时重建"""
+
+    def __init__(self, ttl: int, loader: Callable[[int], UserProfileState] = load_profile_state):
+        self.ttl = ttl
+        self.loader = loader
+        self._states: Dict[int, UserProfileState] = {}
+        self._versions: Dict[int, int] = {}
+        self._generation = 0  # 全部失效时加1
+        self._lock = threading.Lock()
+
+    def _version(self, user_id: int):
+        return self._generation, self._versions.get(user_id, 0)
+
+    def get(self, user_id: int) -> Dict:
+        """返回用户画像计数的快照（见 UserProfileState.snapshot）"""
+        cutoff = datetime.utcnow() - timedelta(days=PROFILE_WINDOW_DAYS)
+        with self._lock:
+            state = self._states.get(user_id)
+            if state is not None and time.monotonic() - state.loaded_at <= self.ttl:
+                state.expire(cutoff)
+                return state.snapshot()
+
+        for _ in range(LOAD_ATTEMPTS):
+            with self._lock:
+                version = self._version(user_id)
+            state = self.loader(user_id)
+            with self._lock:
+                if self._version(user_id) == version:
+                    # 加载期间没有新的答题，加载结果是最新的
+                    self._states[user_id] = state
+                    state.expire(cutoff)
+                    return state.snapshot()
+
+        # 答题持续并发提交：返回最后一次加载的结果但不缓存，下次读取时重新加载
+        state.expire(cutoff)
+        return state.snapshot()
+
+    def record_answer(self, user_id: int, event: AnswerEvent) -> None:
+        """只更新已缓存的用户；未缓存的用户在下次读取时从数据库加载，自然包含这条记录"""
+        with self._lock:
+            self._versions[user_id] = self._versions.get(user_id, 0) + 1
+            state = self._states.get(user_id)
+            if state is not None:
+                state.add(event)
+
+    def invalidate(self, user_id: Optional[int] = None) -> None:
+        with self._lock:
+            if user_id is None:
+                self._states.clear()
+                self._generation += 1
+            else:
+                self._states.pop(user_id, None)
+                self._versions[user_id] = self._versions.get(user_id, 0) + 1